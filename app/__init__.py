@@ -29,11 +29,11 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
         'pool_recycle': 300,
-        'pool_pre_ping': True,
-        'connect_args': {
-            'connect_timeout': 10
-        }
+        'pool_pre_ping': True
     }
+    if database_url.startswith('mysql'):
+        # connect_timeout es de PyMySQL (SQLite, usado en las pruebas, no lo acepta)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = {'connect_timeout': 10}
     
     # 📧 CONFIGURACIÓN DE GMAIL CON VARIABLES DE ENTORNO
     app.config['MAIL_SERVER'] = 'smtp.gmail.com'
@@ -44,12 +44,31 @@ def create_app():
     app.config['MAIL_PASSWORD'] = os.getenv('EMAIL_PASS', 'unxz cjlb vuwe ofzm')
     app.config['MAIL_DEFAULT_SENDER'] = os.getenv('EMAIL_USER', 'davidsaavedrapinzon13@gmail.com')
     
+    # 🖼️ IMÁGENES LOCALES: originales y derivados en disco (ver app/images.py)
+    app.config['IMAGE_STORAGE_DIR'] = os.getenv('IMAGE_STORAGE_DIR')
+    # Detrás de nginx/apache: el servidor envía el archivo (X-Sendfile)
+    app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'False') == 'True'
+    
+    # 🧵 Hilos de fondo e índices en memoria (ver app/background.py)
+    app.config['START_BACKGROUND_JOBS'] = os.getenv('START_BACKGROUND_JOBS', 'True') == 'True'
+    
     # ✅ Inicializar extensiones con la app
     db.init_app(app)  # ✅ Ahora usa la misma instancia que models1.py
     login_manager.init_app(app)
     mail.init_app(app)
     migrate.init_app(app, db)
     
+    # ✅ Almacén de imágenes y helpers de plantilla (srcset de los derivados)
+    from app.images import image_src, image_srcset, image_store
+    image_store.init_app(app)
+    app.jinja_env.globals.update(image_src=image_src, image_srcset=image_srcset)
+    from app.pagination import page_url
+    app.jinja_env.globals.update(page_url=page_url)
+    
+    # ✅ Contador del carrito en todas las plantillas (caché por usuario, sin consultas)
+    from app.cart_count import inject_cart_count
+    app.context_processor(inject_cart_count)
+    
     # Configurar Login Manager
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Por favor inicia sesión para acceder a esta página.'
@@ -99,42 +118,86 @@ def create_app():
             print("   - Que el servidor MySQL esté corriendo")
             print("   - Que la base de datos exista")
     
+    # ✅ Comandos de consola: flask catalog import/export
+    from app.commands import catalog_cli
+    app.cli.add_command(catalog_cli)
+    
+    # ✅ Tareas de fondo (índices en memoria, relacionados, ranking de ventas):
+    # se arrancan con la primera petición, nunca en la CLI ni con TESTING
+    from app.background import start_background_jobs
+    
+    @app.before_request
+    def _start_background_jobs():
+        if not app.extensions.get('background_jobs'):
+            start_background_jobs(app)
+    
     # ✅ RUTA PRINCIPAL - Página de inicio con todos los productos
+    from app.conditional import conditional_get
+    from app.page_cache import CATALOG_TAG, cached_page, tag_page
+    
     @app.route('/')
+    @conditional_get('catalog', anonymous_only=True)
+    @cached_page
     def index():
         try:
             # ✅ IMPORTAR Product DENTRO de la función para evitar circular import
             from app.models1 import Product
             
+            from app.pagination import (SORT_LABELS, approximate_count, catalog_sort,
+                                        cursor_mode_requested, keyset_paginate,
+                                        sorted_query)
+            from app.serializers import serialize_products, shaped_query
+            
             page = request.args.get('page', 1, type=int)
             per_page = 30
             
-            # Obtener productos con paginación
-            products_query = Product.query.filter_by(status='Activo')
-            pagination = products_query.paginate(
-                page=page, 
-                per_page=per_page,
-                error_out=False
-            )
+            # ✅ Orden (?sort=) servido por el índice (status, columna)
+            sort_name, sort_keys = catalog_sort(request.args)
+            products_query = sorted_query(
+                shaped_query(Product.query.filter_by(status='Activo'), 'card'), sort_keys)
+            
+            # ✅ Modo cursor (?after= / ?before=): sin COUNT(*) ni OFFSET
+            cursor_mode = cursor_mode_requested(request.args)
+            if cursor_mode:
+                pagination = keyset_paginate(
+                    products_query,
+                    sort_keys,
+                    per_page,
+                    after=request.args.get('after'),
+                    before=request.args.get('before')
+                )
+            else:
+                # Obtener productos con paginación
+                pagination = products_query.paginate(
+                    page=page, 
+                    per_page=per_page,
+                    error_out=False
+                )
             
             products = pagination.items
             
             # Convertir productos a formato para la template
-            products_data = []
-            for product in products:
-                products_data.append({
-                    'id': product.idProduct,
-                    'name': product.nameProduct,
-                    'description': product.description or '',
-                    'price': float(product.price) if product.price else 0,
-                    'image_url': product.image or f'https://via.placeholder.com/300x400/f8f9fa/000?text={product.nameProduct.replace(" ", "+")}',
-                    'category': product.category,
-                    'stock': product.stock,
-                    'status': product.status
-                })
+            products_data = serialize_products(products, 'card')
+            
+            # ✅ Cualquier cambio de producto invalida el listado general
+            tag_page(CATALOG_TAG)
+            
+            if cursor_mode:
+                return render_template('index.html', 
+                                     products=products_data,
+                                     sort_labels=SORT_LABELS,
+                                     current_sort=sort_name,
+                                     cursor_mode=True,
+                                     next_cursor=pagination.next_cursor,
+                                     prev_cursor=pagination.prev_cursor,
+                                     approx_total=approximate_count(('index',), products_query),
+                                     has_next=pagination.has_next,
+                                     has_prev=pagination.has_prev)
             
             return render_template('index.html', 
                                  products=products_data,
+                                 sort_labels=SORT_LABELS,
+                                 current_sort=sort_name,
                                  current_page=page,
                                  total_pages=pagination.pages,
                                  has_next=pagination.has_next,
@@ -167,12 +230,14 @@ def create_app():
         from app.routes.dashboard import dashboard_bp
         from app.routes.products import products_bp
         from app.routes.cart import cart_bp
+        from app.routes.images import images_bp
         
         app.register_blueprint(auth_bp)
         app.register_blueprint(users_bp)
         app.register_blueprint(dashboard_bp)
         app.register_blueprint(products_bp)
         app.register_blueprint(cart_bp)
+        app.register_blueprint(images_bp)
         
         print("✅ Todos los blueprints registrados correctamente")
         
@@ -0,0 +1,61 @@
+import threading
+
+_lock = threading.Lock()
+
+
+def _catalog_indexes():
+    from app.facets import product_facets
+    from app.search_index import product_search
+    from app.sku_index import sku_index
+    from app.spelling import product_spelling
+    from app.typeahead import product_typeahead
+
+    return (('búsqueda', product_search),
+            ('autocompletado', product_typeahead),
+            ('sugerencias', product_spelling),
+            ('facetas', product_facets),
+            ('SKU', sku_index))
+
+
+def warm_catalog_indexes(app):
+    """Construye los índices en memoria que aún no estén listos.
+
+    Si una petición llega antes, el índice se construye ahí mismo al usarse
+    (ver _index_ready en app/routes/products.py).
+    """
+    with app.app_context():
+        for label, index in _catalog_indexes():
+            if index.ready:
+                continue
+            try:
+                index.rebuild()
+                print(f"✅ Índice de {label} listo: {len(index)} productos")
+            except Exception as e:
+                print(f"⚠️  No se pudo construir el índice de {label}: {e}")
+
+
+def start_background_jobs(app):
+    """Arranca una sola vez por proceso los hilos de fondo de la tienda.
+
+    Se llama con la primera petición, así `flask db upgrade`, los comandos
+    `flask catalog ...` y las apps de pytest no lanzan hilos ni construyen
+    índices. Se desactiva con START_BACKGROUND_JOBS=False o TESTING.
+    """
+    if app.testing or not app.config.get('START_BACKGROUND_JOBS'):
+        return False
+    with _lock:
+        if app.extensions.get('background_jobs'):
+            return False
+        app.extensions['background_jobs'] = True
+
+        from app.related import related_refresher
+        from app.sales_rank import sales_rank_refresher
+
+        # ✅ Índices del catálogo en memoria (luego se actualizan con los eventos de SQLAlchemy)
+        threading.Thread(target=warm_catalog_indexes, args=(app,), name='catalog-indexes',
+                         daemon=True).start()
+        # ✅ Relacionados precalculados: recálculo completo y luego incremental
+        related_refresher.start(app)
+        # ✅ Ranking de ventas (orden "más vendidos"), recalculado periódicamente
+        sales_rank_refresher.start(app)
+    return True
@@ -0,0 +1,233 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import and_, case, exists, func, literal, select, update
+
+from app.catalog_events import notify_products_changed
+from app.categories import category_directory
+from app.models1 import Color, Product, ProductVariant, db
+
+# Hasta este número de filas se hace un solo UPDATE; por encima, UPDATEs por
+# bloques de ids con un commit cada uno para no bloquear la tabla
+BULK_CHUNK_SIZE = 2000
+PREVIEW_SAMPLE_SIZE = 10
+
+PRICE_MODES = ('percent', 'add', 'set')
+STOCK_MODES = ('add', 'set')
+STATUSES = ('Activo', 'Inactivo')
+
+
+def _decimal(value, field):
+    try:
+        number = Decimal(str(value).replace(',', '.'))
+    except (InvalidOperation, AttributeError):
+        raise ValueError(f'{field} debe ser numérico')
+    if not number.is_finite():
+        raise ValueError(f'{field} debe ser numérico')
+    return number
+
+
+def _integer(value, field):
+    try:
+        return int(str(value))
+    except ValueError:
+        raise ValueError(f'{field} debe ser un entero')
+
+
+def _names(value):
+    values = value if isinstance(value, (list, tuple)) else str(value).split(',')
+    return [str(item).strip() for item in values if str(item).strip()]
+
+
+class BulkRule:
+    """Filtro + transformación de precio/stock/estado sobre la tabla product.
+
+    filter:  {category, status, color, q, ids, price_min, price_max, stock_min, stock_max, all}
+    changes: {price: {mode: percent|add|set, value}, stock: {mode: add|set, value},
+              status: Activo|Inactivo|auto}
+
+    Si cambia el stock y no se indica status, el estado se recalcula a partir
+    del stock nuevo en el mismo UPDATE (igual que al editar un producto).
+    """
+
+    def __init__(self, filters, changes):
+        self.filters = filters or {}
+        self.changes = changes or {}
+        self.conditions = self._build_conditions(self.filters)
+        self.values = self._build_values(self.changes)
+
+    @staticmethod
+    def _build_conditions(filters):
+        table = Product.__table__
+        conditions = []
+
+        if filters.get('category'):
+            names = _names(filters['category'])
+            category_ids = [category_directory.resolve(name) for name in names]
+            conditions.append(table.c.category_id.in_([cid for cid in category_ids if cid is not None])
+                              | table.c.category.in_(names))
+        if filters.get('status'):
+            if filters['status'] not in STATUSES:
+                raise ValueError('status debe ser Activo o Inactivo')
+            conditions.append(table.c.status == filters['status'])
+        if filters.get('color'):
+            # "Colores descontinuados": productos con alguna variante de esos colores
+            conditions.append(exists(
+                select(ProductVariant.idVariant)
+                .join(Color, Color.idColor == ProductVariant.idColor)
+                .where(ProductVariant.idProduct == table.c.idProduct,
+                       Color.nameColor.in_(_names(filters['color'])))
+            ))
+        if filters.get('q'):
+            conditions.append(table.c.nameProduct.ilike(f"%{str(filters['q']).strip()}%"))
+        if filters.get('ids'):
+            conditions.append(table.c.idProduct.in_([_integer(value, 'ids') for value in _names(filters['ids'])]))
+        if filters.get('price_min') not in (None, ''):
+            conditions.append(table.c.price >= _decimal(filters['price_min'], 'price_min'))
+        if filters.get('price_max') not in (None, ''):
+            conditions.append(table.c.price <= _decimal(filters['price_max'], 'price_max'))
+        if filters.get('stock_min') not in (None, ''):
+            conditions.append(table.c.stock >= _integer(filters['stock_min'], 'stock_min'))
+        if filters.get('stock_max') not in (None, ''):
+            conditions.append(table.c.stock <= _integer(filters['stock_max'], 'stock_max'))
+
+        # Sin filtros solo se acepta si se pide explícitamente todo el catálogo
+        if not conditions and not filters.get('all'):
+            raise ValueError('Indica al menos un filtro (o "all": true para todo el catálogo)')
+        return conditions
+
+    @staticmethod
+    def _build_values(changes):
+        table = Product.__table__
+        values = {}
+
+        price = changes.get('price')
+        if price:
+            mode = price.get('mode', 'set')
+            if mode not in PRICE_MODES:
+                raise ValueError(f'price.mode debe ser uno de {", ".join(PRICE_MODES)}')
+            amount = _decimal(price.get('value'), 'price.value')
+            if mode == 'percent':
+                expression = func.round(table.c.price * (Decimal(100) + amount) / Decimal(100), 2)
+            elif mode == 'add':
+                expression = table.c.price + amount
+            else:
+                if amount < 0:
+                    raise ValueError('El precio no puede ser negativo')
+                expression = literal(amount.quantize(Decimal('0.01')), table.c.price.type)
+            values['price'] = case((expression < 0, 0), else_=expression) if mode != 'set' else expression
+
+        new_stock = table.c.stock
+        stock = changes.get('stock')
+        if stock:
+            mode = stock.get('mode', 'set')
+            if mode not in STOCK_MODES:
+                raise ValueError(f'stock.mode debe ser uno de {", ".join(STOCK_MODES)}')
+            amount = _integer(stock.get('value'), 'stock.value')
+            if mode == 'add':
+                new_stock = case((table.c.stock + amount < 0, 0), else_=table.c.stock + amount)
+            else:
+                if amount < 0:
+                    raise ValueError('El stock no puede ser negativo')
+                new_stock = literal(amount, table.c.stock.type)
+            values['stock'] = new_stock
+
+        status = changes.get('status') or ('auto' if stock else None)
+        if status == 'auto':
+            values['status'] = case((new_stock > 0, 'Activo'), else_='Inactivo')
+        elif status in STATUSES:
+            values['status'] = literal(status, table.c.status.type)
+        elif status is not None:
+            raise ValueError('status debe ser Activo, Inactivo o auto')
+
+        if not values:
+            raise ValueError('Indica al menos un cambio de price, stock o status')
+        return values
+
+    @property
+    def where(self):
+        return and_(*self.conditions) if self.conditions else literal(True)
+
+    def matching_ids(self, connection):
+        table = Product.__table__
+        return connection.execute(
+            select(table.c.idProduct).where(self.where).order_by(table.c.idProduct)
+        ).scalars().all()
+
+    def preview(self, sample_size=PREVIEW_SAMPLE_SIZE):
+        """Conteo y muestra con los valores actuales y los resultantes, sin escribir"""
+        table = Product.__table__
+        with db.engine.connect() as connection:
+            count = connection.execute(select(func.count()).select_from(table).where(self.where)).scalar()
+            rows = connection.execute(
+                select(table.c.idProduct, table.c.nameProduct, table.c.price, table.c.stock, table.c.status,
+                       *(expression.label(f'new_{column}') for column, expression in self.values.items()))
+                .where(self.where).order_by(table.c.idProduct).limit(sample_size)
+            ).mappings().all()
+
+        sample = []
+        for row in rows:
+            item = {
+                'id': row['idProduct'],
+                'name': row['nameProduct'],
+                'price': float(row['price']) if row['price'] is not None else 0.0,
+                'stock': row['stock'],
+                'status': row['status']
+            }
+            for column in self.values:
+                value = row[f'new_{column}']
+                item[f'new_{column}'] = float(value) if column == 'price' else value
+            sample.append(item)
+        return {'matched': count, 'sample': sample}
+
+    def update_statement(self, where, updated_at=None):
+        """UPDATE de la regla; status va primero en el SET porque MySQL asigna
+        de izquierda a derecha y su CASE debe ver el stock anterior"""
+        values = dict(self.values, updated_at=updated_at or datetime.utcnow())
+        ordered = sorted(values.items(), key=lambda item: item[0] != 'status')
+        return update(Product.__table__).where(where).ordered_values(*ordered)
+
+    def apply(self, chunk_size=BULK_CHUNK_SIZE):
+        """Aplica la regla; devuelve cuántas filas se modificaron"""
+        table = Product.__table__
+        now = datetime.utcnow()
+        ids = self.matching_ids(db.session.connection())
+        if not ids:
+            db.session.rollback()
+            return 0
+
+        try:
+            if len(ids) <= chunk_size:
+                # Un único UPDATE basado en conjuntos
+                db.session.execute(self.update_statement(self.where, now))
+                notify_products_changed(db.session, ids=ids)
+                db.session.commit()
+                return len(ids)
+
+            updated = 0
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start:start + chunk_size]
+                result = db.session.execute(
+                    self.update_statement(and_(table.c.idProduct.in_(chunk), self.where), now)
+                )
+                notify_products_changed(db.session, ids=chunk)
+                db.session.commit()
+                updated += result.rowcount
+            return updated
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def parse_rule(data):
+    """BulkRule desde el JSON de la petición; ValueError si no es válido"""
+    if not isinstance(data, dict):
+        raise ValueError('Se esperaba un objeto JSON con filter y changes')
+    filters = data.get('filter') or {}
+    changes = data.get('changes') or {}
+    if not isinstance(filters, dict) or not isinstance(changes, dict):
+        raise ValueError('filter y changes deben ser objetos')
+    for key in ('price', 'stock'):
+        if changes.get(key) is not None and not isinstance(changes[key], dict):
+            raise ValueError(f'{key} debe ser un objeto {{mode, value}}')
+    return BulkRule(filters, changes)
@@ -0,0 +1,135 @@
+import threading
+import time
+
+from flask import session
+from flask_login import current_user
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.models1 import CartItem, db
+
+CART_COUNT_MAX_ENTRIES = 10000
+# Cada cuánto se vuelve a contar en la BD aunque nadie haya invalidado
+# (cambios hechos desde otro proceso o con SQL directo)
+CART_COUNT_TTL = 300
+
+_PENDING_KEY = 'cart_count_changed_users'
+
+
+class CartCountCache:
+    """Número de líneas del carrito por usuario, sin ir a la BD en cada página.
+
+    Las rutas del carrito publican el valor contado dentro de su transacción
+    (set) tras el commit; los cambios por el ORM invalidan al confirmarse y el
+    TTL corrige la deriva que venga de otros procesos.
+    """
+
+    def __init__(self, max_entries=CART_COUNT_MAX_ENTRIES, ttl=CART_COUNT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}        # idUser -> (expira, líneas)
+        # Sube con cada invalidación: un conteo que empezó antes no se guarda
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _load(user_id):
+        with db.engine.connect() as connection:
+            return connection.execute(
+                select(func.count()).select_from(CartItem).where(CartItem.idUser == user_id)
+            ).scalar_one()
+
+    def _store(self, user_id, count):
+        if len(self._entries) >= self.max_entries and user_id not in self._entries:
+            # Sin LRU: al llenarse se descarta todo y se vuelve a contar a demanda
+            self._entries.clear()
+        self._entries[user_id] = (time.monotonic() + self.ttl, count)
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] >= now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        count = self._load(user_id)
+        with self._lock:
+            if generation == self._generation:
+                self._store(user_id, count)
+        return count
+
+    def set(self, user_id, count):
+        """Publica el conteo ya confirmado en la BD"""
+        with self._lock:
+            self._store(user_id, count)
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+cart_counts = CartCountCache()
+
+
+def session_user_id():
+    """idUser de la sesión sin cargar el usuario (None si es anónimo)"""
+    user_id = session.get('_user_id')
+    if user_id is None:
+        # Puede venir de la cookie "recordarme": Flask-Login lo resuelve
+        return current_user.idUser if current_user.is_authenticated else None
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def current_cart_count():
+    """Contador del carrito del visitante actual (el del invitado sale de su cookie)"""
+    user_id = session_user_id()
+    if user_id is None:
+        from app.guest_cart import guest_count
+        return guest_count()
+    return cart_counts.get(user_id)
+
+
+def inject_cart_count():
+    """Context processor: `cart_count` en todas las plantillas"""
+    try:
+        return {'cart_count': current_cart_count()}
+    except Exception as e:
+        print(f"⚠️  No se pudo obtener el contador del carrito: {e}")
+        return {'cart_count': 0}
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_cart_changes(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, CartItem) and obj.idUser is not None:
+            session.info.setdefault(_PENDING_KEY, set()).add(obj.idUser)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_cart_counts(session):
+    user_ids = session.info.pop(_PENDING_KEY, None)
+    if user_ids:
+        cart_counts.invalidate(user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_cart_changes(session):
+    session.info.pop(_PENDING_KEY, None)
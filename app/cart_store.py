@@ -0,0 +1,154 @@
+from datetime import datetime
+
+from sqlalchemy import and_, delete, func, literal, select, update
+from sqlalchemy.dialects import mysql, sqlite
+
+from app.cart_count import cart_counts
+from app.models1 import CartItem, Product, db
+
+
+def load_cart(user_id):
+    """(líneas, total, ids de líneas huérfanas) del carrito en una sola consulta.
+
+    El subtotal de cada línea y el total salen de la BD (SUM() OVER ()), así
+    se calcula con DECIMAL y no con floats de Python.
+    """
+    line_total = Product.price * CartItem.quantity
+    rows = db.session.execute(
+        select(CartItem.idCartItem, CartItem.idProduct, CartItem.quantity,
+               Product.idProduct.label('product_id'), Product.nameProduct, Product.price,
+               Product.image, Product.stock,
+               line_total.label('subtotal'),
+               func.sum(line_total).over().label('total'))
+        .select_from(CartItem)
+        .outerjoin(Product, Product.idProduct == CartItem.idProduct)
+        .where(CartItem.idUser == user_id)
+        .order_by(CartItem.idCartItem)
+    ).all()
+
+    lines = []
+    orphans = []
+    total = 0
+    for row in rows:
+        total = row.total or 0
+        if row.product_id is None:
+            # El producto ya no existe
+            orphans.append(row.idCartItem)
+            continue
+        lines.append({
+            'id': row.idCartItem,
+            'product_id': row.product_id,
+            'name': row.nameProduct,
+            'price': float(row.price),
+            'quantity': row.quantity,
+            'image': row.image,
+            'stock': row.stock,
+            'subtotal': float(row.subtotal)
+        })
+    return lines, float(total), orphans
+
+
+def remove_orphans(item_ids):
+    """Borra las líneas huérfanas con un único DELETE"""
+    if not item_ids:
+        return 0
+    result = db.session.execute(delete(CartItem).where(CartItem.idCartItem.in_(item_ids)))
+    db.session.commit()
+    return result.rowcount
+
+
+def _upsert_statement(dialect, user_id, product_id, quantity):
+    """INSERT ... SELECT que solo produce fila si hay stock para la cantidad final"""
+    cart = CartItem.__table__
+    existing = cart.alias('existing')
+    source = (
+        select(literal(user_id), Product.idProduct, literal(quantity), literal(datetime.utcnow()))
+        .select_from(Product)
+        .outerjoin(existing, and_(existing.c.idUser == user_id, existing.c.idProduct == Product.idProduct))
+        .where(Product.idProduct == product_id,
+               Product.status == 'Activo',
+               Product.stock >= func.coalesce(existing.c.quantity, 0) + quantity)
+    )
+    columns = ['idUser', 'idProduct', 'quantity', 'added_at']
+    return _upsert(dialect, lambda insert: insert.from_select(columns, source))
+
+
+def _upsert(dialect, build):
+    """INSERT que suma la cantidad si la línea (idUser, idProduct) ya existe"""
+    cart = CartItem.__table__
+    if dialect == 'mysql':
+        stmt = build(mysql.insert(cart))
+        return stmt.on_duplicate_key_update(quantity=cart.c.quantity + stmt.inserted.quantity)
+    if dialect == 'sqlite':
+        stmt = build(sqlite.insert(cart))
+        return stmt.on_conflict_do_update(index_elements=['idUser', 'idProduct'],
+                                          set_={'quantity': cart.c.quantity + stmt.excluded.quantity})
+    raise NotImplementedError(f'Upsert del carrito no soportado en {dialect}')
+
+
+def add_item(user_id, product_id, quantity):
+    """Suma `quantity` a la línea del producto (o la crea) de forma atómica.
+
+    Devuelve (agregado, cantidad de la línea, líneas del carrito). No agrega
+    nada si el producto no está activo o el stock no alcanza.
+    """
+    stmt = _upsert_statement(db.engine.dialect.name, user_id, product_id, quantity)
+    added = db.session.execute(stmt).rowcount > 0
+
+    # Cantidad de la línea y total de líneas en la misma consulta
+    line = (select(CartItem.quantity)
+            .where(CartItem.idUser == user_id, CartItem.idProduct == product_id)
+            .scalar_subquery())
+    line_quantity, cart_count = db.session.execute(select(line, _count_subquery(user_id))).one()
+    db.session.commit()
+    cart_counts.set(user_id, cart_count)
+    return added, line_quantity or 0, cart_count
+
+
+def merge_items(user_id, quantities):
+    """Suma {idProduct: cantidad} al carrito del usuario con un único upsert múltiple.
+
+    La suma con una línea que ya existía se acota al stock del producto en
+    la misma transacción, igual que add_item nunca supera el stock.
+    """
+    if not quantities:
+        return cart_counts.get(user_id)
+    now = datetime.utcnow()
+    rows = [{'idUser': user_id, 'idProduct': product_id, 'quantity': quantity, 'added_at': now}
+            for product_id, quantity in sorted(quantities.items())]
+    db.session.execute(_upsert(db.engine.dialect.name, lambda insert: insert.values(rows)))
+    stock = (select(Product.stock).where(Product.idProduct == CartItem.idProduct)
+             .scalar_subquery())
+    db.session.execute(
+        update(CartItem)
+        .where(CartItem.idUser == user_id,
+               CartItem.idProduct.in_(list(quantities)),
+               CartItem.quantity > stock)
+        .values(quantity=stock)
+    )
+    cart_count = db.session.execute(select(_count_subquery(user_id))).scalar_one()
+    db.session.commit()
+    cart_counts.set(user_id, cart_count)
+    return cart_count
+
+
+def _count_subquery(user_id):
+    return select(func.count()).select_from(CartItem).where(CartItem.idUser == user_id).scalar_subquery()
+
+
+def remove_item(user_id, item_id):
+    """Borra una línea del usuario; devuelve (borrada, líneas que quedan)"""
+    result = db.session.execute(
+        delete(CartItem).where(CartItem.idCartItem == item_id, CartItem.idUser == user_id)
+    )
+    cart_count = db.session.execute(select(_count_subquery(user_id))).scalar_one()
+    db.session.commit()
+    cart_counts.set(user_id, cart_count)
+    return result.rowcount > 0, cart_count
+
+
+def clear_items(user_id):
+    """Vacía el carrito del usuario con un único DELETE"""
+    db.session.execute(delete(CartItem).where(CartItem.idUser == user_id))
+    db.session.commit()
+    cart_counts.set(user_id, 0)
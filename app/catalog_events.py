@@ -0,0 +1,112 @@
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.conditional import bump_versions
+from app.models1 import Category, Product
+
+# Funciones callback(rows, deleted_ids) que se ejecutan tras cada commit que
+# modifica productos; rows son filas completas de la tabla product
+_product_listeners = []
+
+_PENDING_KEY = 'catalog_changed_products'
+
+
+def register_product_listener(callback):
+    """Registra un índice en memoria para que reciba los cambios de Product"""
+    if callback not in _product_listeners:
+        _product_listeners.append(callback)
+    return callback
+
+
+def product_category_name():
+    """Nombre vigente de la categoría en SQL.
+
+    Sale de la tabla category por category_id (renombrar una categoría solo
+    modifica su fila); el texto product.category queda para productos sin enlace.
+    """
+    return func.coalesce(
+        select(Category.nameCategory)
+        .where(Category.idCategory == Product.category_id)
+        .scalar_subquery(),
+        Product.category
+    )
+
+
+def load_product_rows(connection, ids=None, batch_size=1000):
+    """Lee filas de product (todas o solo `ids`) sin pasar por la sesión ORM.
+
+    `category` es el nombre vigente (product_category_name), no el texto guardado.
+    """
+    table = Product.__table__
+    stmt = select(*[column for column in table.c if column.key != 'category'],
+                  product_category_name().label('category'))
+    if ids is not None:
+        stmt = stmt.where(Product.idProduct.in_(list(ids)))
+    result = connection.execution_options(stream_results=True).execute(stmt)
+    for partition in result.mappings().partitions(batch_size):
+        for row in partition:
+            yield row
+
+
+def _pending(session):
+    return session.info.setdefault(_PENDING_KEY, {'upsert': set(), 'delete': set()})
+
+
+def _remember(session, ids, deleted_ids):
+    pending = _pending(session)
+    pending['upsert'].update(ids)
+    pending['delete'].update(deleted_ids)
+    pending['upsert'].difference_update(pending['delete'])
+
+
+def notify_products_changed(session, ids=(), deleted_ids=()):
+    """Marca productos modificados fuera del ORM (UPDATE/DELETE masivos)"""
+    _remember(session, ids, deleted_ids)
+    # Los flush del ORM ya suben la versión por su cuenta
+    bump_versions(session, ['catalog'])
+
+
+def dispatch_products_changed(connection, ids=(), deleted_ids=()):
+    """Envía los cambios a los índices usando una conexión ya abierta"""
+    if not _product_listeners:
+        return
+    rows = list(load_product_rows(connection, ids)) if ids else []
+    deleted = set(deleted_ids)
+    # Un id que ya no existe en la tabla también se considera eliminado
+    deleted.update(set(ids) - {row['idProduct'] for row in rows})
+    for callback in list(_product_listeners):
+        try:
+            callback(rows, deleted)
+        except Exception as e:
+            print(f"⚠️  Error actualizando índice de productos: {e}")
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_product_changes(session, flush_context):
+    changed = [obj for obj in session.new | session.dirty if isinstance(obj, Product)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Product)]
+    if not changed and not deleted:
+        return
+    _remember(
+        session,
+        # En after_flush los nuevos ya tienen PK pero aún no identity
+        ids=[obj.idProduct for obj in changed if obj.idProduct is not None],
+        deleted_ids=[inspect(obj).identity[0] for obj in deleted if inspect(obj).identity]
+    )
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_product_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not (pending['upsert'] or pending['delete']):
+        return
+    try:
+        with session.get_bind().connect() as connection:
+            dispatch_products_changed(connection, pending['upsert'], pending['delete'])
+    except Exception as e:
+        print(f"⚠️  No se pudieron propagar los cambios de productos: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_product_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,337 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import bindparam, insert, select, update
+
+from app.catalog_events import notify_products_changed
+from app.categories import CategoryDirectory, category_directory
+from app.models1 import Category, Product, db
+
+# Filas que se validan y escriben por transacción
+IMPORT_BATCH_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+# Columnas del archivo (las mismas en CSV y JSONL)
+CATALOG_COLUMNS = ('idProduct', 'nameProduct', 'description', 'price', 'stock', 'category', 'image', 'status')
+REPORT_COLUMNS = ('line', 'error', 'row')
+
+FORMATS = ('csv', 'jsonl')
+
+
+class ImportSummary:
+    """Totales de una importación (se actualizan lote a lote)"""
+
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = 0
+
+    def to_dict(self):
+        return {
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'errors': self.errors
+        }
+
+
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def _text_lines(stream):
+    # Acepta archivos binarios (subidas) o de texto (CLI) sin leerlos completos
+    first = True
+    for line in stream:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+
+def iter_records(stream, fmt):
+    """(número de línea, dict | None, error) leyendo el archivo fila a fila"""
+    text = _text_lines(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'JSON inválido: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'Cada línea debe ser un objeto JSON'
+            continue
+        yield line_number, record, None
+
+
+def _text(value, limit, field):
+    value = '' if value is None else str(value).strip()
+    if len(value) > limit:
+        raise ValueError(f'{field} supera {limit} caracteres')
+    return value
+
+
+def clean_record(record):
+    """Valores validados del registro; solo las columnas presentes en el archivo"""
+    values = {}
+    present = {key for key, value in record.items() if key in CATALOG_COLUMNS and value not in (None, '')}
+
+    if 'idProduct' in present:
+        try:
+            values['idProduct'] = int(record['idProduct'])
+        except (TypeError, ValueError):
+            raise ValueError('idProduct debe ser un entero')
+
+    name = _text(record.get('nameProduct'), 255, 'nameProduct')
+    if not name:
+        raise ValueError('nameProduct es obligatorio')
+    values['nameProduct'] = name
+
+    if 'price' in present:
+        try:
+            price = Decimal(str(record['price']).replace(',', '.'))
+        except InvalidOperation:
+            raise ValueError('price no es un número')
+        if price < 0 or not price.is_finite():
+            raise ValueError('price debe ser mayor o igual a 0')
+        values['price'] = price.quantize(Decimal('0.01'))
+
+    if 'stock' in present:
+        try:
+            stock = int(str(record['stock']))
+        except ValueError:
+            raise ValueError('stock debe ser un entero')
+        if stock < 0:
+            raise ValueError('stock no puede ser negativo')
+        values['stock'] = stock
+
+    if 'status' in present:
+        status = str(record['status']).strip().capitalize()
+        if status not in ('Activo', 'Inactivo'):
+            raise ValueError('status debe ser Activo o Inactivo')
+        values['status'] = status
+
+    if 'description' in present:
+        values['description'] = str(record['description'])
+    if 'category' in present:
+        values['category'] = _text(record['category'], 100, 'category')
+    if 'image' in present:
+        values['image'] = _text(record['image'], 255, 'image')
+    return values
+
+
+class CatalogImporter:
+    """Upsert por lotes: UPDATE y INSERT con executemany, un commit por lote.
+
+    Las filas se emparejan por idProduct y, si no lo traen, por nombre.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, dry_run=False, report=None, progress=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.summary = ImportSummary()
+        self._report = csv.writer(report) if report is not None else None
+        self._progress = progress
+        self._new_categories = {}
+
+    def _error(self, line, message, record):
+        self.summary.errors += 1
+        if self._report is not None:
+            self._report.writerow([line, message, json.dumps(record, ensure_ascii=False, default=str) if record else ''])
+
+    def run(self, stream, fmt):
+        if self._report is not None:
+            self._report.writerow(REPORT_COLUMNS)
+        batch = []
+        for line, record, error in iter_records(stream, fmt):
+            self.summary.processed += 1
+            if error:
+                self._error(line, error, record)
+                continue
+            try:
+                batch.append((line, record, clean_record(record)))
+            except ValueError as e:
+                self._error(line, str(e), record)
+                continue
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+        return self.summary
+
+    def _category_id(self, name):
+        if not name:
+            return None
+        key = CategoryDirectory._key(name)
+        if key in self._new_categories:
+            return self._new_categories[key]
+        category_id = category_directory.resolve(name)
+        if category_id is None and not self.dry_run:
+            category = Category(nameCategory=name, status='Activa')
+            db.session.add(category)
+            db.session.flush()
+            category_id = category.idCategory
+        self._new_categories[key] = category_id
+        return category_id
+
+    def _write_batch(self, batch):
+        table = Product.__table__
+        ids = {values['idProduct'] for _, _, values in batch if 'idProduct' in values}
+        names = {values['nameProduct'] for _, _, values in batch}
+
+        # Una consulta por lote para saber qué filas ya existen
+        existing_ids = set()
+        by_name = {}
+        if ids:
+            existing_ids = set(db.session.execute(
+                select(table.c.idProduct).where(table.c.idProduct.in_(ids))
+            ).scalars())
+        if names:
+            for product_id, name in db.session.execute(
+                select(table.c.idProduct, table.c.nameProduct).where(table.c.nameProduct.in_(names))
+            ):
+                by_name.setdefault(name, product_id)
+
+        now = datetime.utcnow()
+        updates = {}
+        new_rows = {}   # nombre -> (línea, registro, valores) de productos nuevos
+        for line, record, values in batch:
+            product_id = values.get('idProduct') if values.get('idProduct') in existing_ids else by_name.get(values['nameProduct'])
+            if 'category' in values:
+                values['category_id'] = self._category_id(values['category'])
+            values['updated_at'] = now
+            if 'stock' in values and 'status' not in values:
+                # Sin columna status, el estado sigue al stock final (como en el checkout)
+                values['status'] = 'Activo' if values['stock'] > 0 else 'Inactivo'
+            if product_id is not None:
+                values['idProduct'] = product_id
+                # executemany necesita las mismas columnas en todas las filas
+                updates.setdefault(tuple(sorted(values)), []).append(values)
+                continue
+            values.pop('idProduct', None)
+            if values['nameProduct'] in new_rows:
+                # Nombre repetido en el lote: se combina con la fila nueva anterior
+                new_rows[values['nameProduct']][2].update(values)
+            else:
+                new_rows[values['nameProduct']] = (line, record, values)
+
+        inserts = []
+        for line, record, values in new_rows.values():
+            missing = [field for field in ('price', 'stock') if field not in values]
+            if missing:
+                self._error(line, f'Producto nuevo sin {", ".join(missing)}', record)
+                continue
+            values['created_at'] = now
+            inserts.append(values)
+
+        if self.dry_run:
+            self.summary.updated += sum(len(rows) for rows in updates.values())
+            self.summary.inserted += len(inserts)
+            db.session.rollback()
+            self._report_progress()
+            return
+
+        try:
+            for columns, rows in updates.items():
+                stmt = (
+                    update(table)
+                    .where(table.c.idProduct == bindparam('b_idProduct'))
+                    .values({column: bindparam(f'b_{column}') for column in columns if column != 'idProduct'})
+                )
+                db.session.execute(stmt, [{f'b_{key}': value for key, value in row.items()} for row in rows])
+            if inserts:
+                insert_columns = set().union(*inserts)
+                db.session.execute(
+                    insert(table),
+                    [{column: row.get(column) for column in insert_columns} for row in inserts]
+                )
+
+            changed = {row['idProduct'] for rows in updates.values() for row in rows}
+            if inserts:
+                inserted_names = {row['nameProduct'] for row in inserts}
+                changed.update(db.session.execute(
+                    select(table.c.idProduct).where(table.c.nameProduct.in_(inserted_names))
+                ).scalars())
+            notify_products_changed(db.session, ids=changed)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self._new_categories.clear()
+            for line, record, _ in batch:
+                self._error(line, f'Error al guardar el lote: {e}', record)
+            self._report_progress()
+            return
+
+        self.summary.updated += sum(len(rows) for rows in updates.values())
+        self.summary.inserted += len(inserts)
+        self._report_progress()
+
+    def _report_progress(self):
+        if self._progress is not None:
+            self._progress(self.summary)
+
+
+def import_catalog(stream, fmt='csv', batch_size=IMPORT_BATCH_SIZE, dry_run=False, report=None, progress=None):
+    """Importa un archivo CSV/JSONL; devuelve el ImportSummary"""
+    importer = CatalogImporter(batch_size=batch_size, dry_run=dry_run, report=report, progress=progress)
+    return importer.run(stream, fmt)
+
+
+def export_rows(status=None, batch_size=EXPORT_BATCH_SIZE):
+    """Filas de product para exportar, leídas con cursor del servidor"""
+    table = Product.__table__
+    stmt = select(*(table.c[column] for column in CATALOG_COLUMNS)).order_by(table.c.idProduct)
+    if status:
+        stmt = stmt.where(table.c.status == status)
+    with db.engine.connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(stmt)
+        for partition in result.mappings().partitions(batch_size):
+            for row in partition:
+                yield row
+
+
+def _export_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def export_chunks(fmt='csv', status=None, batch_size=EXPORT_BATCH_SIZE):
+    """Texto del archivo exportado por fragmentos (para escribir o enviar en streaming)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer is not None:
+        writer.writerow(CATALOG_COLUMNS)
+    count = 0
+    for row in export_rows(status, batch_size):
+        if writer is not None:
+            writer.writerow([_export_value(row[column]) for column in CATALOG_COLUMNS])
+        else:
+            buffer.write(json.dumps({column: _export_value(row[column]) for column in CATALOG_COLUMNS},
+                                    ensure_ascii=False) + '\n')
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
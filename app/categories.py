@@ -0,0 +1,145 @@
+import threading
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.catalog_events import dispatch_products_changed
+from app.models1 import Category, Product, db
+from app.page_cache import page_cache
+from app.search_index import fold_accents
+
+_STALE_KEY = 'category_directory_stale'
+_RENAMED_KEY = 'categories_renamed'
+
+
+class CategoryDirectory:
+    """Mapa en memoria idCategory <-> nombre de categoría.
+
+    Las páginas de categoría resuelven el nombre de la URL a un id sin
+    consultar la BD, y el nombre que se muestra sale de aquí.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._by_id = {}
+        self._by_name = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._by_id)
+
+    @staticmethod
+    def _key(name):
+        return fold_accents(name).strip()
+
+    def build(self, rows):
+        with self._lock:
+            self._by_id = {}
+            self._by_name = {}
+            for category_id, name in rows:
+                self._by_id[category_id] = name
+                self._by_name.setdefault(self._key(name), category_id)
+            self.ready = True
+
+    def rebuild(self):
+        with db.engine.connect() as connection:
+            self.build(connection.execute(select(Category.idCategory, Category.nameCategory)).all())
+
+    def invalidate(self):
+        self.ready = False
+
+    def _ensure_ready(self):
+        if not self.ready:
+            self.rebuild()
+
+    def resolve(self, name):
+        """idCategory para un nombre (sin distinguir mayúsculas ni tildes)"""
+        if not name:
+            return None
+        with self._lock:
+            self._ensure_ready()
+            return self._by_name.get(self._key(name))
+
+    def name_for(self, category_id):
+        if category_id is None:
+            return None
+        with self._lock:
+            self._ensure_ready()
+            return self._by_id.get(category_id)
+
+
+category_directory = CategoryDirectory()
+
+
+def category_label(product):
+    """Nombre vigente de la categoría del producto (con respaldo en la columna texto)"""
+    state = inspect(product, raiseerr=False)
+    # Con el estado ORM no se dispara la carga de columnas diferidas
+    category_id = state.dict.get('category_id') if state is not None else getattr(product, 'category_id', None)
+    return category_directory.name_for(category_id) or product.category
+
+
+@event.listens_for(Session, 'before_flush')
+def _link_product_categories(session, flush_context, instances):
+    # Mantiene category_id sincronizado con el texto `category` en todas las
+    # rutas que crean o editan productos
+    for obj in session.new | session.dirty:
+        if not isinstance(obj, Product):
+            continue
+        state = inspect(obj)
+        if obj in session.new:
+            if obj.category_id is not None or not obj.category:
+                continue
+        elif not state.attrs.category.history.has_changes():
+            continue
+
+        category_id = category_directory.resolve(obj.category) if obj.category else None
+        if category_id is not None or not obj.category:
+            obj.category_id = category_id
+            continue
+
+        pending = next((c for c in session.new if isinstance(c, Category)
+                        and CategoryDirectory._key(c.nameCategory) == CategoryDirectory._key(obj.category)), None)
+        obj.category_ref = pending or Category(nameCategory=obj.category.strip(), status='Activa')
+        session.add(obj.category_ref)
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_categories_stale(session, flush_context):
+    if any(isinstance(obj, Category) for obj in session.new | session.dirty | session.deleted):
+        session.info[_STALE_KEY] = True
+    for obj in session.dirty:
+        if isinstance(obj, Category) and inspect(obj).attrs.nameCategory.history.has_changes():
+            session.info.setdefault(_RENAMED_KEY, set()).add(obj.idCategory)
+
+
+def _reindex_renamed_categories(session, category_ids):
+    # Los productos no se reescriben: los índices en memoria leen el nombre
+    # por category_id, basta con volver a cargar las filas de esas categorías
+    table = Product.__table__
+    with session.get_bind().connect() as connection:
+        product_ids = connection.execute(
+            select(table.c.idProduct).where(table.c.category_id.in_(list(category_ids)))
+        ).scalars().all()
+        if product_ids:
+            dispatch_products_changed(connection, product_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_categories(session):
+    renamed = session.info.pop(_RENAMED_KEY, None)
+    if session.info.pop(_STALE_KEY, False):
+        category_directory.invalidate()
+        # Los nombres de categoría aparecen en todas las páginas cacheadas
+        page_cache.clear()
+    if renamed:
+        try:
+            _reindex_renamed_categories(session, renamed)
+        except Exception as e:
+            print(f"⚠️  No se pudieron reindexar las categorías renombradas: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_category_changes(session):
+    session.info.pop(_STALE_KEY, None)
+    session.info.pop(_RENAMED_KEY, None)
@@ -0,0 +1,137 @@
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+from app.cart_count import cart_counts
+from app.catalog_events import notify_products_changed
+from app.models1 import CartItem, Order, OrderDetail, Product, db
+from app.related import related_refresher
+
+# Reintentos ante deadlock / lock wait timeout (la transacción se repite entera)
+CHECKOUT_ATTEMPTS = 3
+
+
+class CheckoutError(Exception):
+    """El carrito no se puede convertir en pedido (vacío o sin stock)"""
+
+    def __init__(self, message, shortages=None):
+        super().__init__(message)
+        self.message = message
+        self.shortages = shortages or []
+
+
+def _decrement_statement(quantities):
+    """UPDATE con guarda que descuenta {idProduct: cantidad} solo si todavía alcanza"""
+    table = Product.__table__
+    requested = case(quantities, value=table.c.idProduct)
+    new_stock = table.c.stock - requested
+    return (
+        update(table)
+        .where(table.c.idProduct.in_(sorted(quantities)),
+               table.c.status == 'Activo',
+               table.c.stock >= requested)
+        # MySQL asigna el SET de izquierda a derecha: el estado va antes que
+        # el stock para que el CASE compare con el stock anterior
+        .ordered_values(('status', case((new_stock > 0, table.c.status), else_='Inactivo')),
+                        ('stock', new_stock),
+                        ('updated_at', datetime.utcnow()))
+    )
+
+
+def _place_order(user_id):
+    # 1) Líneas del carrito, bloqueadas y en orden de producto
+    lines = db.session.execute(
+        select(CartItem.idProduct, CartItem.quantity)
+        .where(CartItem.idUser == user_id)
+        .order_by(CartItem.idProduct)
+        .with_for_update()
+    ).all()
+    if not lines:
+        raise CheckoutError('El carrito está vacío')
+    quantities = {line.idProduct: line.quantity for line in lines}
+    product_ids = sorted(quantities)
+
+    # 2) Filas de producto bloqueadas siempre en orden de id: dos checkouts
+    # que comparten productos esperan en vez de bloquearse mutuamente
+    products = db.session.execute(
+        select(Product.idProduct, Product.nameProduct, Product.price, Product.stock, Product.status)
+        .where(Product.idProduct.in_(product_ids))
+        .order_by(Product.idProduct)
+        .with_for_update()
+    ).all()
+    found = {product.idProduct: product for product in products}
+    shortages = []
+    for product_id in product_ids:
+        product = found.get(product_id)
+        if product is None or product.status != 'Activo' or product.stock < quantities[product_id]:
+            shortages.append({
+                'product_id': product_id,
+                'name': product.nameProduct if product is not None else None,
+                'requested': quantities[product_id],
+                'available': product.stock if product is not None and product.status == 'Activo' else 0
+            })
+    if shortages:
+        raise CheckoutError('No hay suficiente stock disponible', shortages)
+
+    # 3) Un único UPDATE con guarda: solo descuenta si todavía alcanza
+    result = db.session.execute(_decrement_statement(quantities))
+    if result.rowcount != len(product_ids):
+        # Sin FOR UPDATE (SQLite) otro checkout pudo ganar entre la lectura y el UPDATE
+        raise CheckoutError('No hay suficiente stock disponible')
+
+    # 4) Pedido + todos sus detalles en un INSERT múltiple; el total lo suma la BD
+    order = Order(idUser=user_id, totalAmount=0, status='Pendiente', orderDate=datetime.utcnow())
+    db.session.add(order)
+    db.session.flush()
+    db.session.execute(insert(OrderDetail.__table__), [
+        {'idOrder': order.idOrder, 'idProduct': product_id,
+         'quantity': quantities[product_id], 'price': found[product_id].price}
+        for product_id in product_ids
+    ])
+    details = OrderDetail.__table__
+    db.session.execute(
+        update(Order.__table__)
+        .where(Order.__table__.c.idOrder == order.idOrder)
+        .values(totalAmount=select(func.coalesce(func.sum(details.c.quantity * details.c.price), 0))
+                .where(details.c.idOrder == order.idOrder)
+                .scalar_subquery())
+    )
+    total = db.session.execute(
+        select(Order.__table__.c.totalAmount).where(Order.__table__.c.idOrder == order.idOrder)
+    ).scalar_one()
+
+    # 5) Vaciar el carrito y avisar a los índices del catálogo
+    db.session.execute(delete(CartItem).where(CartItem.idUser == user_id))
+    notify_products_changed(db.session, product_ids)
+    order_id = order.idOrder
+    db.session.commit()
+    return {'order_id': order_id, 'total': float(total), 'items': len(product_ids)}, product_ids
+
+
+def checkout(user_id):
+    """Convierte el carrito del usuario en un pedido 'Pendiente' en una transacción.
+
+    Devuelve {'order_id', 'total', 'items'}; CheckoutError si el carrito está
+    vacío o algún producto no tiene stock (no se descuenta nada).
+    """
+    for attempt in range(1, CHECKOUT_ATTEMPTS + 1):
+        try:
+            order, product_ids = _place_order(user_id)
+            break
+        except CheckoutError:
+            db.session.rollback()
+            raise
+        except OperationalError as e:
+            db.session.rollback()
+            if attempt == CHECKOUT_ATTEMPTS:
+                raise
+            print(f"⚠️  Checkout reintentado ({attempt}/{CHECKOUT_ATTEMPTS}): {e.orig}")
+        except Exception:
+            db.session.rollback()
+            raise
+
+    cart_counts.set(user_id, 0)
+    # Los detalles se insertaron sin ORM: los relacionados se recalculan aquí
+    related_refresher.schedule(product_ids)
+    return order
@@ -0,0 +1,51 @@
+import sys
+
+import click
+from flask.cli import AppGroup
+
+from app.catalog_io import FORMATS, IMPORT_BATCH_SIZE, detect_format, export_chunks, import_catalog
+
+catalog_cli = AppGroup('catalog', help='Importar y exportar el catálogo de productos.')
+
+
+@catalog_cli.command('import')
+@click.argument('source', type=click.File('rb'))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Formato del archivo (por defecto según la extensión).')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, help='Filas por lote/commit.')
+@click.option('--dry-run', is_flag=True, help='Valida sin escribir en la base de datos.')
+@click.option('--errors', 'errors_path', type=click.File('w', encoding='utf-8'),
+              help='Archivo CSV donde se escriben las filas rechazadas.')
+def import_command(source, fmt, batch_size, dry_run, errors_path):
+    """Importa productos desde SOURCE (CSV o JSONL; '-' para stdin)."""
+    fmt = fmt or detect_format(source.name)
+
+    def progress(summary):
+        click.echo(f"  ... {summary.processed} filas: {summary.inserted} nuevas, "
+                   f"{summary.updated} actualizadas, {summary.errors} con error", err=True)
+
+    summary = import_catalog(source, fmt, batch_size=batch_size, dry_run=dry_run,
+                             report=errors_path, progress=progress)
+    prefix = '🔎 Simulación' if dry_run else '✅ Importación'
+    click.echo(f"{prefix} terminada: {summary.inserted} nuevos, {summary.updated} actualizados, "
+               f"{summary.errors} errores de {summary.processed} filas")
+    if summary.errors:
+        sys.exit(1)
+
+
+@catalog_cli.command('export')
+@click.argument('target', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Formato del archivo (por defecto según la extensión).')
+@click.option('--status', type=click.Choice(['Activo', 'Inactivo']), help='Solo productos con este estado.')
+def export_command(target, fmt, status):
+    """Exporta el catálogo a TARGET (por defecto stdout)."""
+    fmt = fmt or detect_format(target.name)
+    for chunk in export_chunks(fmt, status=status):
+        target.write(chunk)
+
+
+@catalog_cli.command('sales-rank')
+def sales_rank_command():
+    """Recalcula el ranking de ventas (orden "más vendidos")."""
+    from app.sales_rank import refresh_sales_rank
+    written = refresh_sales_rank()
+    click.echo(f"✅ Ranking de ventas actualizado: {written} productos")
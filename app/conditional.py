@@ -0,0 +1,187 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, g, make_response, request
+from flask_login import current_user
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models1 import (Category, Color, DataVersion, Order, OrderDetail, Product,
+                         ProductImage, ProductVariant, Size, User, db)
+
+# Cada cuánto (segundos) un proceso vuelve a leer las versiones de la BD;
+# los commits hechos en este mismo proceso se ven de inmediato
+VERSION_CHECK_INTERVAL = 1.0
+
+# Modelo -> conjunto de datos cuya versión sube al escribirlo
+VERSIONED_MODELS = {
+    Product: 'catalog',
+    Category: 'catalog',
+    ProductVariant: 'catalog',
+    ProductImage: 'catalog',
+    Color: 'catalog',
+    Size: 'catalog',
+    Order: 'orders',
+    OrderDetail: 'orders',
+}
+# Modelos cuya versión solo sube al crear o borrar filas (las estadísticas
+# solo muestran el total; los logins que actualizan al usuario no cuentan)
+COUNTED_MODELS = {
+    User: 'users',
+}
+
+_PENDING_KEY = 'data_versions_bumped'
+
+
+class DataVersions:
+    """Versiones compartidas entre procesos (tabla data_version) con memo local"""
+
+    def __init__(self, interval=VERSION_CHECK_INTERVAL):
+        self.interval = interval
+        self._memo = {}     # nombre -> (versión, updated_at, leído en)
+        self._lock = threading.Lock()
+
+    def current(self, names):
+        """{nombre: (versión, updated_at)}; consulta la BD solo si el memo caducó"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [name for name in names
+                     if name not in self._memo or now - self._memo[name][2] > self.interval]
+        if stale:
+            with db.engine.connect() as connection:
+                rows = connection.execute(
+                    select(DataVersion.name, DataVersion.version, DataVersion.updated_at)
+                    .where(DataVersion.name.in_(stale))
+                ).all()
+            found = {name: (version, updated_at) for name, version, updated_at in rows}
+            with self._lock:
+                for name in stale:
+                    version, updated_at = found.get(name, (0, None))
+                    self._memo[name] = (version, updated_at, now)
+        with self._lock:
+            return {name: self._memo[name][:2] for name in names}
+
+    def expire(self, names):
+        with self._lock:
+            for name in names:
+                self._memo.pop(name, None)
+
+
+data_versions = DataVersions()
+
+
+def bump_versions(session, names):
+    """Marca las versiones que suben cuando la sesión confirme"""
+    session.info.setdefault(_PENDING_KEY, set()).update(names)
+
+
+def _write_versions(connection, names):
+    table = DataVersion.__table__
+    now = datetime.utcnow()
+    for name in sorted(names):
+        result = connection.execute(
+            update(table).where(table.c.name == name)
+            .values(version=table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(name=name, version=1, updated_at=now))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_versions(session, flush_context):
+    names = {VERSIONED_MODELS[type(obj)] for obj in session.new | session.dirty | session.deleted
+             if type(obj) in VERSIONED_MODELS}
+    names.update(COUNTED_MODELS[type(obj)] for obj in session.new | session.deleted
+                 if type(obj) in COUNTED_MODELS)
+    if names:
+        bump_versions(session, names)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed_versions(session):
+    names = session.info.pop(_PENDING_KEY, None)
+    if not names:
+        return
+    # Transacción propia y corta tras el commit: la fila caliente de
+    # data_version no queda bloqueada mientras dura un checkout o una edición
+    try:
+        with session.get_bind().begin() as connection:
+            _write_versions(connection, names)
+    except Exception as e:
+        print(f"⚠️  No se pudieron subir las versiones de datos: {e}")
+    data_versions.expire(names)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_version_bumps(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def set_last_modified(value):
+    """Last-Modified propio de la entidad que devuelve la vista"""
+    if value is not None:
+        g.last_modified = value
+
+
+def _as_http_date(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def conditional_get(*names, per_user=False, anonymous_only=False, vary=None):
+    """ETag fuerte + Last-Modified a partir de las versiones `names`.
+
+    Si el If-None-Match del cliente coincide se responde 304 antes de
+    ejecutar la vista, es decir, sin consultas ni serialización.
+    per_user: la respuesta depende del usuario (se añade a la ETag)
+    anonymous_only: solo para visitantes anónimos (páginas HTML)
+    vary: función con datos extra de la ETag (ej. la fecha de hoy)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or (anonymous_only and current_user.is_authenticated):
+                return view(*args, **kwargs)
+            try:
+                versions = data_versions.current(names)
+            except Exception as e:
+                print(f"⚠️  No se pudieron leer las versiones de datos: {e}")
+                return view(*args, **kwargs)
+
+            parts = [request.path, repr(sorted(request.args.items(multi=True)))]
+            parts += [f'{name}:{versions[name][0]}' for name in names]
+            if per_user:
+                parts.append(f'user:{current_user.get_id()}')
+            if vary is not None:
+                parts.append(str(vary()))
+            etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:24]
+            modified = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+            last_modified = _as_http_date(max(modified)) if modified else None
+
+            not_modified = (request.if_none_match.contains(etag) if request.if_none_match
+                            else bool(last_modified and request.if_modified_since
+                                      and last_modified <= request.if_modified_since))
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                last_modified = _as_http_date(g.pop('last_modified', None)) or last_modified
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # El cliente guarda la respuesta pero la revalida en cada uso
+            response.cache_control.no_cache = True
+            if per_user:
+                response.cache_control.private = True
+            return response
+        return wrapper
+    return decorator
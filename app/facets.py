@@ -0,0 +1,305 @@
+import threading
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.catalog_events import load_product_rows, register_product_listener
+from app.models1 import Color, ProductVariant, Size, db
+
+FACETS = ('category', 'color', 'size', 'price', 'stock')
+IN_STOCK = 'in_stock'
+
+# Rangos de precio [desde, hasta); None = sin tope
+PRICE_BUCKETS = ((0, 25), (25, 50), (50, 100), (100, 200), (200, None))
+
+_PENDING_KEY = 'facet_changed_products'
+_STALE_KEY = 'facet_index_stale'
+
+
+def bucket_label(low, high):
+    return f'{low}-{high}' if high is not None else f'{low}+'
+
+
+PRICE_LABELS = tuple(bucket_label(low, high) for low, high in PRICE_BUCKETS)
+
+
+def price_bucket(price):
+    value = float(price or 0)
+    for low, high in PRICE_BUCKETS:
+        if high is None or value < high:
+            return bucket_label(low, high)
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+def _bits_from_ids(ids):
+    """Entero con los bits `ids` encendidos, armado de una vez"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for product_id in ids:
+        buffer[product_id >> 3] |= 1 << (product_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def ids_from_bits(bits, offset=0, limit=None):
+    """ids encendidos en orden ascendente, paginados"""
+    if limit == 0:
+        return []
+    digits = bin(bits)[:1:-1]   # bit 0 primero
+    found = []
+    skipped = 0
+    position = digits.find('1')
+    while position != -1:
+        if skipped < offset:
+            skipped += 1
+        else:
+            found.append(position)
+            if limit is not None and len(found) >= limit:
+                break
+        position = digits.find('1', position + 1)
+    return found
+
+
+class FacetIndex:
+    """Filtros por facetas con un bitset (int de Python) por valor.
+
+    El bit N de cada bitset es el producto con idProduct N. Un filtro es un OR
+    de los valores elegidos dentro de cada faceta y un AND entre facetas; los
+    conteos de cada faceta se calculan con los filtros de las demás.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._bits = {facet: {} for facet in FACETS}
+        self._all = 0
+        self._product_values = {}   # idProduct -> valores propios del producto
+        self._variant_values = {}   # idProduct -> {'color', 'size', 'in_stock'} de variantes
+        self._doc_values = {}       # idProduct -> {faceta: {valores}} indexados
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_values)
+
+    @staticmethod
+    def _product_entry(row):
+        if row.get('status') != 'Activo':
+            return None
+        return {
+            'category': row.get('category_id'),
+            # Columnas heredadas de app/models/products.py si existen en la tabla
+            'color': row.get('color'),
+            'size': row.get('size'),
+            'price': price_bucket(row.get('price')),
+            'in_stock': (row.get('stock') or 0) > 0
+        }
+
+    @staticmethod
+    def _variant_entry(variants):
+        entry = {'color': set(), 'size': set(), 'in_stock': False}
+        for color, size, stock in variants:
+            if color:
+                entry['color'].add(color)
+            if size:
+                entry['size'].add(size)
+            entry['in_stock'] = entry['in_stock'] or (stock or 0) > 0
+        return entry
+
+    def _values_for(self, product_id):
+        product = self._product_values.get(product_id)
+        if product is None:
+            return None
+        variants = self._variant_values.get(product_id, {})
+        values = {facet: set() for facet in FACETS}
+        if product['category'] is not None:
+            values['category'].add(product['category'])
+        for facet in ('color', 'size'):
+            if product[facet]:
+                values[facet].add(product[facet])
+            values[facet] |= variants.get(facet, set())
+        values['price'].add(product['price'])
+        if product['in_stock'] or variants.get('in_stock'):
+            values['stock'].add(IN_STOCK)
+        return values
+
+    def _reindex(self, product_id):
+        mask = 1 << product_id
+        for facet, values in self._doc_values.pop(product_id, {}).items():
+            for value in values:
+                bits = self._bits[facet].get(value, 0) & ~mask
+                if bits:
+                    self._bits[facet][value] = bits
+                else:
+                    self._bits[facet].pop(value, None)
+        self._all &= ~mask
+
+        values = self._values_for(product_id)
+        if values is None:
+            return
+        for facet, facet_values in values.items():
+            for value in facet_values:
+                self._bits[facet][value] = self._bits[facet].get(value, 0) | mask
+        self._all |= mask
+        self._doc_values[product_id] = values
+
+    def build(self, product_rows, variant_rows=()):
+        """variant_rows: (idProduct, color, talla, stock) de variantes activas"""
+        with self._lock:
+            self._product_values = {}
+            for row in product_rows:
+                entry = self._product_entry(row)
+                if entry is not None:
+                    self._product_values[row['idProduct']] = entry
+
+            grouped = {}
+            for product_id, color, size, stock in variant_rows:
+                grouped.setdefault(product_id, []).append((color, size, stock))
+            self._variant_values = {product_id: self._variant_entry(variants)
+                                    for product_id, variants in grouped.items()}
+
+            members = {facet: {} for facet in FACETS}
+            self._doc_values = {}
+            for product_id in self._product_values:
+                values = self._values_for(product_id)
+                self._doc_values[product_id] = values
+                for facet, facet_values in values.items():
+                    for value in facet_values:
+                        members[facet].setdefault(value, []).append(product_id)
+            self._bits = {facet: {value: _bits_from_ids(ids) for value, ids in by_value.items()}
+                          for facet, by_value in members.items()}
+            self._all = _bits_from_ids(self._doc_values)
+            self.ready = True
+
+    def rebuild(self):
+        with db.engine.connect() as connection:
+            self.build(load_product_rows(connection), _load_variant_rows(connection))
+
+    def apply_changes(self, rows, deleted_ids=()):
+        with self._lock:
+            for product_id in deleted_ids:
+                self._product_values.pop(product_id, None)
+                self._variant_values.pop(product_id, None)
+                self._reindex(product_id)
+            for row in rows:
+                entry = self._product_entry(row)
+                if entry is None:
+                    self._product_values.pop(row['idProduct'], None)
+                else:
+                    self._product_values[row['idProduct']] = entry
+                self._reindex(row['idProduct'])
+
+    def apply_variant_changes(self, product_ids, variant_rows):
+        """Sustituye las variantes de `product_ids` por `variant_rows`"""
+        grouped = {product_id: [] for product_id in product_ids}
+        for product_id, color, size, stock in variant_rows:
+            grouped.setdefault(product_id, []).append((color, size, stock))
+        with self._lock:
+            for product_id, variants in grouped.items():
+                if variants:
+                    self._variant_values[product_id] = self._variant_entry(variants)
+                else:
+                    self._variant_values.pop(product_id, None)
+                self._reindex(product_id)
+
+    def _match(self, filters, skip=None):
+        result = self._all
+        for facet, values in filters.items():
+            if facet == skip or not values:
+                continue
+            union = 0
+            for value in values:
+                union |= self._bits[facet].get(value, 0)
+            result &= union
+        return result
+
+    def match_bits(self, filters):
+        """Bitset de los productos que cumplen `filters` (bit N = idProduct N)"""
+        with self._lock:
+            return self._match(filters)
+
+    def search(self, filters, offset=0, limit=30):
+        """(ids de la página, total, conteos por faceta) para `filters`
+
+        filters: {faceta: {valores}}
+        """
+        with self._lock:
+            matched = self._match(filters)
+            ids = ids_from_bits(matched, offset, limit)
+            counts = {}
+            for facet in FACETS:
+                base = matched if not filters.get(facet) else self._match(filters, skip=facet)
+                facet_counts = {}
+                for value, bits in self._bits[facet].items():
+                    count = popcount(bits & base)
+                    if count:
+                        facet_counts[value] = count
+                counts[facet] = facet_counts
+        return ids, popcount(matched), counts
+
+
+def _load_variant_rows(connection, product_ids=None):
+    stmt = (
+        select(ProductVariant.idProduct, Color.nameColor, Size.nameSize, ProductVariant.stock)
+        .select_from(ProductVariant)
+        .outerjoin(Color, Color.idColor == ProductVariant.idColor)
+        .outerjoin(Size, Size.idSize == ProductVariant.idSize)
+        .where(ProductVariant.status == 'Activo')
+    )
+    if product_ids is not None:
+        stmt = stmt.where(ProductVariant.idProduct.in_(list(product_ids)))
+    return connection.execute(stmt).all()
+
+
+def filters_from_args(args):
+    """Filtros de facetas desde la query string (?color=Rojo,Azul&price=25-50&in_stock=1)"""
+    filters = {}
+    for facet in ('color', 'size', 'price'):
+        values = {value.strip() for raw in args.getlist(facet) for value in raw.split(',') if value.strip()}
+        if values:
+            filters[facet] = values
+    if args.get('in_stock', '').lower() in ('1', 'true', 'si', 'sí'):
+        filters['stock'] = {IN_STOCK}
+    return filters
+
+
+product_facets = FacetIndex()
+
+
+@register_product_listener
+def _update_product_facets(rows, deleted_ids):
+    if product_facets.ready:
+        product_facets.apply_changes(rows, deleted_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_variant_changes(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, ProductVariant) and obj.idProduct is not None:
+            session.info.setdefault(_PENDING_KEY, set()).add(obj.idProduct)
+        elif isinstance(obj, (Color, Size)):
+            # Renombrar un color o talla cambia los valores de muchas variantes
+            session.info[_STALE_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_variant_changes(session):
+    product_ids = session.info.pop(_PENDING_KEY, None)
+    if session.info.pop(_STALE_KEY, False):
+        product_facets.ready = False
+        return
+    if not product_ids or not product_facets.ready:
+        return
+    try:
+        with session.get_bind().connect() as connection:
+            product_facets.apply_variant_changes(product_ids, _load_variant_rows(connection, product_ids))
+    except Exception as e:
+        print(f"⚠️  No se pudieron actualizar las facetas de variantes: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_variant_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_STALE_KEY, None)
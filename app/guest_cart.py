@@ -0,0 +1,120 @@
+from flask import session
+from flask_login import user_logged_in
+
+from app.cart_store import merge_items
+from app.models1 import db
+from app.product_cache import product_cache
+
+# El carrito del invitado vive en la cookie de sesión de Flask (firmada con
+# SECRET_KEY); se acota para no acercarse al límite de ~4 KB de una cookie
+GUEST_CART_KEY = 'guest_cart'
+GUEST_CART_MAX_LINES = 30
+GUEST_CART_MAX_QUANTITY = 99
+
+
+def _items():
+    """{'idProduct': cantidad} (las claves son texto por la serialización JSON)"""
+    items = session.get(GUEST_CART_KEY)
+    return dict(items) if isinstance(items, dict) else {}
+
+
+def _save(items):
+    if items:
+        session[GUEST_CART_KEY] = items
+    else:
+        session.pop(GUEST_CART_KEY, None)
+
+
+def guest_count():
+    # Sin cookie no se escribe nada: los bots que no compran no generan sesión
+    return len(_items())
+
+
+def guest_add(product, quantity):
+    """Como add_item para el invitado: (agregado, cantidad de la línea, líneas, mensaje)"""
+    items = _items()
+    key = str(product.idProduct)
+    current = items.get(key, 0)
+    if key not in items and len(items) >= GUEST_CART_MAX_LINES:
+        return False, current, len(items), f'El carrito admite hasta {GUEST_CART_MAX_LINES} productos'
+    if product.status != 'Activo' or current + quantity > product.stock:
+        return False, current, len(items), 'No hay suficiente stock disponible'
+    if current + quantity > GUEST_CART_MAX_QUANTITY:
+        return False, current, len(items), f'Máximo {GUEST_CART_MAX_QUANTITY} unidades por producto'
+    items[key] = current + quantity
+    _save(items)
+    return True, items[key], len(items), None
+
+
+def guest_update(product, quantity):
+    items = _items()
+    key = str(product.idProduct)
+    if key not in items:
+        return False, 'Item no encontrado'
+    if quantity > product.stock or quantity > GUEST_CART_MAX_QUANTITY:
+        return False, 'No hay suficiente stock disponible'
+    items[key] = quantity
+    _save(items)
+    return True, None
+
+
+def guest_remove(product_id):
+    """Quita la línea (en el carrito del invitado el id de línea es el idProduct)"""
+    items = _items()
+    removed = items.pop(str(product_id), None) is not None
+    if removed:
+        _save(items)
+    return removed, len(items)
+
+
+def guest_clear():
+    session.pop(GUEST_CART_KEY, None)
+
+
+def guest_lines():
+    """(líneas, total) con el mismo formato que load_cart, desde la caché de productos"""
+    lines = []
+    total = 0
+    for key, quantity in _items().items():
+        product = product_cache.get(key)
+        if product is None:
+            continue
+        subtotal = float(product.price) * quantity
+        total += subtotal
+        lines.append({
+            'id': product.idProduct,
+            'product_id': product.idProduct,
+            'name': product.nameProduct,
+            'price': float(product.price),
+            'quantity': quantity,
+            'image': product.image,
+            'stock': product.stock,
+            'subtotal': subtotal
+        })
+    return lines, total
+
+
+def merge_guest_cart(user_id):
+    """Pasa el carrito del invitado a cart_item en un solo upsert"""
+    quantities = {}
+    for key, quantity in _items().items():
+        product = product_cache.get(key)
+        # Solo productos que siguen a la venta, con la cantidad acotada al stock actual
+        if product is None or product.status != 'Activo' or product.stock <= 0:
+            continue
+        quantities[product.idProduct] = min(int(quantity), product.stock)
+    if quantities:
+        merge_items(user_id, quantities)
+    guest_clear()
+
+
+@user_logged_in.connect
+def _merge_on_login(sender, user, **extra):
+    if GUEST_CART_KEY not in session:
+        return
+    try:
+        merge_guest_cart(user.idUser)
+    except Exception as e:
+        # El login no falla por el carrito: la cookie se conserva para el próximo login
+        db.session.rollback()
+        print(f"⚠️  No se pudo fusionar el carrito de invitado: {e}")
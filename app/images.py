@@ -0,0 +1,199 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow es opcional: sin él solo se guarda y sirve el original
+    Image = None
+    ImageOps = None
+
+# Ancho máximo de cada derivado (se conserva la proporción, nunca se amplía)
+DERIVATIVES = {
+    'thumb': 160,
+    'card': 400,
+    'detail': 900,
+}
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp', 'gif'}
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+IMAGE_WORKERS = 2
+# Los archivos nunca cambian (la ruta es el hash del contenido)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+URL_PREFIX = '/img/'
+_LOCAL_URL = re.compile(r'^/img/([0-9a-f]{64})/')
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+# Firmas de los formatos aceptados cuando Pillow no está instalado
+_MAGIC = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a')
+
+
+def is_digest(value):
+    return bool(_DIGEST.match(value or ''))
+
+
+def local_digest(url):
+    """Hash de una imagen local a partir de su URL (/img/<hash>/...), o None"""
+    match = _LOCAL_URL.match(url or '')
+    return match.group(1) if match else None
+
+
+def image_url(digest, variant='detail', fmt='jpg'):
+    return f'{URL_PREFIX}{digest}/{variant}.{fmt}'
+
+
+def image_src(url, variant='card', fmt='jpg'):
+    """URL del derivado `variant` si la imagen es local; si no, la URL tal cual"""
+    digest = local_digest(url)
+    return image_url(digest, variant, fmt) if digest else url
+
+
+def image_srcset(url, fmt='jpg'):
+    """srcset con todos los derivados de una imagen local ('' para URLs externas)"""
+    digest = local_digest(url)
+    if not digest:
+        return ''
+    return ', '.join(f'{image_url(digest, variant, fmt)} {width}w' for variant, width in DERIVATIVES.items())
+
+
+class ImageStore:
+    """Originales y derivados en disco, direccionados por el SHA-256 del original.
+
+    originals/<ab>/<hash>          archivo subido
+    derivatives/<ab>/<hash>/<variante>.<formato>
+    """
+
+    def __init__(self, root=None, workers=IMAGE_WORKERS):
+        self.root = root
+        self.workers = workers
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.root = app.config.get('IMAGE_STORAGE_DIR') or os.path.join(app.instance_path, 'images')
+        os.makedirs(self.root, exist_ok=True)
+        if Image is None:
+            print("⚠️  Pillow no está instalado: las imágenes se servirán sin derivados")
+
+    def original_path(self, digest):
+        return os.path.join(self.root, 'originals', digest[:2], digest)
+
+    def derivative_path(self, digest, variant, fmt):
+        return os.path.join(self.root, 'derivatives', digest[:2], digest, f'{variant}.{fmt}')
+
+    @staticmethod
+    def _atomic_write(path, write):
+        # Se escribe a un temporal del mismo directorio y se renombra: nunca se sirve un archivo a medias
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                write(handle)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save_upload(self, stream, filename):
+        """Guarda el archivo subido y devuelve su hash; ValueError si no es una imagen válida"""
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in (filename or '') else ''
+        if extension not in ALLOWED_EXTENSIONS:
+            raise ValueError('Formato no permitido (usa JPG, PNG, WEBP o GIF)')
+
+        # Lectura por bloques: hash y copia a un temporal sin cargar todo en memoria
+        os.makedirs(os.path.join(self.root, 'originals'), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, 'originals'), prefix='.upload-')
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                while True:
+                    chunk = stream.read(64 * 1024)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > MAX_UPLOAD_BYTES:
+                        raise ValueError(f'La imagen supera {MAX_UPLOAD_BYTES // (1024 * 1024)} MB')
+                    digest.update(chunk)
+                    handle.write(chunk)
+            self._validate(tmp_path)
+            digest = digest.hexdigest()
+            path = self.original_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            return digest
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _validate(path):
+        if Image is not None:
+            try:
+                with Image.open(path) as image:
+                    image.verify()
+            except Exception:
+                raise ValueError('El archivo no es una imagen válida')
+            return
+        with open(path, 'rb') as handle:
+            head = handle.read(12)
+        if not (head.startswith(_MAGIC) or (head[:4] == b'RIFF' and head[8:12] == b'WEBP')):
+            raise ValueError('El archivo no es una imagen válida')
+
+    def has_derivatives(self, digest):
+        return all(os.path.exists(self.derivative_path(digest, variant, fmt))
+                   for variant in DERIVATIVES for fmt in FORMATS)
+
+    def generate(self, digest):
+        """Crea los derivados que falten (se abre y decodifica el original una sola vez)"""
+        if Image is None:
+            return 0
+        written = 0
+        with Image.open(self.original_path(digest)) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'RGBA'):
+                original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+            for variant, width in DERIVATIVES.items():
+                resized = original.copy()
+                resized.thumbnail((width, width * 4), Image.LANCZOS)
+                for fmt, (pil_format, _, options) in FORMATS.items():
+                    path = self.derivative_path(digest, variant, fmt)
+                    if os.path.exists(path):
+                        continue
+                    frame = resized.convert('RGB') if pil_format == 'JPEG' and resized.mode != 'RGB' else resized
+                    self._atomic_write(path, lambda handle: frame.save(handle, pil_format, **options))
+                    written += 1
+        return written
+
+    def submit(self, digest):
+        """Encola la generación de derivados en el pool de fondo (sin duplicados)"""
+        if Image is None:
+            return
+        with self._lock:
+            if digest in self._pending:
+                return
+            self._pending.add(digest)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='images')
+        self._executor.submit(self._generate_task, digest)
+
+    def _generate_task(self, digest):
+        try:
+            self.generate(digest)
+        except Exception as e:
+            print(f"⚠️  Error generando derivados de {digest[:12]}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(digest)
+
+
+image_store = ImageStore()
@@ -46,7 +46,9 @@ class User(db.Model, UserMixin):
         return CartItem.query.filter_by(idUser=self.idUser).all()
     
     def get_cart_count(self):
-        return CartItem.query.filter_by(idUser=self.idUser).count()
+        # ✅ Contador cacheado por usuario (ver app/cart_count.py)
+        from app.cart_count import cart_counts
+        return cart_counts.get(self.idUser)
 
     def __repr__(self):
         return f'<User {self.nameUser}>'
@@ -82,8 +84,25 @@ class Product(db.Model):
     image = db.Column(db.String(255))
     status = db.Column(db.Enum('Activo', 'Inactivo'), default='Activo')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Categoría normalizada; `category` se conserva como texto heredado
+    category_id = db.Column(db.Integer, db.ForeignKey('category.idCategory'))
+    # Unidades vendidas (pedidos no cancelados); lo recalcula app/sales_rank.py
+    sales_rank = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Un índice por cada orden del catálogo (ver CATALOG_SORTS en app/pagination.py):
+    # listados generales por (status, ...), páginas de categoría por (category_id, status, ...)
+    __table_args__ = (
+        db.Index('ix_product_category_status_created', 'category_id', 'status', 'created_at'),
+        db.Index('ix_product_category_status_price', 'category_id', 'status', 'price'),
+        db.Index('ix_product_category_status_sales', 'category_id', 'status', 'sales_rank'),
+        db.Index('ix_product_status_price', 'status', 'price'),
+        db.Index('ix_product_status_created', 'status', 'created_at'),
+        db.Index('ix_product_status_sales', 'status', 'sales_rank'),
+    )
 
     # Relaciones
+    category_ref = db.relationship('Category', backref='products', lazy=True)
     cart_items = db.relationship('CartItem', backref='product', lazy=True)
     order_details = db.relationship('OrderDetail', backref='product', lazy=True)
     invoice_items = db.relationship('InvoiceItem', backref='product', lazy=True)
@@ -141,6 +160,11 @@ class CartItem(db.Model):
     quantity = db.Column(db.Integer, default=1, nullable=False)
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Una línea por producto y usuario: permite el upsert atómico de app/cart_store.py
+    __table_args__ = (
+        db.UniqueConstraint('idUser', 'idProduct', name='uq_cart_item_user_product'),
+    )
+
     def __repr__(self):
         return f'<CartItem User:{self.idUser} Product:{self.idProduct}>'
 
@@ -323,6 +347,32 @@ class ProductImage(db.Model):
     def __repr__(self):
         return f'<ProductImage {self.idImage}>'
 
+class ProductRelated(db.Model):
+    """Productos relacionados precalculados (top-N por producto)"""
+    __tablename__ = 'product_related'
+
+    idProduct = db.Column(db.Integer, db.ForeignKey('product.idProduct', ondelete='CASCADE'), primary_key=True)
+    # ids separados por comas, ya ordenados por puntaje
+    related_ids = db.Column(db.String(255), nullable=False, default='')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def id_list(self):
+        return [int(value) for value in self.related_ids.split(',') if value]
+
+    def __repr__(self):
+        return f'<ProductRelated {self.idProduct}>'
+
+class DataVersion(db.Model):
+    """Contador de versión por conjunto de datos (catalog, orders, users)"""
+    __tablename__ = 'data_version'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DataVersion {self.name}={self.version}>'
+
 # ✅ Métodos de utilidad para la base de datos
 def init_db(app):
     """Inicializar la base de datos con la aplicación"""
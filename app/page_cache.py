@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, make_response, request, session
+from flask_login import current_user
+
+from app.catalog_events import register_product_listener
+
+# Páginas completas guardadas (LRU) y su vida máxima en segundos
+PAGE_CACHE_MAX_ENTRIES = 500
+PAGE_CACHE_TTL = 300
+
+CATALOG_TAG = 'catalog'
+
+
+def product_tag(product_id):
+    return f'product:{product_id}'
+
+
+def category_tag(category_id):
+    return f'category:{category_id}'
+
+
+class PageCache:
+    """HTML renderizado de las páginas públicas del catálogo.
+
+    Cada entrada lleva etiquetas (producto, categoría, catálogo) y un cambio
+    de producto borra solo las páginas que lo muestran. Es por proceso: con
+    varios workers cada uno invalida el suyo y el TTL acota lo demás.
+    """
+
+    def __init__(self, max_entries=PAGE_CACHE_MAX_ENTRIES, ttl=PAGE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # clave -> (expira, cuerpo, etiquetas)
+        self._tagged = {}               # etiqueta -> {claves}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, body, tags):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body, frozenset(tags))
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tagged.get(tag, set())
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+
+
+page_cache = PageCache()
+
+
+def tag_page(*tags):
+    """Etiquetas de la página en curso; sin etiquetas la página no se guarda"""
+    g.setdefault('page_cache_tags', set()).update(tags)
+
+
+def _cacheable():
+    # Solo visitantes anónimos sin mensajes flash pendientes
+    return (request.method == 'GET'
+            and not current_user.is_authenticated
+            and '_flashes' not in session)
+
+
+def cached_page(view):
+    """Sirve la página desde page_cache para visitantes anónimos"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _cacheable():
+            return view(*args, **kwargs)
+
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        body = page_cache.get(key)
+        if body is not None:
+            response = Response(body, mimetype='text/html')
+            response.headers['X-Page-Cache'] = 'HIT'
+            return response
+
+        response = make_response(view(*args, **kwargs))
+        tags = g.pop('page_cache_tags', None)
+        if response.status_code == 200 and tags:
+            page_cache.set(key, response.get_data(), tags)
+        response.headers['X-Page-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+@register_product_listener
+def _invalidate_product_pages(rows, deleted_ids):
+    tags = {CATALOG_TAG}
+    tags.update(product_tag(product_id) for product_id in deleted_ids)
+    for row in rows:
+        tags.add(product_tag(row['idProduct']))
+        if row.get('category_id') is not None:
+            tags.add(category_tag(row['category_id']))
+    page_cache.invalidate(tags)
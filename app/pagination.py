@@ -0,0 +1,245 @@
+import base64
+import binascii
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+
+from flask import request, url_for
+from sqlalchemy.orm import undefer
+
+from app.models1 import db, Product
+
+# Orden por defecto del catálogo: la PK es única y nunca nula, así el cursor
+# siempre es estable
+CATALOG_KEYS = [(Product.idProduct, False)]
+
+# ✅ Órdenes del catálogo (?sort=). Cada uno termina en la PK y tiene su índice
+# compuesto (status, columna) / (category_id, status, columna): en InnoDB y
+# SQLite el índice secundario ya incluye la PK, así que el ORDER BY completo
+# se resuelve recorriendo un rango del índice, sin filesort
+CATALOG_SORTS = {
+    'default': CATALOG_KEYS,
+    'price_asc': [(Product.price, False), (Product.idProduct, False)],
+    'price_desc': [(Product.price, True), (Product.idProduct, True)],
+    'newest': [(Product.created_at, True), (Product.idProduct, True)],
+    'best_selling': [(Product.sales_rank, True), (Product.idProduct, True)],
+}
+
+SORT_LABELS = {
+    'default': 'Destacados',
+    'price_asc': 'Precio: menor a mayor',
+    'price_desc': 'Precio: mayor a menor',
+    'newest': 'Más recientes',
+    'best_selling': 'Más vendidos',
+}
+
+# Segundos que se reutiliza un conteo aproximado antes de volver a calcularlo
+APPROX_COUNT_TTL = 60
+# Las claves salen de la URL (categoría, texto buscado): el tamaño es acotado
+APPROX_COUNT_MAX_ENTRIES = 2000
+# Filas (solo columnas de orden) que lee cada paso de keyset_filter_ids
+KEYSET_SCAN_BATCH = 500
+
+_count_cache = OrderedDict()   # clave -> (expira, total), en orden de uso
+_count_lock = threading.Lock()
+
+
+def cursor_mode_requested(args):
+    """Indica si la petición pidió paginación por cursor (?after= / ?before=)"""
+    return 'after' in args or 'before' in args
+
+
+def page_url(**params):
+    """URL de la vista actual con otra página (page / after / before).
+
+    Conserva el resto de argumentos de la petición (orden, filtros, ...).
+    """
+    args = request.args.to_dict(flat=False)
+    for key in ('page', 'after', 'before'):
+        args.pop(key, None)
+    args.update((key, value) for key, value in params.items() if value is not None)
+    args.update(request.view_args or {})
+    return url_for(request.endpoint, **args)
+
+
+def catalog_sort(args):
+    """(nombre, claves) del orden pedido en ?sort=; 'default' si no es válido"""
+    name = args.get('sort', 'default')
+    if name not in CATALOG_SORTS:
+        name = 'default'
+    return name, CATALOG_SORTS[name]
+
+
+def sorted_query(query, keys):
+    """Ordena por `keys` asegurando que sus columnas se cargan (el cursor las lee)"""
+    options = [undefer(column) for column, _ in keys if column.key != 'idProduct']
+    if options:
+        query = query.options(*options)
+    return query.order_by(*_ordering(keys))
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _load_value(column, value):
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    if python_type in (int, float, str):
+        return python_type(value)
+    return value
+
+
+def encode_cursor(values):
+    """Convierte los valores de la clave de orden en un token opaco para la URL"""
+    raw = json.dumps([_dump_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, keys):
+    """Devuelve los valores del cursor o None si el token no es válido"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(keys):
+            return None
+        return [_load_value(column, value) for (column, _), value in zip(keys, values)]
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def _seek_condition(keys, values, forward):
+    # (a, b) > (x, y) expandido en OR/AND para que MySQL y SQLite usen el índice
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        goes_down = descending if forward else not descending
+        step = column < values[i] if goes_down else column > values[i]
+        equals = [keys[j][0] == values[j] for j in range(i)]
+        clauses.append(db.and_(*equals, step))
+    return db.or_(*clauses)
+
+
+def _ordering(keys, reverse=False):
+    return [
+        column.desc() if descending != reverse else column.asc()
+        for column, descending in keys
+    ]
+
+
+class KeysetPage:
+    """Página obtenida por búsqueda de clave (seek), sin COUNT ni OFFSET"""
+
+    def __init__(self, items, keys, has_next, has_prev):
+        self.items = items
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = self._cursor_for(items[-1], keys) if items and has_next else None
+        self.prev_cursor = self._cursor_for(items[0], keys) if items and has_prev else None
+
+    @staticmethod
+    def _cursor_for(item, keys):
+        return encode_cursor([getattr(item, column.key) for column, _ in keys])
+
+    def to_dict(self):
+        return {
+            'has_next': self.has_next,
+            'has_prev': self.has_prev,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor
+        }
+
+
+def keyset_paginate(query, keys, per_page, after=None, before=None):
+    """Pagina `query` por las columnas `keys` [(columna, descendente), ...].
+
+    Las columnas deben formar una clave única y no nula (terminar en la PK).
+    Se pide una fila extra para saber si existe otra página sin contar el total.
+    """
+    backward = bool(before)
+    values = decode_cursor(before if backward else after, keys)
+    if values is None:
+        backward = False
+
+    if values is not None:
+        query = query.filter(_seek_condition(keys, values, forward=not backward))
+    rows = query.order_by(None).order_by(*_ordering(keys, reverse=backward)).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        rows.reverse()
+        return KeysetPage(rows, keys, has_next=True, has_prev=has_more)
+    return KeysetPage(rows, keys, has_next=has_more, has_prev=values is not None)
+
+
+def keyset_filter_ids(query, keys, keep, offset, limit, batch_size=KEYSET_SCAN_BATCH):
+    """ids de `query` en el orden `keys` que cumplen keep(id), desde `offset`.
+
+    Recorre el índice de orden por lotes con LIMIT y seek, leyendo solo las
+    columnas de la clave (la última es la PK), y se detiene al llenar la
+    página: el filtro se aplica en memoria en lugar de un IN con todo el conjunto.
+    """
+    columns = [column for column, _ in keys]
+    base = query.with_entities(*columns).order_by(None).order_by(*_ordering(keys))
+    found = []
+    skipped = 0
+    values = None
+    while True:
+        batch = base
+        if values is not None:
+            batch = batch.filter(_seek_condition(keys, values, forward=True))
+        rows = batch.limit(batch_size).all()
+        for row in rows:
+            if not keep(row[-1]):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            found.append(row[-1])
+            if len(found) >= limit:
+                return found
+        if len(rows) < batch_size:
+            return found
+        values = list(rows[-1])
+
+
+def approximate_count(cache_key, query, ttl=APPROX_COUNT_TTL):
+    """Total por filtro reutilizado durante `ttl` segundos para no contar en cada página"""
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(cache_key)
+        if cached is not None:
+            if cached[0] > now:
+                _count_cache.move_to_end(cache_key)
+                return cached[1]
+            del _count_cache[cache_key]
+
+    total = query.order_by(None).count()
+
+    with _count_lock:
+        _count_cache[cache_key] = (now + ttl, total)
+        _count_cache.move_to_end(cache_key)
+        # Primero se descartan los vencidos más antiguos y luego por LRU
+        while _count_cache:
+            oldest_key, (expires, _) = next(iter(_count_cache.items()))
+            if expires > now and len(_count_cache) <= APPROX_COUNT_MAX_ENTRIES:
+                break
+            del _count_cache[oldest_key]
+    return total
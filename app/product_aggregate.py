@@ -0,0 +1,128 @@
+from collections import namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.catalog_events import register_product_listener
+from app.models1 import Color, Product, ProductImage, ProductVariant, Size, db
+from app.product_cache import ProductCache
+from app.serializers import ProductDetail
+
+AGGREGATE_CACHE_MAX_ENTRIES = 1000
+
+_PENDING_KEY = 'aggregate_changed_products'
+_STALE_KEY = 'aggregate_cache_stale'
+
+VariantView = namedtuple('VariantView', 'id sku color hex_code size price stock status')
+ImageView = namedtuple('ImageView', 'id url is_main')
+
+
+class ProductAggregate:
+    """Producto de la página de detalle ya armado: datos, variantes, colores,
+    tallas e imágenes. Es inmutable y se comparte entre peticiones."""
+
+    __slots__ = ('product', 'category_id', 'updated_at', 'variants', 'images', 'colors', 'sizes')
+
+    def __init__(self, product):
+        variants = []
+        colors = {}
+        sizes = []
+        for variant in sorted(product.variants, key=lambda v: v.idVariant):
+            if variant.status != 'Activo':
+                continue
+            color = variant.color.nameColor if variant.color is not None else None
+            size = variant.size.nameSize if variant.size is not None else None
+            variants.append(VariantView(
+                id=variant.idVariant,
+                sku=variant.sku,
+                color=color,
+                hex_code=variant.color.hex_code if variant.color is not None else None,
+                size=size,
+                price=float((product.price or 0) + (variant.price_extra or 0)),
+                stock=variant.stock or 0,
+                status=variant.status
+            ))
+            if color and color not in colors:
+                colors[color] = variant.color.hex_code
+            if size and size not in sizes:
+                sizes.append(size)
+
+        # Imagen principal primero y luego por antigüedad
+        images = sorted(product.additional_images, key=lambda image: (not image.is_main, image.idImage))
+
+        object.__setattr__(self, 'product', ProductDetail(product))
+        object.__setattr__(self, 'category_id', product.category_id)
+        object.__setattr__(self, 'updated_at', product.updated_at)
+        object.__setattr__(self, 'variants', tuple(variants))
+        object.__setattr__(self, 'images', tuple(ImageView(image.idImage, image.image_url, bool(image.is_main))
+                                                 for image in images))
+        object.__setattr__(self, 'colors', tuple(colors.items()))
+        object.__setattr__(self, 'sizes', tuple(sizes))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ProductAggregate es de solo lectura')
+
+    @property
+    def status(self):
+        return self.product.status
+
+    def to_dict(self):
+        data = self.product.to_dict()
+        data.update({
+            'variants': [variant._asdict() for variant in self.variants],
+            'images': [image._asdict() for image in self.images],
+            'colors': [{'name': name, 'hex_code': hex_code} for name, hex_code in self.colors],
+            'sizes': list(self.sizes)
+        })
+        return data
+
+
+def load_product_aggregate(product_id):
+    """Producto + variantes (con color y talla) + imágenes en 3 consultas fijas"""
+    with Session(db.engine) as session:
+        product = session.query(Product).options(
+            selectinload(Product.variants).joinedload(ProductVariant.color),
+            selectinload(Product.variants).joinedload(ProductVariant.size),
+            selectinload(Product.additional_images)
+        ).filter(Product.idProduct == product_id).first()
+        return ProductAggregate(product) if product is not None else None
+
+
+class ProductAggregateCache(ProductCache):
+    """Mismo LRU/TTL/negativos que ProductCache, guardando el agregado completo"""
+
+    def _load(self, product_id):
+        return load_product_aggregate(product_id)
+
+
+product_aggregates = ProductAggregateCache(max_entries=AGGREGATE_CACHE_MAX_ENTRIES)
+
+
+@register_product_listener
+def _invalidate_product_aggregates(rows, deleted_ids):
+    product_aggregates.invalidate([row['idProduct'] for row in rows] + list(deleted_ids))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_aggregate_changes(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, (ProductVariant, ProductImage)) and obj.idProduct is not None:
+            session.info.setdefault(_PENDING_KEY, set()).add(obj.idProduct)
+        elif isinstance(obj, (Color, Size)):
+            # Un color o talla aparece en muchos productos
+            session.info[_STALE_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_aggregates(session):
+    product_ids = session.info.pop(_PENDING_KEY, None)
+    if session.info.pop(_STALE_KEY, False):
+        product_aggregates.clear()
+    elif product_ids:
+        product_aggregates.invalidate(product_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_aggregate_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_STALE_KEY, None)
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import abort
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.catalog_events import register_product_listener
+from app.models1 import Product, db
+
+PRODUCT_CACHE_MAX_ENTRIES = 5000
+PRODUCT_CACHE_TTL = 60
+# Los ids inexistentes se recuerdan poco tiempo (bots que prueban ids)
+NEGATIVE_TTL = 15
+
+_MISSING = object()
+
+
+class CachedProduct:
+    """Copia de solo lectura de una fila de product.
+
+    Tiene los mismos atributos de columna que Product, así sirve para los
+    serializadores y validaciones, pero no está ligada a ninguna sesión.
+    """
+
+    def __init__(self, row):
+        self.__dict__.update(row)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CachedProduct es de solo lectura; usa Product para modificar')
+
+    def __repr__(self):
+        return f'<CachedProduct {self.idProduct}>'
+
+
+class ProductCache:
+    """Caché read-through de Product por id con LRU, TTL y entradas negativas"""
+
+    def __init__(self, max_entries=PRODUCT_CACHE_MAX_ENTRIES, ttl=PRODUCT_CACHE_TTL,
+                 negative_ttl=NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self._entries = OrderedDict()   # id -> (expira, CachedProduct o _MISSING)
+        # Sube con cada invalidación: una lectura que empezó antes no se guarda
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self, product_id):
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(Product.__table__).where(Product.idProduct == product_id)
+            ).mappings().first()
+        return CachedProduct(row) if row is not None else None
+
+    def get(self, product_id):
+        """CachedProduct o None si el producto no existe"""
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is not None and entry[0] >= now:
+                self._entries.move_to_end(product_id)
+                if entry[1] is _MISSING:
+                    self.negative_hits += 1
+                    return None
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        product = self._load(product_id)
+
+        with self._lock:
+            if generation == self._generation:
+                ttl = self.ttl if product is not None else self.negative_ttl
+                self._entries[product_id] = (now + ttl, product if product is not None else _MISSING)
+                self._entries.move_to_end(product_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return product
+
+    def get_or_404(self, product_id):
+        product = self.get(product_id)
+        if product is None:
+            abort(404)
+        return product
+
+    def invalidate(self, ids):
+        with self._lock:
+            self._generation += 1
+            for product_id in ids:
+                self._entries.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0
+            }
+
+
+product_cache = ProductCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_flushed_products(session, flush_context):
+    ids = [obj.idProduct for obj in session.new | session.dirty | session.deleted
+           if isinstance(obj, Product) and obj.idProduct is not None]
+    if ids:
+        product_cache.invalidate(ids)
+
+
+@register_product_listener
+def _invalidate_committed_products(rows, deleted_ids):
+    # Tras el commit: descarta lo que otro hilo haya leído entre flush y commit
+    product_cache.invalidate([row['idProduct'] for row in rows] + list(deleted_ids))
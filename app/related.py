@@ -0,0 +1,273 @@
+import queue
+import threading
+from bisect import bisect_left
+from datetime import datetime
+
+from sqlalchemy import and_, delete, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.catalog_events import register_product_listener
+from app.models1 import Order, OrderDetail, Product, ProductRelated, db
+from app.search_index import fold_accents
+
+# Cuántos relacionados se guardan por producto
+RELATED_LIMIT = 4
+# Vecinos por precio (a cada lado) que se evalúan dentro de la categoría
+CANDIDATE_WINDOW = 12
+# Pesos del puntaje
+CATEGORY_WEIGHT = 2.0
+PRICE_WEIGHT = 1.0
+COPURCHASE_WEIGHT = 3.0
+# Con este número de pedidos compartidos la compra conjunta aporta la mitad
+COPURCHASE_HALF = 2
+# Recalculo completo periódico (segundos) además de los incrementales
+FULL_REFRESH_INTERVAL = 6 * 60 * 60
+WRITE_CHUNK = 500
+
+_PENDING_KEY = 'related_changed_products'
+
+
+def _category_key(category_id, category):
+    # Productos aún sin category_id se agrupan por el texto de la categoría
+    if category_id is not None:
+        return category_id
+    return fold_accents(category).strip() if category else None
+
+
+def _price_proximity(a, b):
+    a, b = float(a or 0), float(b or 0)
+    top = max(a, b)
+    return 1.0 if top <= 0 else 1.0 - abs(a - b) / top
+
+
+def _score(source, other, copurchased):
+    score = PRICE_WEIGHT * _price_proximity(source[1], other[1])
+    if source[0] is not None and source[0] == other[0]:
+        score += CATEGORY_WEIGHT
+    if copurchased:
+        score += COPURCHASE_WEIGHT * copurchased / (copurchased + COPURCHASE_HALF)
+    return score
+
+
+def compute_related(catalog, copurchase, targets, limit=RELATED_LIMIT):
+    """Top-N relacionados para cada id de `targets`.
+
+    catalog: {idProduct: (clave de categoría, precio)} de productos activos
+    copurchase: {idProduct: {otro idProduct: pedidos en común}}
+    """
+    by_category = {}
+    for product_id, (key, price) in catalog.items():
+        if key is not None:
+            by_category.setdefault(key, []).append((float(price or 0), product_id))
+    for peers in by_category.values():
+        peers.sort()
+
+    results = {}
+    for product_id in targets:
+        source = catalog.get(product_id)
+        if source is None:
+            # Inactivo o eliminado: su fila se borra
+            results[product_id] = None
+            continue
+        bought_with = copurchase.get(product_id, {})
+
+        # Candidatos: vecinos de precio en la misma categoría + comprados juntos
+        candidates = set(other for other in bought_with if other in catalog)
+        peers = by_category.get(source[0], [])
+        position = bisect_left(peers, (float(source[1] or 0), product_id))
+        for _, other in peers[max(0, position - CANDIDATE_WINDOW):position + CANDIDATE_WINDOW + 1]:
+            candidates.add(other)
+        candidates.discard(product_id)
+
+        ranked = sorted(
+            candidates,
+            key=lambda other: (-_score(source, catalog[other], bought_with.get(other, 0)), other)
+        )
+        results[product_id] = ranked[:limit]
+    return results
+
+
+def _load_catalog(connection):
+    rows = connection.execute(
+        select(Product.idProduct, Product.category_id, Product.category, Product.price)
+        .where(Product.status == 'Activo')
+    )
+    return {row.idProduct: (_category_key(row.category_id, row.category), row.price) for row in rows}
+
+
+def _load_copurchase(connection, ids=None):
+    first = OrderDetail.__table__.alias('first')
+    second = OrderDetail.__table__.alias('second')
+    stmt = (
+        select(first.c.idProduct, second.c.idProduct, func.count(func.distinct(first.c.idOrder)))
+        .join(second, and_(first.c.idOrder == second.c.idOrder,
+                           first.c.idProduct != second.c.idProduct))
+        .join(Order.__table__, Order.idOrder == first.c.idOrder)
+        .where(Order.status != 'Cancelado')
+        .group_by(first.c.idProduct, second.c.idProduct)
+    )
+    pairs = {}
+    id_list = list(ids) if ids is not None else [None]
+    for start in range(0, len(id_list), WRITE_CHUNK):
+        chunk_stmt = stmt if ids is None else stmt.where(first.c.idProduct.in_(id_list[start:start + WRITE_CHUNK]))
+        for product_id, other_id, orders in connection.execute(chunk_stmt):
+            pairs.setdefault(product_id, {})[other_id] = orders
+    return pairs
+
+
+def _store(connection, results):
+    """Escribe solo las filas cuyo contenido cambió"""
+    table = ProductRelated.__table__
+    ids = list(results)
+    existing = {}
+    for start in range(0, len(ids), WRITE_CHUNK):
+        existing.update(connection.execute(
+            select(table.c.idProduct, table.c.related_ids)
+            .where(table.c.idProduct.in_(ids[start:start + WRITE_CHUNK]))
+        ).all())
+
+    now = datetime.utcnow()
+    stale = []
+    fresh = []
+    for product_id, related in results.items():
+        value = None if related is None else ','.join(str(other) for other in related)
+        if existing.get(product_id) == value:
+            continue
+        if product_id in existing:
+            stale.append(product_id)
+        if value is not None:
+            fresh.append({'idProduct': product_id, 'related_ids': value, 'updated_at': now})
+
+    for start in range(0, len(stale), WRITE_CHUNK):
+        connection.execute(delete(table).where(table.c.idProduct.in_(stale[start:start + WRITE_CHUNK])))
+    for start in range(0, len(fresh), WRITE_CHUNK):
+        connection.execute(insert(table), fresh[start:start + WRITE_CHUNK])
+    return len(fresh)
+
+
+def refresh_related(ids=None):
+    """Recalcula los relacionados de todo el catálogo o de lo afectado por `ids`"""
+    with db.engine.begin() as connection:
+        catalog = _load_catalog(connection)
+        if ids is None:
+            targets = set(catalog)
+            copurchase = _load_copurchase(connection)
+            # Filas de productos que ya no están activos
+            targets.update(connection.execute(select(ProductRelated.idProduct)).scalars())
+        else:
+            ids = set(ids)
+            # Un cambio afecta a su categoría y a los productos comprados con él;
+            # la categoría se lee de la tabla porque puede estar ya inactivo
+            keys = set()
+            id_list = list(ids)
+            for start in range(0, len(id_list), WRITE_CHUNK):
+                keys.update(_category_key(category_id, category) for category_id, category in connection.execute(
+                    select(Product.category_id, Product.category)
+                    .where(Product.idProduct.in_(id_list[start:start + WRITE_CHUNK]))
+                ))
+            targets = set(ids)
+            targets.update(product_id for product_id, (key, _) in catalog.items()
+                           if key is not None and key in keys)
+            for partners in _load_copurchase(connection, ids).values():
+                targets.update(partners)
+            copurchase = _load_copurchase(connection, targets)
+        return _store(connection, compute_related(catalog, copurchase, targets))
+
+
+def related_product_ids(product_id):
+    """ids relacionados precalculados (lectura por PK), o None si aún no existen"""
+    row = db.session.get(ProductRelated, product_id)
+    return row.id_list() if row is not None else None
+
+
+class RelatedProductsRefresher:
+    """Hilo de fondo que mantiene `product_related` al día.
+
+    Los cambios de productos y pedidos se encolan y se procesan por lotes, así
+    el commit que los originó no espera al recálculo.
+    """
+
+    _FULL = object()
+
+    def __init__(self, interval=FULL_REFRESH_INTERVAL):
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._app = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app, full_refresh=True):
+        if self.running:
+            return
+        self._app = app
+        if full_refresh:
+            self._queue.put(self._FULL)
+        self._thread = threading.Thread(target=self._run, name='related-products', daemon=True)
+        self._thread.start()
+
+    def schedule(self, ids=None):
+        if not self.running:
+            return
+        self._queue.put(self._FULL if ids is None else set(ids))
+
+    def _drain(self, first):
+        # Junta todo lo pendiente en un único recálculo
+        full = first is self._FULL
+        ids = set() if full else set(first)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return None if full else ids
+            if item is self._FULL:
+                full = True
+            elif not full:
+                ids.update(item)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                item = self._FULL
+            ids = self._drain(item)
+            if ids is not None and not ids:
+                continue
+            try:
+                with self._app.app_context():
+                    written = refresh_related(ids)
+                if ids is None:
+                    print(f"✅ Productos relacionados recalculados: {written} filas actualizadas")
+            except Exception as e:
+                print(f"⚠️  Error recalculando productos relacionados: {e}")
+
+
+related_refresher = RelatedProductsRefresher()
+
+
+@register_product_listener
+def _schedule_related_products(rows, deleted_ids):
+    related_refresher.schedule({row['idProduct'] for row in rows} | set(deleted_ids))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_order_products(session, flush_context):
+    products = {obj.idProduct for obj in session.new | session.dirty
+                if isinstance(obj, OrderDetail) and obj.idProduct is not None}
+    if products:
+        session.info.setdefault(_PENDING_KEY, set()).update(products)
+
+
+@event.listens_for(Session, 'after_commit')
+def _schedule_order_products(session):
+    products = session.info.pop(_PENDING_KEY, None)
+    if products:
+        related_refresher.schedule(products)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_order_products(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -1,38 +1,34 @@
-from flask import Blueprint, jsonify, request, render_template, flash
-from flask_login import login_required, current_user
+from flask import Blueprint, jsonify, request, render_template, flash, url_for
+from flask_login import current_user
 from app import db
+from app.cart_count import current_cart_count
+from app.cart_store import add_item, clear_items, load_cart, remove_item, remove_orphans
+from app.checkout import CheckoutError, checkout as place_order
+from app.guest_cart import guest_add, guest_clear, guest_lines, guest_remove, guest_update
 from app.models1 import CartItem, Product
+from app.product_cache import product_cache
 from datetime import datetime
 
 cart_bp = Blueprint('cart', __name__)
 
 @cart_bp.route('/cart')
-@login_required
 def view_cart():
     try:
-        cart_items = current_user.get_cart()
-        total = 0
-        cart_data = []
+        if not current_user.is_authenticated:
+            # ✅ Invitado: el carrito sale de la cookie firmada, sin tocar cart_item
+            cart_data, total = guest_lines()
+            return render_template('cart.html', cart_items=cart_data, total=total)
         
-        for item in cart_items:
-            # Asegúrate de que el producto existe
-            if item.product:
-                product_total = float(item.product.price) * item.quantity
-                total += product_total
-                
-                cart_data.append({
-                    'id': item.idCartItem,
-                    'product_id': item.product.idProduct,
-                    'name': item.product.nameProduct,
-                    'price': float(item.product.price),
-                    'quantity': item.quantity,
-                    'image': item.product.image,
-                    'subtotal': product_total
-                })
-            else:
-                # Si el producto fue eliminado, elimina el item del carrito
-                db.session.delete(item)
-                db.session.commit()
+        # ✅ Una sola consulta: líneas + producto + subtotales y total en SQL
+        cart_data, total, orphans = load_cart(current_user.idUser)
+        
+        # Líneas de productos eliminados: un único DELETE para todas
+        if orphans:
+            try:
+                remove_orphans(orphans)
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️  No se pudieron limpiar líneas huérfanas del carrito: {e}")
         
         return render_template('cart.html', cart_items=cart_data, total=total)
     
@@ -41,47 +37,46 @@ def view_cart():
         return render_template('cart.html', cart_items=[], total=0)
 
 @cart_bp.route('/api/cart/add', methods=['POST'])
-@login_required
 def add_to_cart():
     try:
         data = request.get_json()
         product_id = data.get('product_id')
-        quantity = data.get('quantity', 1)
+        try:
+            quantity = int(data.get('quantity', 1))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Cantidad inválida'})
+        if quantity <= 0:
+            return jsonify({'success': False, 'message': 'Cantidad inválida'})
         
         # Verificar si el producto existe
-        product = Product.query.get(product_id)
+        product = product_cache.get(product_id)
         if not product:
             return jsonify({'success': False, 'message': 'Producto no encontrado'})
         
-        # Verificar si el producto ya está en el carrito
-        existing_item = CartItem.query.filter_by(
-            idUser=current_user.idUser, 
-            idProduct=product_id
-        ).first()
+        if not current_user.is_authenticated:
+            added, line_quantity, cart_count, message = guest_add(product, quantity)
+            if not added:
+                return jsonify({'success': False, 'message': message,
+                                'quantity': line_quantity, 'cart_count': cart_count})
+            return jsonify({
+                'success': True,
+                'message': 'Producto agregado al carrito',
+                'quantity': line_quantity,
+                'cart_count': cart_count
+            })
         
-        if existing_item:
-            # Verificar stock disponible
-            if existing_item.quantity + quantity > product.stock:
-                return jsonify({'success': False, 'message': 'No hay suficiente stock disponible'})
-            
-            existing_item.quantity += quantity
-        else:
-            # Verificar stock disponible
-            if quantity > product.stock:
-                return jsonify({'success': False, 'message': 'No hay suficiente stock disponible'})
-            
-            new_item = CartItem(
-                idUser=current_user.idUser,
-                idProduct=product_id,
-                quantity=quantity
-            )
-            db.session.add(new_item)
+        # ✅ Upsert atómico con control de stock; la cantidad de la línea y el
+        # contador del carrito vuelven en la misma consulta
+        added, line_quantity, cart_count = add_item(current_user.idUser, product.idProduct, quantity)
+        if not added:
+            return jsonify({'success': False, 'message': 'No hay suficiente stock disponible',
+                            'quantity': line_quantity, 'cart_count': cart_count})
         
-        db.session.commit()
         return jsonify({
             'success': True, 
             'message': 'Producto agregado al carrito',
-            'cart_count': current_user.get_cart_count()
+            'quantity': line_quantity,
+            'cart_count': cart_count
         })
     
     except Exception as e:
@@ -89,7 +84,6 @@ def add_to_cart():
         return jsonify({'success': False, 'message': 'Error al agregar al carrito: ' + str(e)})
 
 @cart_bp.route('/api/cart/update', methods=['POST'])
-@login_required
 def update_cart_item():
     try:
         data = request.get_json()
@@ -99,10 +93,21 @@ def update_cart_item():
         if quantity <= 0:
             return remove_from_cart()
         
+        if not current_user.is_authenticated:
+            # En el carrito del invitado el id de línea es el idProduct
+            product = product_cache.get(item_id)
+            if not product:
+                return jsonify({'success': False, 'message': 'Item no encontrado'})
+            updated, message = guest_update(product, quantity)
+            if not updated:
+                return jsonify({'success': False, 'message': message})
+            return jsonify({'success': True, 'message': 'Carrito actualizado'})
+        
         item = CartItem.query.get(item_id)
         if item and item.idUser == current_user.idUser:
             # Verificar stock disponible
-            if quantity > item.product.stock:
+            product = product_cache.get(item.idProduct)
+            if not product or quantity > product.stock:
                 return jsonify({'success': False, 'message': 'No hay suficiente stock disponible'})
             
             item.quantity = quantity
@@ -116,20 +121,28 @@ def update_cart_item():
         return jsonify({'success': False, 'message': 'Error al actualizar el carrito'})
 
 @cart_bp.route('/api/cart/remove', methods=['POST'])
-@login_required
 def remove_from_cart():
     try:
         data = request.get_json()
         item_id = data.get('item_id')
         
-        item = CartItem.query.get(item_id)
-        if item and item.idUser == current_user.idUser:
-            db.session.delete(item)
-            db.session.commit()
+        if not current_user.is_authenticated:
+            removed, cart_count = guest_remove(item_id)
+            if removed:
+                return jsonify({
+                    'success': True,
+                    'message': 'Producto eliminado del carrito',
+                    'cart_count': cart_count
+                })
+            return jsonify({'success': False, 'message': 'Item no encontrado'})
+        
+        # ✅ DELETE + conteo en la misma transacción; el contador se publica tras el commit
+        removed, cart_count = remove_item(current_user.idUser, item_id)
+        if removed:
             return jsonify({
                 'success': True, 
                 'message': 'Producto eliminado del carrito',
-                'cart_count': current_user.get_cart_count()
+                'cart_count': cart_count
             })
         
         return jsonify({'success': False, 'message': 'Item no encontrado'})
@@ -139,22 +152,47 @@ def remove_from_cart():
         return jsonify({'success': False, 'message': 'Error al eliminar el producto'})
 
 @cart_bp.route('/api/cart/clear', methods=['POST'])
-@login_required
 def clear_cart():
     try:
-        CartItem.query.filter_by(idUser=current_user.idUser).delete()
-        db.session.commit()
-        return jsonify({'success': True, 'message': 'Carrito vaciado'})
+        if current_user.is_authenticated:
+            clear_items(current_user.idUser)
+        else:
+            guest_clear()
+        return jsonify({'success': True, 'message': 'Carrito vaciado', 'cart_count': 0})
     
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Error al vaciar el carrito'})
 
+@cart_bp.route('/api/cart/checkout', methods=['POST'])
+def checkout():
+    """Convierte el carrito en un pedido 'Pendiente' (una sola transacción)"""
+    if not current_user.is_authenticated:
+        # El carrito del invitado pasa a cart_item al iniciar sesión
+        return jsonify({'success': False, 'message': 'Inicia sesión para completar la compra',
+                        'login_url': url_for('auth.login')}), 401
+    try:
+        order = place_order(current_user.idUser)
+        return jsonify({
+            'success': True,
+            'message': f"Pedido #{order['order_id']} creado",
+            'order': order,
+            'cart_count': 0
+        })
+    
+    except CheckoutError as e:
+        return jsonify({'success': False, 'message': e.message, 'shortages': e.shortages}), 409
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error en checkout: {e}")
+        return jsonify({'success': False, 'message': 'Error al procesar el pedido'}), 500
+
 @cart_bp.route('/api/cart/count')
-@login_required
 def get_cart_count():
+    """Contador del carrito; rellena el hueco de las páginas cacheadas"""
     try:
-        count = current_user.get_cart_count()
+        # ✅ Sale de la caché de contadores: ni siquiera se carga el usuario
+        count = current_cart_count()
         return jsonify({'success': True, 'count': count})
     
     except Exception as e:
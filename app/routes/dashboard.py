@@ -1,8 +1,14 @@
-from flask import Blueprint, render_template, jsonify, request, redirect, url_for
+from flask import (Blueprint, Response, render_template, jsonify, request, redirect,
+                   send_file, stream_with_context, url_for)
 from flask_login import login_required, current_user, logout_user
 from app import db
-from datetime import datetime, timedelta
+from app.conditional import conditional_get
+from app.decorators import admin_required
+from datetime import date, datetime, timedelta
+import os
 import random
+import tempfile
+import uuid
 from werkzeug.security import generate_password_hash
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -14,6 +20,7 @@ def dashboard():
 
 @dashboard_bp.route('/api/dashboard/stats')
 @login_required
+@conditional_get('catalog', 'orders', 'users', per_user=True, vary=date.today)
 def dashboard_stats():
     try:
         # Importar modelos aquí para evitar problemas de importación circular
@@ -76,25 +83,211 @@ def dashboard_stats():
 
 @dashboard_bp.route('/api/products')
 @login_required
+@conditional_get('catalog', per_user=True)
 def get_products():
+    """Todos los productos (API JSON del dashboard)
+
+    Con ?stream=json|ndjson o Accept: application/x-ndjson la respuesta se
+    envía por fragmentos leyendo la BD con un cursor del servidor.
+    ?sort=price_asc|price_desc|newest|best_selling
+    """
     try:
         from app.models1 import Product
+        from app.pagination import catalog_sort, sorted_query
+        from app.serializers import products_as_dicts, serialize_product, shaped_query
+        from app.streaming import stream_query, stream_response, wants_stream
+        
+        _, sort_keys = catalog_sort(request.args)
+        products_query = sorted_query(shaped_query(Product.query, 'admin'), sort_keys)
+        
+        # ✅ Modo streaming: memoria constante sin importar el tamaño del catálogo
+        stream_mode = wants_stream(request)
+        if stream_mode:
+            return stream_response(
+                stream_query(products_query),
+                lambda product: serialize_product(product, 'admin').to_dict(),
+                stream_mode
+            )
+        
         # OBTENER TODOS LOS PRODUCTOS SIN LÍMITE
-        products = Product.query.all()
-        return jsonify([{
-            'id': product.idProduct,
-            'name': product.nameProduct,
-            'category': product.category,
-            'price': float(product.price),
-            'stock': product.stock,
-            'status': product.status,
-            'description': product.description or '',  # AÑADIR DESCRIPCIÓN
-            'image': product.image or f'https://via.placeholder.com/250x300/f8f9fa/000?text={product.nameProduct}'  # AÑADIR IMAGEN
-        } for product in products])
+        products = products_query.all()
+        return jsonify(products_as_dicts(products, 'admin'))
     except Exception as e:
         print(f"Error obteniendo productos: {e}")
         return jsonify([])
 
+# ✅ Grilla de productos del dashboard: una pantalla por petición
+GRID_SORTS = {
+    'id': 'idProduct',
+    'name': 'nameProduct',
+    'price': 'price',
+    'stock': 'stock'
+}
+GRID_MAX_LIMIT = 100
+LOW_STOCK_THRESHOLD = 5
+
+@dashboard_bp.route('/api/dashboard/products')
+@login_required
+@conditional_get('catalog', per_user=True)
+def get_products_grid():
+    """Productos paginados por cursor, ordenables y filtrables
+
+    ?limit=25&sort=price&dir=desc&status=Activo&category=Vestidos&stock=low&q=camisa&after=<cursor>
+    """
+    try:
+        from app.catalog_events import product_category_name
+        from app.categories import category_directory
+        from app.models1 import Product
+        from app.pagination import approximate_count, keyset_paginate
+        from app.serializers import products_as_dicts, shaped_query
+        
+        args = request.args
+        limit = max(1, min(args.get('limit', 25, type=int), GRID_MAX_LIMIT))
+        sort = args.get('sort', 'id') if args.get('sort') in GRID_SORTS else 'id'
+        descending = args.get('dir', 'desc' if sort == 'id' else 'asc') == 'desc'
+        
+        query = Product.query
+        status = args.get('status')
+        if status in ('Activo', 'Inactivo'):
+            query = query.filter(Product.status == status)
+        
+        category = args.get('category', '').strip()
+        if category:
+            category_id = category_directory.resolve(category)
+            query = query.filter(Product.category_id == category_id if category_id is not None
+                                 else product_category_name() == category)
+        
+        stock = args.get('stock')
+        if stock == 'out':
+            query = query.filter(Product.stock <= 0)
+        elif stock == 'low':
+            query = query.filter(Product.stock > 0, Product.stock <= LOW_STOCK_THRESHOLD)
+        elif stock == 'in':
+            query = query.filter(Product.stock > 0)
+        
+        search = args.get('q', '').strip()
+        if search:
+            condition = Product.nameProduct.ilike(f'%{search}%')
+            if search.isdigit():
+                condition = condition | (Product.idProduct == int(search))
+            query = query.filter(condition)
+        
+        # Columna elegida + PK como desempate: clave única para el cursor
+        keys = [(getattr(Product, GRID_SORTS[sort]), descending)]
+        if sort != 'id':
+            keys.append((Product.idProduct, descending))
+        
+        query = shaped_query(query, 'grid')
+        page = keyset_paginate(query, keys, limit, after=args.get('after'), before=args.get('before'))
+        total = approximate_count(('admin-grid', status, category.lower(), stock, search.lower()), query)
+        
+        return jsonify({
+            'rows': products_as_dicts(page.items, 'grid'),
+            'approx_total': total,
+            'limit': limit,
+            'sort': sort,
+            'dir': 'desc' if descending else 'asc',
+            **page.to_dict()
+        })
+    except Exception as e:
+        print(f"Error obteniendo grilla de productos: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# ✅ Cambios masivos de precio/stock/estado por regla
+@dashboard_bp.route('/api/dashboard/products/bulk', methods=['POST'])
+@login_required
+@admin_required
+def bulk_update_products():
+    """Aplica una regla (filter + changes) a todos los productos que cumplan el filtro
+
+    Por defecto es una simulación: devuelve el conteo y una muestra con los
+    valores resultantes. Con "dry_run": false se ejecuta el UPDATE.
+    """
+    try:
+        from app.bulk_ops import parse_rule
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            rule = parse_rule(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        preview = rule.preview()
+        if data.get('dry_run', True) is not False:
+            return jsonify({'dry_run': True, **preview})
+        
+        updated = rule.apply()
+        return jsonify({'dry_run': False, 'updated': updated, **preview})
+    except Exception as e:
+        print(f"Error en actualización masiva de productos: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# ✅ Importación / exportación masiva del catálogo
+IMPORT_REPORTS_DIR = os.path.join(tempfile.gettempdir(), 'catalog_import_reports')
+
+@dashboard_bp.route('/api/dashboard/catalog/import', methods=['POST'])
+@login_required
+@admin_required
+def import_catalog_file():
+    """Sube un CSV/JSONL y lo importa por lotes (?dry_run=1 solo valida)"""
+    try:
+        from app.catalog_io import FORMATS, detect_format, import_catalog
+        
+        upload = request.files.get('file')
+        if upload is None or not upload.filename:
+            return jsonify({'error': 'Selecciona un archivo CSV o JSONL'}), 400
+        fmt = request.form.get('format') or detect_format(upload.filename)
+        if fmt not in FORMATS:
+            return jsonify({'error': f'Formato no soportado: {fmt}'}), 400
+        dry_run = request.values.get('dry_run', '').lower() in ('1', 'true', 'si', 'sí')
+        
+        # Las filas rechazadas se escriben a disco a medida que aparecen
+        os.makedirs(IMPORT_REPORTS_DIR, exist_ok=True)
+        report_id = uuid.uuid4().hex
+        report_path = os.path.join(IMPORT_REPORTS_DIR, f'{report_id}.csv')
+        with open(report_path, 'w', encoding='utf-8', newline='') as report:
+            summary = import_catalog(upload.stream, fmt, dry_run=dry_run, report=report)
+        
+        result = summary.to_dict()
+        result['dry_run'] = dry_run
+        if summary.errors:
+            result['report_url'] = url_for('dashboard.download_import_report', report_id=report_id)
+        else:
+            os.remove(report_path)
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error importando catálogo: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/api/dashboard/catalog/import/reports/<report_id>')
+@login_required
+@admin_required
+def download_import_report(report_id):
+    """Descarga el CSV de filas rechazadas de una importación"""
+    if not report_id.isalnum():
+        return jsonify({'error': 'Reporte no encontrado'}), 404
+    report_path = os.path.join(IMPORT_REPORTS_DIR, f'{report_id}.csv')
+    if not os.path.exists(report_path):
+        return jsonify({'error': 'Reporte no encontrado'}), 404
+    return send_file(report_path, mimetype='text/csv', as_attachment=True,
+                     download_name=f'errores_importacion_{report_id[:8]}.csv')
+
+@dashboard_bp.route('/api/dashboard/catalog/export')
+@login_required
+@admin_required
+def export_catalog_file():
+    """Descarga el catálogo completo en CSV o JSONL (en streaming)"""
+    from app.catalog_io import FORMATS, export_chunks
+    
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'error': f'Formato no soportado: {fmt}'}), 400
+    status = request.args.get('status') if request.args.get('status') in ('Activo', 'Inactivo') else None
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(export_chunks(fmt, status=status)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=catalogo.{fmt}'
+    return response
+
 @dashboard_bp.route('/api/products', methods=['POST'])
 @login_required
 def add_product():
@@ -382,6 +575,22 @@ def get_config():
         print(f"Error obteniendo configuración: {e}")
         return jsonify({'error': str(e)}), 500
 
+@dashboard_bp.route('/api/dashboard/cache')
+@login_required
+def get_cache_stats():
+    """Contadores de las cachés en memoria (para dimensionarlas)"""
+    from app.page_cache import page_cache
+    from app.product_cache import product_cache
+    return jsonify({
+        'products': product_cache.stats(),
+        'pages': {
+            'entries': len(page_cache),
+            'max_entries': page_cache.max_entries,
+            'hits': page_cache.hits,
+            'misses': page_cache.misses
+        }
+    })
+
 @dashboard_bp.route('/logout')
 @login_required
 def logout():
@@ -0,0 +1,103 @@
+import os
+import re
+
+from flask import Blueprint, abort, jsonify, request, send_file
+from flask_login import login_required
+from app import db
+from app.images import (DERIVATIVES, FORMATS, IMMUTABLE_MAX_AGE, image_srcset,
+                        image_store, image_url, is_digest)
+
+images_bp = Blueprint('images', __name__)
+
+_DERIVATIVE_NAME = re.compile(r'^(%s)\.(%s)$' % ('|'.join(DERIVATIVES), '|'.join(FORMATS)))
+
+# Mientras no existe el derivado se sirve el original con caché corta
+FALLBACK_MAX_AGE = 60
+
+
+def _sniff_mimetype(path):
+    with open(path, 'rb') as handle:
+        head = handle.read(12)
+    if head.startswith(b'\x89PNG'):
+        return 'image/png'
+    if head.startswith(b'GIF8'):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+
+def _immutable(response):
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@images_bp.route('/img/<digest>/<name>')
+def serve_image(digest, name):
+    """Derivados locales; send_file usa wsgi.file_wrapper (sendfile) o X-Sendfile"""
+    if not is_digest(digest):
+        abort(404)
+    original = image_store.original_path(digest)
+    if name == 'original':
+        if not os.path.exists(original):
+            abort(404)
+        return _immutable(send_file(original, mimetype=_sniff_mimetype(original), max_age=IMMUTABLE_MAX_AGE))
+
+    match = _DERIVATIVE_NAME.match(name)
+    if not match:
+        abort(404)
+    variant, fmt = match.groups()
+    path = image_store.derivative_path(digest, variant, fmt)
+    if os.path.exists(path):
+        return _immutable(send_file(path, mimetype=FORMATS[fmt][1], max_age=IMMUTABLE_MAX_AGE))
+
+    if not os.path.exists(original):
+        abort(404)
+    # Derivado aún sin generar: se encola y mientras tanto va el original
+    image_store.submit(digest)
+    return send_file(original, mimetype=_sniff_mimetype(original), max_age=FALLBACK_MAX_AGE)
+
+
+@images_bp.route('/api/images', methods=['POST'])
+@login_required
+def upload_image():
+    """Sube una imagen (campo 'file'); con product_id la asigna al producto
+
+    main=1 (o producto sin imagen): pasa a ser Product.image; si no, se
+    agrega a la galería (ProductImage).
+    """
+    try:
+        from app.models1 import Product, ProductImage
+
+        upload = request.files.get('file')
+        if upload is None or not upload.filename:
+            return jsonify({'error': 'Selecciona una imagen'}), 400
+        try:
+            digest = image_store.save_upload(upload.stream, upload.filename)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        image_store.submit(digest)
+        url = image_url(digest, 'detail', 'jpg')
+
+        product_id = request.form.get('product_id', type=int)
+        if product_id is not None:
+            product = Product.query.get_or_404(product_id)
+            if request.form.get('main') in ('1', 'true') or not product.image:
+                product.image = url
+            else:
+                db.session.add(ProductImage(idProduct=product_id, image_url=url))
+            db.session.commit()
+
+        return jsonify({
+            'digest': digest,
+            'url': url,
+            'srcset': image_srcset(url),
+            'srcset_webp': image_srcset(url, 'webp'),
+            'ready': image_store.has_derivatives(digest)
+        })
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error subiendo imagen: {e}")
+        return jsonify({'error': str(e)}), 500
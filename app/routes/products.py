@@ -1,169 +1,303 @@
 from flask import Blueprint, jsonify, request, render_template
 from flask_login import login_required, current_user
 from app import db
+from app.catalog_events import product_category_name
+from app.categories import category_directory
+from app.conditional import conditional_get, set_last_modified
+from app.facets import PRICE_LABELS, filters_from_args, product_facets
 from app.models1 import Product
+from app.page_cache import (CATALOG_TAG, cached_page, category_tag,
+                            product_tag, tag_page)
+from app.pagination import (CATALOG_KEYS, SORT_LABELS, approximate_count,
+                            catalog_sort, cursor_mode_requested,
+                            keyset_filter_ids, keyset_paginate, sorted_query)
+from app.product_aggregate import product_aggregates
+from app.product_cache import product_cache
+from app.related import RELATED_LIMIT, related_product_ids, related_refresher
+from app.search_index import product_search
+from app.sku_index import sku_index
+from app.serializers import (fetch_products_by_ids, products_as_dicts,
+                             serialize_product, serialize_products,
+                             shaped_query)
+from app.spelling import product_spelling
+from app.typeahead import product_typeahead
 from decimal import Decimal
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+import math
 import os
 
 products_bp = Blueprint('products', __name__)
 
-@products_bp.route('/api/products', methods=['GET'])
-def get_products():
-    """Obtener todos los productos activos (API JSON)"""
-    try:
-        # OBTENER TODOS LOS PRODUCTOS ACTIVOS SIN LÍMITE
-        products = Product.query.filter_by(status='Activo').all()
-        return jsonify([{
-            'id': product.idProduct,
-            'name': product.nameProduct,
-            'description': product.description or '',
-            'price': float(product.price),
-            'image_url': product.image or f'https://via.placeholder.com/250x300/f8f9fa/000?text={product.nameProduct}',
-            'category': product.category,
-            'stock': product.stock,
-            'status': product.status,
-            'details': getattr(product, 'details', '')  # Detalles adicionales si existen
-        } for product in products])
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+# Caracteres de ?q= que se buscan (el resto se ignora)
+SEARCH_QUERY_MAX_LENGTH = 200
+
+def _facet_counts_payload(counts):
+    """Conteos de facetas con nombres de categoría y rangos de precio en orden"""
+    return {
+        'category': {category_directory.name_for(category_id) or str(category_id): count
+                     for category_id, count in counts['category'].items()},
+        'color': dict(sorted(counts['color'].items())),
+        'size': dict(sorted(counts['size'].items())),
+        'price': {label: counts['price'][label] for label in PRICE_LABELS if label in counts['price']},
+        'in_stock': counts['stock'].get('in_stock', 0)
+    }
+
+def _index_ready(index):
+    """Construye el índice en memoria si no se pudo al arrancar la app"""
+    if not index.ready:
+        try:
+            index.rebuild()
+        except Exception as e:
+            print(f"⚠️  Índice {type(index).__name__} no disponible: {e}")
+    return index.ready
 
 # ✅ NUEVA RUTA: Página HTML de productos por categoría
 @products_bp.route('/categoria/<category_name>')
+@conditional_get('catalog', anonymous_only=True)
+@cached_page
 def category_products_page(category_name):
     """Página HTML de productos por categoría"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = 30
-        
-        # Filtrar productos por categoría (case insensitive)
-        products_query = Product.query.filter(
-            Product.category.ilike(f'%{category_name}%'),
-            Product.status == 'Activo'
-        )
-        
-        pagination = products_query.paginate(
-            page=page, 
-            per_page=per_page,
-            error_out=False
-        )
-        
-        products = pagination.items
+        sort_name, sort_keys = catalog_sort(request.args)
+        
+        # ✅ Categoría resuelta a su id: rango sobre el índice
+        # (category_id, status, created_at) en lugar de ILIKE sobre el texto
+        category_id = category_directory.resolve(category_name)
+        if category_id is not None:
+            products_query = shaped_query(Product.query.filter(
+                Product.category_id == category_id,
+                Product.status == 'Activo'
+            ), 'card')
+        else:
+            # Categoría sin registro en la tabla: filtrar por nombre (case insensitive)
+            products_query = shaped_query(Product.query.filter(
+                product_category_name().ilike(f'%{category_name}%'),
+                Product.status == 'Activo'
+            ), 'card')
+        # ✅ Orden (?sort=) servido por el índice (category_id, status, columna)
+        products_query = sorted_query(products_query, sort_keys)
+        
+        # ✅ Facetas (color, talla, precio, stock) desde los bitsets en memoria
+        filters = filters_from_args(request.args)
+        facets = None
+        facet_page = None
+        if category_id is not None and _index_ready(product_facets):
+            facet_filters = dict(filters, category={category_id})
+            if filters and sort_name == 'default':
+                ids, total, counts = product_facets.search(facet_filters, (page - 1) * per_page, per_page)
+                facet_page = (fetch_products_by_ids(ids, 'card'), total)
+            elif filters:
+                # Los bitsets solo dan orden por id: se recorre el índice del orden
+                # pedido por lotes y se quedan los ids que están en el bitset
+                _, total, counts = product_facets.search(facet_filters, 0, 0)
+                matched = product_facets.match_bits(facet_filters)
+                ids = keyset_filter_ids(products_query, sort_keys, lambda product_id: matched >> product_id & 1,
+                                        (page - 1) * per_page, per_page) if total else []
+                facet_page = (fetch_products_by_ids(ids, 'card'), total)
+            else:
+                _, _, counts = product_facets.search(facet_filters, 0, 0)
+            facets = _facet_counts_payload(counts)
+        filter_args = {key: ','.join(sorted(values)) for key, values in filters.items() if key != 'stock'}
+        if 'stock' in filters:
+            filter_args['in_stock'] = '1'
+        if sort_name != 'default':
+            filter_args['sort'] = sort_name
+        
+        # ✅ Modo cursor (?after= / ?before=): sin COUNT(*) ni OFFSET
+        cursor_mode = cursor_mode_requested(request.args) and facet_page is None
+        if facet_page is not None:
+            products, total = facet_page
+            total_pages = math.ceil(total / per_page) if total else 0
+            has_next, has_prev = page < total_pages, page > 1
+        elif cursor_mode:
+            pagination = keyset_paginate(
+                products_query,
+                sort_keys,
+                per_page,
+                after=request.args.get('after'),
+                before=request.args.get('before')
+            )
+            products = pagination.items
+        else:
+            pagination = products_query.paginate(
+                page=page, 
+                per_page=per_page,
+                error_out=False
+            )
+            products = pagination.items
+            total_pages, has_next, has_prev = pagination.pages, pagination.has_next, pagination.has_prev
         
         # Convertir productos a formato para la template
-        products_data = []
-        for product in products:
-            products_data.append({
-                'id': product.idProduct,
-                'name': product.nameProduct,
-                'description': product.description or '',
-                'price': float(product.price),
-                'image_url': product.image or f'https://via.placeholder.com/300x400/f8f9fa/000?text={product.nameProduct}',
-                'category': product.category,
-                'stock': product.stock,
-                'status': product.status
-            })
+        products_data = serialize_products(products, 'card')
+        
+        # La página cacheada se invalida al cambiar su categoría o sus productos
+        tag_page(category_tag(category_id) if category_id is not None else CATALOG_TAG,
+                 *(product_tag(product.id) for product in products_data))
+        
+        if cursor_mode:
+            return render_template('category_products.html', 
+                                 products=products_data,
+                                 category_name=category_name,
+                                 facets=facets,
+                                 active_filters=filters,
+                                 filter_args=filter_args,
+                                 sort_labels=SORT_LABELS,
+                                 current_sort=sort_name,
+                                 cursor_mode=True,
+                                 next_cursor=pagination.next_cursor,
+                                 prev_cursor=pagination.prev_cursor,
+                                 approx_total=approximate_count(('categoria', category_name.lower()), products_query),
+                                 has_next=pagination.has_next,
+                                 has_prev=pagination.has_prev)
         
         return render_template('category_products.html', 
                              products=products_data,
                              category_name=category_name,
+                             facets=facets,
+                             active_filters=filters,
+                             filter_args=filter_args,
+                             sort_labels=SORT_LABELS,
+                             current_sort=sort_name,
                              current_page=page,
-                             total_pages=pagination.pages,
-                             has_next=pagination.has_next,
-                             has_prev=pagination.has_prev)
+                             total_pages=total_pages,
+                             has_next=has_next,
+                             has_prev=has_prev)
                              
     except Exception as e:
         return render_template('error404.html'), 404
 
 # ✅ RUTA: Página HTML de detalles del producto
 @products_bp.route('/producto/<int:product_id>')
+@conditional_get('catalog', anonymous_only=True)
+@cached_page
 def product_detail(product_id):
     """Página de detalles del producto (HTML)"""
     try:
-        product = Product.query.get_or_404(product_id)
-        
-        # Convertir producto a formato para la template
-        product_data = {
-            'id': product.idProduct,
-            'name': product.nameProduct,
-            'description': product.description or '',
-            'price': float(product.price),
-            'image_url': product.image or f'https://via.placeholder.com/500x600/f8f9fa/000?text={product.nameProduct}',
-            'category': product.category,
-            'stock': product.stock,
-            'status': product.status,
-            'details': getattr(product, 'details', ''),
-            'size': getattr(product, 'size', 'No especificado'),
-            'color': getattr(product, 'color', 'No especificado')
-        }
-        
-        # Productos relacionados (misma categoría)
-        related_products = Product.query.filter(
-            Product.category == product.category,
-            Product.idProduct != product_id,
-            Product.status == 'Activo'
-        ).limit(4).all()
+        # ✅ Agregado en caché: producto, variantes, colores, tallas e imágenes
+        aggregate = product_aggregates.get_or_404(product_id)
+        product_data = aggregate.product
+        
+        # Productos relacionados precalculados (lectura por PK)
+        related_ids = related_product_ids(product_id)
+        if related_ids is not None:
+            related_products = [related for related in fetch_products_by_ids(related_ids, 'card')
+                                if related.status == 'Activo']
+        else:
+            # Aún sin calcular: misma categoría mientras el job los genera
+            related_refresher.schedule([product_id])
+            related_products = shaped_query(Product.query.filter(
+                Product.category_id == aggregate.category_id,
+                Product.idProduct != product_id,
+                Product.status == 'Activo'
+            ), 'card').limit(RELATED_LIMIT).all()
         
         # Convertir productos relacionados
-        related_products_data = []
-        for related_product in related_products:
-            related_products_data.append({
-                'id': related_product.idProduct,
-                'name': related_product.nameProduct,
-                'price': float(related_product.price),
-                'image_url': related_product.image or f'https://via.placeholder.com/250x300/f8f9fa/000?text={related_product.nameProduct}',
-                'category': related_product.category
-            })
+        related_products_data = serialize_products(related_products, 'card')
+        
+        tag_page(product_tag(product_id), *(product_tag(related.id) for related in related_products_data))
         
         return render_template('product_detail.html', 
                              product=product_data, 
+                             variants=aggregate.variants,
+                             images=aggregate.images,
+                             colors=aggregate.colors,
+                             sizes=aggregate.sizes,
                              related_products=related_products_data)
     except Exception as e:
         return render_template('error404.html'), 404
 
-@products_bp.route('/api/products/<int:product_id>', methods=['GET'])
-def get_product_detail_api(product_id):
-    """Obtener detalles específicos de un producto (API JSON)"""
+@products_bp.route('/api/products/facets')
+@conditional_get('catalog')
+def get_products_facets():
+    """Filtrado por facetas con conteos en vivo (API JSON)
+
+    ?category=Vestidos&color=Rojo,Azul&size=M&price=25-50&in_stock=1&page=1&per_page=30
+    """
     try:
-        product = Product.query.get_or_404(product_id)
+        if not _index_ready(product_facets):
+            return jsonify({'error': 'Índice de facetas no disponible'}), 503
+        
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = max(1, min(request.args.get('per_page', 30, type=int), 100))
+        
+        filters = filters_from_args(request.args)
+        category_names = [name for raw in request.args.getlist('category') for name in raw.split(',') if name.strip()]
+        if category_names:
+            # Una categoría desconocida no coincide con ningún producto
+            filters['category'] = {category_directory.resolve(name) or -1 for name in category_names}
+        
+        ids, total, counts = product_facets.search(filters, (page - 1) * per_page, per_page)
         return jsonify({
-            'id': product.idProduct,
-            'name': product.nameProduct,
-            'description': product.description or '',
-            'price': float(product.price),
-            'image_url': product.image or f'https://via.placeholder.com/300x300/f8f9fa/000?text={product.nameProduct}',
-            'category': product.category,
-            'stock': product.stock,
-            'status': product.status,
-            'details': getattr(product, 'details', ''),
-            'size': getattr(product, 'size', 'No especificado'),
-            'color': getattr(product, 'color', 'No especificado')
+            'products': products_as_dicts(fetch_products_by_ids(ids, 'card'), 'card'),
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': math.ceil(total / per_page) if total else 0,
+            'facets': _facet_counts_payload(counts)
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@products_bp.route('/api/products/<int:product_id>', methods=['GET'])
+@conditional_get('catalog')
+def get_product_detail_api(product_id):
+    """Obtener detalles específicos de un producto (API JSON), con variantes e imágenes"""
+    try:
+        aggregate = product_aggregates.get_or_404(product_id)
+        set_last_modified(aggregate.updated_at)
+        return jsonify(aggregate.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @products_bp.route('/api/products/category/<category_name>', methods=['GET'])
+@conditional_get('catalog')
 def get_products_by_category(category_name):
-    """Obtener productos por categoría (API JSON)"""
+    """Obtener productos por categoría (API JSON); admite ?sort= como /api/products"""
     try:
-        products = Product.query.filter_by(
-            category=category_name, 
-            status='Activo'
-        ).all()
-        
-        return jsonify([{
-            'id': product.idProduct,
-            'name': product.nameProduct,
-            'description': product.description or '',
-            'price': float(product.price),
-            'image_url': product.image or f'https://via.placeholder.com/250x300/f8f9fa/000?text={product.nameProduct}',
-            'category': product.category,
-            'stock': product.stock,
-            'status': product.status
-        } for product in products])
+        _, sort_keys = catalog_sort(request.args)
+        category_id = category_directory.resolve(category_name)
+        if category_id is not None:
+            products_query = shaped_query(Product.query.filter_by(
+                category_id=category_id,
+                status='Activo'
+            ), 'detail')
+        else:
+            products_query = shaped_query(Product.query.filter(
+                product_category_name() == category_name,
+                Product.status == 'Activo'
+            ), 'detail')
+        products_query = sorted_query(products_query, sort_keys)
+        
+        # ✅ Modo cursor opcional: ?after=<token>&limit=N devuelve una página
+        # con los cursores; sin esos parámetros se mantiene la lista completa
+        cursor_mode = cursor_mode_requested(request.args) or 'limit' in request.args
+        if cursor_mode:
+            per_page = max(1, min(request.args.get('limit', 30, type=int), 100))
+            pagination = keyset_paginate(
+                products_query,
+                sort_keys,
+                per_page,
+                after=request.args.get('after'),
+                before=request.args.get('before')
+            )
+            products = pagination.items
+        else:
+            products = products_query.all()
+        
+        products_data = products_as_dicts(products, 'detail')
+        
+        if cursor_mode:
+            response = pagination.to_dict()
+            response['products'] = products_data
+            response['approx_total'] = approximate_count(('api_categoria', category_name), products_query)
+            return jsonify(response)
+        
+        return jsonify(products_data)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -337,7 +471,7 @@ def delete_product(product_id):
 def search_products():
     """Búsqueda de productos"""
     try:
-        query = request.args.get('q', '')
+        query = request.args.get('q', '')[:SEARCH_QUERY_MAX_LENGTH]
         page = request.args.get('page', 1, type=int)
         per_page = 30
         
@@ -347,37 +481,75 @@ def search_products():
                                  query=query,
                                  message='Ingresa un término de búsqueda')
         
-        # Buscar productos que coincidan con el nombre o categoría
-        products_query = Product.query.filter(
+        # ✅ Índice invertido en memoria: resultados ordenados por relevancia (BM25)
+        if _index_ready(product_search):
+            page = max(page, 1)
+            ids, total = product_search.search(query, offset=(page - 1) * per_page, limit=per_page)
+            
+            # ✅ Sin resultados: sugerir correcciones y mostrar la más probable
+            suggestions = []
+            corrected_query = None
+            if total == 0 and _index_ready(product_spelling):
+                suggestions = product_spelling.suggest(query)
+                if suggestions:
+                    corrected_query = suggestions[0]
+                    ids, total = product_search.search(corrected_query, offset=(page - 1) * per_page, limit=per_page)
+            
+            products_data = serialize_products(fetch_products_by_ids(ids, 'card'), 'card')
+            total_pages = max(1, math.ceil(total / per_page))
+            
+            return render_template('search_results.html', 
+                                 products=products_data,
+                                 query=query,
+                                 corrected_query=corrected_query,
+                                 suggestions=suggestions,
+                                 total_results=total,
+                                 current_page=page,
+                                 total_pages=total_pages,
+                                 has_next=page < total_pages,
+                                 has_prev=page > 1)
+        
+        # Sin índice: buscar productos que coincidan con el nombre o categoría
+        products_query = shaped_query(Product.query.filter(
             db.or_(
                 Product.nameProduct.ilike(f'%{query}%'),
-                Product.category.ilike(f'%{query}%'),
+                product_category_name().ilike(f'%{query}%'),
                 Product.description.ilike(f'%{query}%')
             ),
             Product.status == 'Activo'
-        )
-        
-        pagination = products_query.paginate(
-            page=page, 
-            per_page=per_page,
-            error_out=False
-        )
+        ), 'card')
+        
+        cursor_mode = cursor_mode_requested(request.args)
+        if cursor_mode:
+            pagination = keyset_paginate(
+                products_query,
+                CATALOG_KEYS,
+                per_page,
+                after=request.args.get('after'),
+                before=request.args.get('before')
+            )
+        else:
+            pagination = products_query.paginate(
+                page=page, 
+                per_page=per_page,
+                error_out=False
+            )
         
         products = pagination.items
         
         # Convertir productos a formato para la template
-        products_data = []
-        for product in products:
-            products_data.append({
-                'id': product.idProduct,
-                'name': product.nameProduct,
-                'description': product.description or '',
-                'price': float(product.price),
-                'image_url': product.image or f'https://via.placeholder.com/300x400/f8f9fa/000?text={product.nameProduct}',
-                'category': product.category,
-                'stock': product.stock,
-                'status': product.status
-            })
+        products_data = serialize_products(products, 'card')
+        
+        if cursor_mode:
+            return render_template('search_results.html', 
+                                 products=products_data,
+                                 query=query,
+                                 cursor_mode=True,
+                                 next_cursor=pagination.next_cursor,
+                                 prev_cursor=pagination.prev_cursor,
+                                 approx_total=approximate_count(('buscar', query.lower()), products_query),
+                                 has_next=pagination.has_next,
+                                 has_prev=pagination.has_prev)
         
         return render_template('search_results.html', 
                              products=products_data,
@@ -399,30 +571,24 @@ def search_products():
 def search_products_api():
     """API para búsqueda de productos en facturación"""
     try:
-        search_term = request.args.get('q', '')
+        search_term = request.args.get('q', '')[:SEARCH_QUERY_MAX_LENGTH]
         
         if not search_term:
             return jsonify([])
         
-        # Buscar en la base de datos
-        products = Product.query.filter(
+        # ✅ Índice de prefijos en memoria: ninguna consulta a la BD por tecla
+        if _index_ready(product_typeahead):
+            return jsonify(product_typeahead.suggest(search_term))
+        
+        # Sin índice: buscar en la base de datos
+        products = shaped_query(Product.query.filter(
             (Product.nameProduct.ilike(f'%{search_term}%')) |
             (Product.description.ilike(f'%{search_term}%')) |
-            (Product.category.ilike(f'%{search_term}%'))
-        ).filter(Product.status == 'Activo').limit(10).all()
+            (product_category_name().ilike(f'%{search_term}%'))
+        ), 'billing').filter(Product.status == 'Activo').limit(10).all()
         
         # Convertir a formato JSON
-        products_data = []
-        for product in products:
-            products_data.append({
-                'idProduct': product.idProduct,
-                'nameProduct': product.nameProduct,
-                'description': product.description,
-                'price': float(product.price),
-                'stock': product.stock,
-                'category': product.category,
-                'image': product.image
-            })
+        products_data = products_as_dicts(products, 'billing')
         
         return jsonify(products_data)
         
@@ -476,14 +642,59 @@ def billing_page():
 def get_product_for_billing(product_id):
     """Obtener producto específico para facturación"""
     try:
-        product = Product.query.get_or_404(product_id)
+        product = product_cache.get_or_404(product_id)
+        return jsonify(serialize_product(product, 'billing').to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ✅ Escáner de la caja: búsqueda exacta por SKU / código de barras en memoria
+@products_bp.route('/api/pos/sku/<path:code>', methods=['GET'])
+def get_product_by_sku(code):
+    """Variante por SKU con nombre, precio (base + extra), stock, color y talla"""
+    if not _index_ready(sku_index):
+        return jsonify({'error': 'Índice de SKU no disponible'}), 503
+    item = sku_index.lookup(code)
+    if item is None:
+        return jsonify({'error': f'No existe el código {code}'}), 404
+    return jsonify(item)
+
+# ✅ Máximo de ids por llamada al endpoint de lotes
+BATCH_MAX_IDS = 100
+
+@products_bp.route('/api/products/batch', methods=['GET', 'POST'])
+def get_products_batch():
+    """Varios productos en una sola consulta IN (revalidar venta o carrito)
+
+    GET /api/products/batch?ids=1,2,3  o  POST {"ids": [1, 2, 3]}
+    """
+    try:
+        if request.method == 'POST':
+            raw_ids = (request.get_json(silent=True) or {}).get('ids', [])
+        else:
+            raw_ids = request.args.get('ids', '').split(',')
+        if not isinstance(raw_ids, list):
+            return jsonify({'error': 'ids debe ser una lista'}), 400
+        
+        ids = []
+        seen = set()
+        for value in raw_ids:
+            if value in ('', None):
+                continue
+            try:
+                product_id = int(value)
+            except (TypeError, ValueError):
+                return jsonify({'error': f'id inválido: {value}'}), 400
+            if product_id not in seen:
+                seen.add(product_id)
+                ids.append(product_id)
+            if len(ids) > BATCH_MAX_IDS:
+                return jsonify({'error': f'Máximo {BATCH_MAX_IDS} productos por consulta'}), 400
+        
+        products = fetch_products_by_ids(ids, 'stock')
+        found = {str(product.idProduct): serialize_product(product, 'stock').to_dict() for product in products}
         return jsonify({
-            'idProduct': product.idProduct,
-            'nameProduct': product.nameProduct,
-            'price': float(product.price),
-            'stock': product.stock,
-            'category': product.category,
-            'image': product.image
+            'products': found,
+            'missing': [product_id for product_id in ids if str(product_id) not in found]
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -4,6 +4,7 @@ from werkzeug.security import check_password_hash, generate_password_hash
 from app import db
 from app.models1 import User, Product, Category  # Asegúrate de importar Category
 from app.decorators import admin_required
+from app.serializers import products_as_dicts, shaped_query
 
 bp = Blueprint('users', __name__)
 
@@ -20,29 +21,7 @@ def is_user_admin(user):
 
 def _build_products_list(queryset):
     """Normaliza objetos Product a dicts con keys estables que la plantilla usa."""
-    products = []
-    for p in queryset:
-        name = getattr(p, 'nameProduct', None) or getattr(p, 'name', None) or 'Producto'
-        id_ = getattr(p, 'idProduct', None) or getattr(p, 'id', None)
-        description = getattr(p, 'description', None) or ''
-        price = getattr(p, 'price', None) or 0
-        try:
-            price = float(price)
-        except Exception:
-            price = 0.0
-        image = getattr(p, 'image', None) or getattr(p, 'image_url', None) or f"https://via.placeholder.com/300x300?text={name}"
-        stock = getattr(p, 'stock', None) or 0
-        status = getattr(p, 'status', None) or ''
-        products.append({
-            'id': id_,
-            'name': name,
-            'description': description,
-            'price': price,
-            'image_url': image,
-            'stock': stock,
-            'status': status
-        })
-    return products
+    return products_as_dicts(queryset, 'detail')
 
 # ============================
 # RUTAS PARA CATEGORÍAS
@@ -56,9 +35,15 @@ def get_categories():
         categories = Category.query.all()
         categories_data = []
         
+        # Contar productos de todas las categorías en una sola consulta agrupada
+        product_counts = dict(
+            db.session.query(Product.category_id, db.func.count(Product.idProduct))
+            .group_by(Product.category_id)
+            .all()
+        )
+        
         for cat in categories:
-            # Contar productos en esta categoría
-            product_count = Product.query.filter_by(category=cat.nameCategory).count()
+            product_count = product_counts.get(cat.idCategory, 0)
             
             categories_data.append({
                 'idCategory': cat.idCategory,
@@ -130,7 +115,8 @@ def update_category(category_id):
             if existing_category:
                 return jsonify({'success': False, 'error': 'Ya existe una categoría con ese nombre'}), 400
         
-        # Actualizar categoría
+        # Actualizar categoría: los productos la referencian por id, así que
+        # renombrarla solo modifica esta fila (los índices se recargan al confirmar)
         if 'nameCategory' in data:
             category.nameCategory = data['nameCategory']
         if 'description' in data:
@@ -141,7 +127,7 @@ def update_category(category_id):
         db.session.commit()
         
         # Recalcular conteo de productos
-        product_count = Product.query.filter_by(category=category.nameCategory).count()
+        product_count = Product.query.filter_by(category_id=category.idCategory).count()
         
         return jsonify({
             'success': True,
@@ -171,7 +157,7 @@ def toggle_category_status(category_id):
         db.session.commit()
         
         # Recalcular conteo de productos
-        product_count = Product.query.filter_by(category=category.nameCategory).count()
+        product_count = Product.query.filter_by(category_id=category.idCategory).count()
         
         return jsonify({
             'success': True,
@@ -196,7 +182,7 @@ def delete_category(category_id):
         category = Category.query.get_or_404(category_id)
         
         # Verificar si hay productos asociados a esta categoría
-        product_count = Product.query.filter_by(category=category.nameCategory).count()
+        product_count = Product.query.filter_by(category_id=category.idCategory).count()
         if product_count > 0:
             return jsonify({
                 'success': False, 
@@ -274,9 +260,9 @@ def profile():
     # Intentamos filtrar por status='Activo' si existe ese campo,
     # si no, traemos los primeros 6 productos
     try:
-        products_q = Product.query.filter_by(status='Activo').limit(6).all()
+        products_q = shaped_query(Product.query.filter_by(status='Activo'), 'detail').limit(6).all()
     except Exception:
-        products_q = Product.query.limit(6).all()
+        products_q = shaped_query(Product.query, 'detail').limit(6).all()
     products = _build_products_list(products_q)
 
     role_label = 'Administrador' if is_user_admin(current_user) else 'Usuario'
@@ -0,0 +1,83 @@
+import threading
+
+from sqlalchemy import bindparam, func, select, update
+
+from app.catalog_events import notify_products_changed
+from app.models1 import Order, OrderDetail, Product, db
+
+# Cada cuánto (segundos) se recalcula el ranking de ventas
+SALES_RANK_INTERVAL = 15 * 60
+WRITE_CHUNK = 500
+
+
+def load_units_sold(connection):
+    """{idProduct: unidades vendidas} en pedidos no cancelados"""
+    return dict(connection.execute(
+        select(OrderDetail.idProduct, func.sum(OrderDetail.quantity))
+        .join(Order, Order.idOrder == OrderDetail.idOrder)
+        .where(Order.status != 'Cancelado')
+        .group_by(OrderDetail.idProduct)
+    ).all())
+
+
+def refresh_sales_rank():
+    """Actualiza product.sales_rank; solo escribe las filas cuyo valor cambió"""
+    table = Product.__table__
+    connection = db.session.connection()
+    units = {product_id: int(total or 0) for product_id, total in load_units_sold(connection).items()}
+    current = dict(connection.execute(select(table.c.idProduct, table.c.sales_rank)).all())
+
+    changed = [{'b_id': product_id, 'b_rank': units.get(product_id, 0)}
+               for product_id, rank in current.items() if (rank or 0) != units.get(product_id, 0)]
+    stmt = update(table).where(table.c.idProduct == bindparam('b_id')).values(sales_rank=bindparam('b_rank'))
+    for start in range(0, len(changed), WRITE_CHUNK):
+        chunk = changed[start:start + WRITE_CHUNK]
+        db.session.execute(stmt, chunk)
+        notify_products_changed(db.session, ids=[row['b_id'] for row in chunk])
+        db.session.commit()
+
+    # El autocompletado ordena por las mismas ventas
+    from app.typeahead import product_typeahead
+    if product_typeahead.ready:
+        product_typeahead.set_popularity(units)
+    return len(changed)
+
+
+class SalesRankRefresher:
+    """Hilo de fondo que recalcula el ranking de ventas cada `interval` segundos"""
+
+    def __init__(self, interval=SALES_RANK_INTERVAL):
+        self.interval = interval
+        self._thread = None
+        self._app = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        if self.running:
+            return
+        self._app = app
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sales-rank', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    written = refresh_sales_rank()
+                if written:
+                    print(f"✅ Ranking de ventas actualizado: {written} productos")
+            except Exception as e:
+                print(f"⚠️  Error recalculando el ranking de ventas: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+
+sales_rank_refresher = SalesRankRefresher()
@@ -0,0 +1,150 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+from app.catalog_events import load_product_rows, register_product_listener
+
+_TOKEN_RE = re.compile(r'[a-z0-9ñ]+')
+# Consonantes con las que puede terminar una palabra en español: si al quitar
+# "es" queda una de ellas, el plural era en "-es" (pantalones -> pantalon)
+_PLURAL_ES_STEMS = set('lnrdzsyj')
+
+# Peso de cada campo al calcular la frecuencia del término (BM25F simplificado)
+FIELD_WEIGHTS = (
+    ('nameProduct', 3),
+    ('category', 2),
+    ('description', 1),
+)
+
+
+def fold_accents(text):
+    """Minúsculas y sin tildes; la ñ se conserva"""
+    text = (text or '').lower().replace('ñ', '\x00')
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return stripped.replace('\x00', 'ñ')
+
+
+def singularize(token):
+    """Quita el plural regular del español para que vestidos = vestido"""
+    if len(token) > 4 and token.endswith('es') and token[-3] in _PLURAL_ES_STEMS:
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def words(text):
+    """Palabras normalizadas (sin tildes) tal como aparecen en el texto"""
+    return _TOKEN_RE.findall(fold_accents(text))
+
+
+def tokenize(text):
+    return [singularize(token) for token in words(text)]
+
+
+class ProductSearchIndex:
+    """Índice invertido en memoria de los productos activos con ranking BM25"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self._postings = {}      # token -> {idProduct: frecuencia ponderada}
+        self._doc_terms = {}     # idProduct -> Counter(token)
+        self._doc_len = {}       # idProduct -> longitud ponderada
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    @staticmethod
+    def _weighted_terms(row):
+        terms = Counter()
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(row.get(field)):
+                terms[token] += weight
+        return terms
+
+    def _remove(self, product_id):
+        terms = self._doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        for token in terms:
+            docs = self._postings.get(token)
+            if docs is not None:
+                docs.pop(product_id, None)
+                if not docs:
+                    del self._postings[token]
+        self._total_len -= self._doc_len.pop(product_id)
+
+    def _add(self, row):
+        product_id = row['idProduct']
+        self._remove(product_id)
+        if row.get('status') != 'Activo':
+            return
+        terms = self._weighted_terms(row)
+        self._doc_terms[product_id] = terms
+        length = sum(terms.values())
+        self._doc_len[product_id] = length
+        self._total_len += length
+        for token, freq in terms.items():
+            self._postings.setdefault(token, {})[product_id] = freq
+
+    def apply_changes(self, rows, deleted_ids=()):
+        """Actualiza el índice con filas nuevas/modificadas y elimina las borradas"""
+        with self._lock:
+            for product_id in deleted_ids:
+                self._remove(product_id)
+            for row in rows:
+                self._add(row)
+
+    def build(self, rows):
+        with self._lock:
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_len = {}
+            self._total_len = 0
+            for row in rows:
+                self._add(row)
+            self.ready = True
+
+    def rebuild(self):
+        """Construye el índice leyendo toda la tabla product"""
+        from app.models1 import db
+        with db.engine.connect() as connection:
+            self.build(load_product_rows(connection))
+
+    def search(self, query, offset=0, limit=30):
+        """Devuelve (ids ordenados por relevancia, total de documentos coincidentes)"""
+        terms = set(tokenize(query))
+        with self._lock:
+            doc_count = len(self._doc_len)
+            if not terms or not doc_count:
+                return [], 0
+            avg_len = self._total_len / doc_count
+            scores = {}
+            for token in terms:
+                docs = self._postings.get(token)
+                if not docs:
+                    continue
+                idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for product_id, freq in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[product_id] / avg_len)
+                    scores[product_id] = scores.get(product_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [product_id for product_id, _ in top[offset:]], len(scores)
+
+
+product_search = ProductSearchIndex()
+
+
+@register_product_listener
+def _update_product_search(rows, deleted_ids):
+    if product_search.ready:
+        product_search.apply_changes(rows, deleted_ids)
@@ -0,0 +1,155 @@
+from sqlalchemy.orm import load_only
+
+from app.categories import category_label
+from app.models1 import Product
+
+
+def placeholder_image(name, size='300x400'):
+    """Imagen por defecto cuando el producto no tiene una propia"""
+    return f'https://via.placeholder.com/{size}/f8f9fa/000?text={(name or "").replace(" ", "+")}'
+
+
+class _ProductView:
+    """Vista compacta de un producto: solo guarda las claves de su forma"""
+    __slots__ = ()
+    # Columnas de Product que necesita la forma (se cargan con load_only)
+    columns = ()
+
+    @classmethod
+    def load_columns(cls):
+        return [getattr(Product, name) for name in cls.columns if hasattr(Product, name)]
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class ProductCard(_ProductView):
+    """Tarjetas de listados (inicio, categorías, búsqueda)"""
+    __slots__ = ('id', 'name', 'price', 'image_url', 'category', 'stock', 'status')
+    columns = ('idProduct', 'nameProduct', 'price', 'image', 'category', 'category_id', 'stock', 'status')
+
+    def __init__(self, product):
+        self.id = product.idProduct
+        self.name = product.nameProduct
+        self.price = float(product.price) if product.price else 0
+        self.image_url = product.image or placeholder_image(product.nameProduct)
+        self.category = category_label(product)
+        self.stock = product.stock
+        self.status = product.status
+
+
+class ProductDetail(_ProductView):
+    """Página y API de detalle; incluye las columnas Text"""
+    __slots__ = ProductCard.__slots__ + ('description', 'details', 'size', 'color')
+    columns = ProductCard.columns + ('description', 'details', 'size', 'color')
+
+    def __init__(self, product):
+        self.id = product.idProduct
+        self.name = product.nameProduct
+        self.price = float(product.price) if product.price else 0
+        self.image_url = product.image or placeholder_image(product.nameProduct, '500x600')
+        self.category = category_label(product)
+        self.stock = product.stock
+        self.status = product.status
+        self.description = product.description or ''
+        self.details = getattr(product, 'details', '')
+        self.size = getattr(product, 'size', 'No especificado')
+        self.color = getattr(product, 'color', 'No especificado')
+
+
+class ProductBilling(_ProductView):
+    """Facturación (POS): mantiene las claves del modelo que usa billing.html"""
+    __slots__ = ('idProduct', 'nameProduct', 'price', 'stock', 'category', 'image')
+    columns = __slots__ + ('category_id',)
+
+    def __init__(self, product):
+        self.idProduct = product.idProduct
+        self.nameProduct = product.nameProduct
+        self.price = float(product.price) if product.price else 0
+        self.stock = product.stock
+        self.category = category_label(product)
+        self.image = product.image
+
+
+class ProductStock(_ProductView):
+    """Revalidación por lotes (POS y carrito): facturación + estado"""
+    __slots__ = ProductBilling.__slots__ + ('status',)
+    columns = ProductBilling.columns + ('status',)
+
+    def __init__(self, product):
+        self.idProduct = product.idProduct
+        self.nameProduct = product.nameProduct
+        self.price = float(product.price) if product.price else 0
+        self.stock = product.stock
+        self.category = category_label(product)
+        self.image = product.image
+        self.status = product.status
+
+
+class ProductAdmin(_ProductView):
+    """Tabla de productos del dashboard"""
+    __slots__ = ('id', 'name', 'category', 'price', 'stock', 'status', 'description', 'image')
+    columns = ('idProduct', 'nameProduct', 'category', 'category_id', 'price', 'stock', 'status', 'description', 'image')
+
+    def __init__(self, product):
+        self.id = product.idProduct
+        self.name = product.nameProduct
+        self.category = category_label(product)
+        self.price = float(product.price) if product.price else 0
+        self.stock = product.stock
+        self.status = product.status
+        self.description = product.description or ''
+        self.image = product.image or placeholder_image(product.nameProduct, '250x300')
+
+
+class ProductGridRow(_ProductView):
+    """Fila de la grilla paginada del dashboard (sin columnas Text)"""
+    __slots__ = ('id', 'name', 'category', 'price', 'stock', 'status', 'image')
+    columns = ('idProduct', 'nameProduct', 'category', 'category_id', 'price', 'stock', 'status', 'image')
+
+    def __init__(self, product):
+        self.id = product.idProduct
+        self.name = product.nameProduct
+        self.category = category_label(product)
+        self.price = float(product.price) if product.price else 0
+        self.stock = product.stock
+        self.status = product.status
+        self.image = product.image or placeholder_image(product.nameProduct, '250x300')
+
+
+SHAPES = {
+    'card': ProductCard,
+    'detail': ProductDetail,
+    'billing': ProductBilling,
+    'stock': ProductStock,
+    'admin': ProductAdmin,
+    'grid': ProductGridRow
+}
+
+
+def shaped_query(query, shape):
+    """Limita el SELECT a las columnas de la forma (el resto queda diferido)"""
+    return query.options(load_only(*SHAPES[shape].load_columns()))
+
+
+def fetch_products_by_ids(ids, shape):
+    """Carga los productos `ids` en una sola consulta IN respetando su orden"""
+    if not ids:
+        return []
+    products = shaped_query(Product.query.filter(Product.idProduct.in_(ids)), shape).all()
+    by_id = {product.idProduct: product for product in products}
+    return [by_id[product_id] for product_id in ids if product_id in by_id]
+
+
+def serialize_product(product, shape):
+    return SHAPES[shape](product)
+
+
+def serialize_products(products, shape):
+    view = SHAPES[shape]
+    return [view(product) for product in products]
+
+
+def products_as_dicts(products, shape):
+    view = SHAPES[shape]
+    return [view(product).to_dict() for product in products]
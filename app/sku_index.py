@@ -0,0 +1,189 @@
+import threading
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.catalog_events import load_product_rows, register_product_listener
+from app.models1 import Color, ProductVariant, Size, db
+
+# Código que imprime la ficha del producto (SKU: PROD-<id>) para productos sin variantes
+PRODUCT_CODE_PREFIX = 'PROD-'
+
+_PENDING_KEY = 'sku_changed_variants'
+_STALE_KEY = 'sku_index_stale'
+
+
+def normalize_code(code):
+    return (code or '').strip().upper()
+
+
+class SkuIndex:
+    """Mapa SKU -> variante + instantánea de precio/stock del producto.
+
+    Responde al escáner de la caja sin ir a la BD: los cambios de productos y
+    variantes llegan por los eventos del ORM tras cada commit.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._products = {}         # idProduct -> datos para la línea de venta
+        self._variants = {}         # SKU normalizado -> datos de la variante
+        self._variant_skus = {}     # idVariant -> SKU normalizado
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._variants)
+
+    @staticmethod
+    def _product_entry(row):
+        return {
+            'nameProduct': row['nameProduct'],
+            'price': float(row['price'] or 0),
+            'stock': row['stock'] or 0,
+            'status': row['status'],
+            'category': row['category'],
+            'image': row['image']
+        }
+
+    @staticmethod
+    def _variant_entry(row):
+        return {
+            'idVariant': row['idVariant'],
+            'idProduct': row['idProduct'],
+            'sku': row['sku'],
+            'color': row['nameColor'],
+            'size': row['nameSize'],
+            'price_extra': float(row['price_extra'] or 0),
+            'stock': row['stock'] or 0,
+            'status': row['status']
+        }
+
+    def _put_variant(self, row):
+        self._drop_variant(row['idVariant'])
+        code = normalize_code(row['sku'])
+        self._variants[code] = self._variant_entry(row)
+        self._variant_skus[row['idVariant']] = code
+
+    def _drop_variant(self, variant_id):
+        code = self._variant_skus.pop(variant_id, None)
+        if code is not None:
+            self._variants.pop(code, None)
+
+    def build(self, product_rows, variant_rows):
+        with self._lock:
+            self._products = {row['idProduct']: self._product_entry(row) for row in product_rows}
+            self._variants = {}
+            self._variant_skus = {}
+            for row in variant_rows:
+                self._put_variant(row)
+            self.ready = True
+
+    def rebuild(self):
+        with db.engine.connect() as connection:
+            self.build(load_product_rows(connection), _load_variant_rows(connection))
+
+    def apply_changes(self, rows, deleted_ids=()):
+        with self._lock:
+            for product_id in deleted_ids:
+                self._products.pop(product_id, None)
+            for row in rows:
+                self._products[row['idProduct']] = self._product_entry(row)
+
+    def apply_variant_changes(self, variant_ids, variant_rows):
+        """Sustituye las variantes `variant_ids` por `variant_rows` (las ausentes se borran)"""
+        with self._lock:
+            for variant_id in variant_ids:
+                self._drop_variant(variant_id)
+            for row in variant_rows:
+                self._put_variant(row)
+
+    def lookup(self, code):
+        """Todo lo que necesita la línea de venta, o None si el código no existe"""
+        code = normalize_code(code)
+        with self._lock:
+            variant = self._variants.get(code)
+            if variant is not None:
+                product = self._products.get(variant['idProduct'])
+                if product is None:
+                    return None
+                return dict(product,
+                            idProduct=variant['idProduct'],
+                            idVariant=variant['idVariant'],
+                            sku=variant['sku'],
+                            base_price=product['price'],
+                            price_extra=variant['price_extra'],
+                            price=round(product['price'] + variant['price_extra'], 2),
+                            stock=variant['stock'],
+                            product_stock=product['stock'],
+                            color=variant['color'],
+                            size=variant['size'],
+                            status=variant['status'] if product['status'] == 'Activo' else product['status'])
+
+            if code.startswith(PRODUCT_CODE_PREFIX) and code[len(PRODUCT_CODE_PREFIX):].isdigit():
+                product_id = int(code[len(PRODUCT_CODE_PREFIX):])
+                product = self._products.get(product_id)
+                if product is not None:
+                    return dict(product,
+                                idProduct=product_id,
+                                idVariant=None,
+                                sku=code,
+                                base_price=product['price'],
+                                price_extra=0.0,
+                                product_stock=product['stock'],
+                                color=None,
+                                size=None)
+        return None
+
+
+def _load_variant_rows(connection, variant_ids=None):
+    stmt = (
+        select(ProductVariant.idVariant, ProductVariant.idProduct, ProductVariant.sku,
+               ProductVariant.price_extra, ProductVariant.stock, ProductVariant.status,
+               Color.nameColor, Size.nameSize)
+        .select_from(ProductVariant)
+        .outerjoin(Color, Color.idColor == ProductVariant.idColor)
+        .outerjoin(Size, Size.idSize == ProductVariant.idSize)
+    )
+    if variant_ids is not None:
+        stmt = stmt.where(ProductVariant.idVariant.in_(list(variant_ids)))
+    return connection.execute(stmt).mappings().all()
+
+
+sku_index = SkuIndex()
+
+
+@register_product_listener
+def _update_sku_products(rows, deleted_ids):
+    if sku_index.ready:
+        sku_index.apply_changes(rows, deleted_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_variant_changes(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, ProductVariant) and obj.idVariant is not None:
+            session.info.setdefault(_PENDING_KEY, set()).add(obj.idVariant)
+        elif isinstance(obj, (Color, Size)):
+            session.info[_STALE_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_variant_changes(session):
+    variant_ids = session.info.pop(_PENDING_KEY, None)
+    if session.info.pop(_STALE_KEY, False):
+        # Renombrar un color o talla afecta a muchas variantes: se reconstruye al usarse
+        sku_index.ready = False
+        return
+    if not variant_ids or not sku_index.ready:
+        return
+    try:
+        with session.get_bind().connect() as connection:
+            sku_index.apply_variant_changes(variant_ids, _load_variant_rows(connection, variant_ids))
+    except Exception as e:
+        print(f"⚠️  No se pudo actualizar el índice de SKU: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_variant_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_STALE_KEY, None)
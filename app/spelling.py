@@ -0,0 +1,204 @@
+import threading
+
+from app.catalog_events import load_product_rows, register_product_listener
+from app.search_index import words
+
+# Distancia de edición máxima entre lo escrito y la palabra sugerida
+MAX_EDIT_DISTANCE = 2
+# Palabras más cortas que esto no se corrigen (tallas, siglas, números)
+MIN_WORD_LENGTH = 3
+# Ni más largas que esto: los borrados crecen con el cuadrado de la longitud
+# (una palabra de 600 letras son ~180 000 variantes)
+MAX_WORD_LENGTH = 25
+SUGGESTION_LIMIT = 3
+# Solo se corrigen las primeras palabras distintas de la consulta; el resto
+# se deja tal cual (evita que una consulta larga dispare el coste)
+MAX_CORRECTED_WORDS = 5
+# Frases parciales que se conservan en cada paso de la búsqueda en haz
+BEAM_WIDTH = 8
+
+
+def _deletes(word, max_distance=MAX_EDIT_DISTANCE):
+    """Todas las variantes de `word` con hasta `max_distance` letras borradas"""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        results |= frontier
+    return results
+
+
+def edit_distance(a, b, max_distance=MAX_EDIT_DISTANCE):
+    """Distancia Damerau-Levenshtein (transposiciones adyacentes) con corte"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SpellingSuggester:
+    """Correcciones "¿Quisiste decir?" con un diccionario de borrados (SymSpell).
+
+    El vocabulario son las palabras de nombres y categorías de los productos
+    activos; cada palabra se registra bajo todas sus variantes con hasta dos
+    letras borradas, así una consulta solo genera sus propios borrados y los
+    busca en un dict en lugar de comparar contra todo el vocabulario.
+    """
+
+    def __init__(self, max_distance=MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        self.ready = False
+        self._frequency = {}    # palabra -> productos que la contienen
+        self._deletes = {}      # variante con borrados -> {palabras}
+        self._doc_words = {}    # idProduct -> palabras del producto
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._frequency)
+
+    def __contains__(self, word):
+        return word in self._frequency
+
+    @staticmethod
+    def _words_for(row):
+        text = f"{row.get('nameProduct') or ''} {row.get('category') or ''}"
+        return {w for w in words(text)
+                if MIN_WORD_LENGTH <= len(w) <= MAX_WORD_LENGTH and not w.isdigit()}
+
+    def _add_word(self, word):
+        count = self._frequency.get(word, 0)
+        self._frequency[word] = count + 1
+        if count == 0:
+            for variant in _deletes(word, self.max_distance):
+                self._deletes.setdefault(variant, set()).add(word)
+
+    def _remove_word(self, word):
+        count = self._frequency.get(word, 0) - 1
+        if count > 0:
+            self._frequency[word] = count
+            return
+        self._frequency.pop(word, None)
+        for variant in _deletes(word, self.max_distance):
+            bucket = self._deletes.get(variant)
+            if bucket is not None:
+                bucket.discard(word)
+                if not bucket:
+                    del self._deletes[variant]
+
+    def _remove(self, product_id):
+        for word in self._doc_words.pop(product_id, ()):
+            self._remove_word(word)
+
+    def _add(self, row):
+        product_id = row['idProduct']
+        new_words = self._words_for(row) if row.get('status') == 'Activo' else set()
+        old_words = self._doc_words.get(product_id, set())
+        # Solo se tocan las palabras que cambiaron
+        for word in old_words - new_words:
+            self._remove_word(word)
+        for word in new_words - old_words:
+            self._add_word(word)
+        if new_words:
+            self._doc_words[product_id] = new_words
+        else:
+            self._doc_words.pop(product_id, None)
+
+    def build(self, rows):
+        with self._lock:
+            self._frequency = {}
+            self._deletes = {}
+            self._doc_words = {}
+            for row in rows:
+                self._add(row)
+            self.ready = True
+
+    def rebuild(self):
+        from app.models1 import db
+        with db.engine.connect() as connection:
+            self.build(load_product_rows(connection))
+
+    def apply_changes(self, rows, deleted_ids=()):
+        with self._lock:
+            for product_id in deleted_ids:
+                self._remove(product_id)
+            for row in rows:
+                self._add(row)
+
+    def candidates(self, word, limit=SUGGESTION_LIMIT):
+        """[(palabra, distancia)] más cercanas, de menor distancia y más frecuentes"""
+        with self._lock:
+            if word in self._frequency:
+                return [(word, 0)]
+            if len(word) > MAX_WORD_LENGTH:
+                return []
+            found = {}
+            for variant in _deletes(word, self.max_distance):
+                for candidate in self._deletes.get(variant, ()):
+                    if candidate not in found:
+                        distance = edit_distance(word, candidate, self.max_distance)
+                        if distance <= self.max_distance:
+                            found[candidate] = distance
+            ranked = sorted(found.items(), key=lambda item: (item[1], -self._frequency[item[0]], item[0]))
+        return ranked[:limit]
+
+    def suggest(self, query, limit=SUGGESTION_LIMIT):
+        """Consultas corregidas completas, o [] si no hay nada que corregir"""
+        options = []
+        changed = False
+        corrected = 0
+        # Palabras repetidas no aportan nada a la búsqueda: una sola vez cada una
+        for word in dict.fromkeys(words(query)):
+            if (len(word) < MIN_WORD_LENGTH or len(word) > MAX_WORD_LENGTH
+                    or word.isdigit() or corrected >= MAX_CORRECTED_WORDS):
+                options.append([(word, 0)])
+                continue
+            corrected += 1
+            found = self.candidates(word)
+            if not found:
+                options.append([(word, 0)])
+                continue
+            changed = changed or found[0][1] > 0
+            options.append(found)
+        if not changed:
+            return []
+
+        # Búsqueda en haz: palabra a palabra se guardan solo las BEAM_WIDTH
+        # mejores frases parciales (menor distancia total, más frecuentes)
+        beam = [((), 0, 0)]
+        for found in options:
+            beam = sorted(
+                ((phrase + (word,), distance + extra, frequency + self._frequency.get(word, 0))
+                 for phrase, distance, frequency in beam
+                 for word, extra in found),
+                key=lambda item: (item[1], -item[2])
+            )[:max(BEAM_WIDTH, limit)]
+
+        suggestions = []
+        for phrase, _, _ in beam:
+            phrase = ' '.join(phrase)
+            if phrase not in suggestions:
+                suggestions.append(phrase)
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+
+product_spelling = SpellingSuggester()
+
+
+@register_product_listener
+def _update_product_spelling(rows, deleted_ids):
+    if product_spelling.ready:
+        product_spelling.apply_changes(rows, deleted_ids)
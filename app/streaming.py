@@ -0,0 +1,64 @@
+import json
+
+from flask import Response, stream_with_context
+
+# Filas que se leen del cursor del servidor por cada viaje a la BD
+STREAM_BATCH_SIZE = 500
+# Objetos serializados que se agrupan en cada fragmento enviado al cliente
+STREAM_CHUNK_ROWS = 100
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_stream(request):
+    """Devuelve 'ndjson', 'json' o None según ?stream= o la cabecera Accept"""
+    mode = request.args.get('stream', '').lower()
+    if mode in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    if mode in ('1', 'true', 'json'):
+        return 'json'
+    if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return 'ndjson'
+    return None
+
+
+def stream_query(query, batch_size=STREAM_BATCH_SIZE):
+    """Itera la consulta con cursor del lado del servidor (memoria acotada)"""
+    return query.execution_options(stream_results=True).yield_per(batch_size)
+
+
+def _ndjson_chunks(rows, serialize):
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(serialize(row), ensure_ascii=False))
+        if len(buffer) >= STREAM_CHUNK_ROWS:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    if buffer:
+        yield '\n'.join(buffer) + '\n'
+
+
+def _json_array_chunks(rows, serialize):
+    yield '['
+    buffer = []
+    first = True
+    for row in rows:
+        buffer.append(json.dumps(serialize(row), ensure_ascii=False))
+        if len(buffer) >= STREAM_CHUNK_ROWS:
+            yield ('' if first else ',') + ','.join(buffer)
+            first = False
+            buffer = []
+    if buffer:
+        yield ('' if first else ',') + ','.join(buffer)
+    yield ']'
+
+
+def stream_response(rows, serialize, mode):
+    """Respuesta HTTP fragmentada con un arreglo JSON o NDJSON"""
+    if mode == 'ndjson':
+        chunks = _ndjson_chunks(rows, serialize)
+        mimetype = NDJSON_MIMETYPE
+    else:
+        chunks = _json_array_chunks(rows, serialize)
+        mimetype = 'application/json'
+    return Response(stream_with_context(chunks), mimetype=mimetype)
@@ -22,4 +22,65 @@ def user(app):
     db.session.add(user)
     db.session.commit()  # Commit changes within the context
     yield user    
-  # Cleanup changes within the context
\ No newline at end of file
+  # Cleanup changes within the context
+
+@pytest.fixture
+def sqlite_app(tmp_path, monkeypatch):
+    """App completa sobre un SQLite temporal, con tablas y un admin (admin / admin123)"""
+    from app.models1 import User
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'tienda.db'}")
+    monkeypatch.setenv('START_BACKGROUND_JOBS', 'False')
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        admin = User(nameUser='admin', emailUser='admin@fashion.com', is_admin=True)
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def admin_client(sqlite_app):
+    client = sqlite_app.test_client()
+    client.post('/login', data={'nameUser': 'admin', 'passwordUser': 'admin123'})
+    return client
+
+
+@pytest.fixture
+def products(sqlite_app):
+    """Tres productos activos; el primero con variantes (una inactiva) e imágenes"""
+    from app.models1 import Color, Product, ProductImage, ProductVariant, Size
+    red, blue = Color(nameColor='Rojo', hex_code='#ff0000'), Color(nameColor='Azul', hex_code='#0000ff')
+    small, medium, large = Size(nameSize='S'), Size(nameSize='M'), Size(nameSize='L')
+    rows = [Product(nameProduct=name, description='', price=price, stock=5, category='Vestidos', status='Activo')
+            for name, price in (('Vestido', 40), ('Falda', 25), ('Blusa', 15))]
+    db.session.add_all([red, blue, small, medium, large, *rows])
+    db.session.flush()
+    dress = rows[0]
+    db.session.add_all([
+        ProductVariant(idProduct=dress.idProduct, sku='VES-S-ROJO', color=red, size=small, stock=0),
+        ProductVariant(idProduct=dress.idProduct, sku='VES-M-ROJO', color=red, size=medium, stock=1, price_extra=5),
+        ProductVariant(idProduct=dress.idProduct, sku='VES-L-AZUL', color=blue, size=large, stock=4, status='Inactivo'),
+        ProductImage(idProduct=dress.idProduct, image_url='a.jpg', is_main=False),
+        ProductImage(idProduct=dress.idProduct, image_url='b.jpg', is_main=True),
+    ])
+    db.session.commit()
+    return [product.idProduct for product in rows]
+
+
+@pytest.fixture
+def sql_statements(sqlite_app):
+    """SQL que se envía a la BD mientras dura la prueba"""
+    from sqlalchemy import event
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', record)
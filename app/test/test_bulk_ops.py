@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy.dialects import mysql
+
+from app.bulk_ops import parse_rule
+
+
+def test_bulk_rule_validation_and_auto_status():
+    rule = parse_rule({'filter': {'stock_max': 2}, 'changes': {'stock': {'mode': 'add', 'value': -1}}})
+    # Al cambiar el stock el estado se recalcula en el mismo UPDATE
+    assert set(rule.values) == {'stock', 'status'}
+
+    rule = parse_rule({'filter': {'all': True}, 'changes': {'price': {'mode': 'percent', 'value': '-20'}}})
+    assert set(rule.values) == {'price'}
+
+    with pytest.raises(ValueError):
+        parse_rule({'changes': {'status': 'Activo'}})
+    with pytest.raises(ValueError):
+        parse_rule({'filter': {'ids': [1]}, 'changes': {'price': {'mode': 'double', 'value': 2}}})
+    with pytest.raises(ValueError):
+        parse_rule({'filter': {'ids': [1]}, 'changes': {'stock': {'mode': 'set', 'value': -3}}})
+    with pytest.raises(ValueError):
+        parse_rule({'filter': {'ids': [1]}, 'changes': {}})
+
+
+def test_bulk_update_assigns_status_before_stock_on_mysql():
+    rule = parse_rule({'filter': {'ids': [1]}, 'changes': {'stock': {'mode': 'add', 'value': -1}}})
+    sql = str(rule.update_statement(rule.where).compile(dialect=mysql.dialect()))
+    assignments = sql.split(' SET ', 1)[1].split(' WHERE ', 1)[0]
+
+    # MySQL evalúa el SET de izquierda a derecha: el CASE del estado debe ver
+    # el stock anterior
+    assert assignments.startswith('status=')
+    assert assignments.index('status=') < assignments.index('stock=')
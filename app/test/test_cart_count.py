@@ -0,0 +1,36 @@
+from app.cart_count import CartCountCache
+
+
+class _FakeCartCounts(CartCountCache):
+    def __init__(self, counts, **kwargs):
+        super().__init__(**kwargs)
+        self.counts = counts
+        self.loads = 0
+
+    def _load(self, user_id):
+        self.loads += 1
+        return self.counts.get(user_id, 0)
+
+
+def test_cart_count_cache_set_invalidate_and_ttl():
+    cache = _FakeCartCounts({1: 3})
+
+    assert cache.get(1) == 3
+    assert cache.get(1) == 3
+    assert cache.loads == 1
+
+    # Lo publicado por las rutas se sirve sin recontar
+    cache.set(1, 4)
+    assert cache.get(1) == 4
+    assert cache.loads == 1
+
+    cache.counts[1] = 5
+    cache.invalidate([1])
+    assert cache.get(1) == 5
+    assert cache.loads == 2
+
+    # Con el TTL vencido se vuelve a contar en cada lectura
+    expired = _FakeCartCounts({2: 1}, ttl=-1)
+    expired.get(2)
+    expired.get(2)
+    assert expired.loads == 2
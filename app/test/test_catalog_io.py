@@ -0,0 +1,33 @@
+import io
+
+from sqlalchemy import select
+
+from app.catalog_io import import_catalog
+from app.models1 import Product, db
+
+
+def _statuses():
+    return dict(db.session.execute(select(Product.nameProduct, Product.status)).all())
+
+
+def test_import_derives_status_from_final_stock(sqlite_app):
+    db.session.add_all([
+        Product(nameProduct='Agotado', description='', price=10, stock=0, category='Vestidos', status='Inactivo'),
+        Product(nameProduct='Vendido', description='', price=10, stock=4, category='Vestidos', status='Activo'),
+    ])
+    db.session.commit()
+
+    summary = import_catalog(io.StringIO(
+        'nameProduct,price,stock\n'
+        'Nuevo sin stock,10,0\n'
+        'Nuevo,10,3\n'
+        'Agotado,,5\n'
+        'Vendido,,0\n'
+    ))
+    assert (summary.inserted, summary.updated, summary.errors) == (2, 2, 0)
+    assert _statuses() == {'Nuevo sin stock': 'Inactivo', 'Nuevo': 'Activo',
+                           'Agotado': 'Activo', 'Vendido': 'Inactivo'}
+
+    # Con columna status se respeta lo que trae el archivo
+    import_catalog(io.StringIO('nameProduct,stock,status\nVendido,0,Activo\n'))
+    assert _statuses()['Vendido'] == 'Activo'
@@ -0,0 +1,34 @@
+from sqlalchemy import select
+
+from app.catalog_events import load_product_rows
+from app.categories import category_directory
+from app.models1 import Category, Product, db
+from app.search_index import product_search
+
+
+def test_category_rename_updates_one_row_and_reindexes(sqlite_app, sql_statements, monkeypatch):
+    # El índice global vuelve a quedar sin construir al terminar la prueba
+    monkeypatch.setattr(product_search, 'ready', False)
+    category = Category(nameCategory='Vestidos', status='Activa')
+    db.session.add(category)
+    db.session.add_all([Product(nameProduct=f'Prenda {i}', description='', price=10, stock=1,
+                                category='Vestidos', status='Activo') for i in range(3)])
+    db.session.commit()
+    product_search.rebuild()
+    assert len(product_search.search('vestidos')[0]) == 3
+
+    sql_statements.clear()
+    category.nameCategory = 'Faldas'
+    db.session.commit()
+    statements = list(sql_statements)
+
+    # Solo se escribe la fila de la categoría; los productos conservan su texto
+    assert len([s for s in statements if s.startswith('UPDATE category')]) == 1
+    assert not any(s.startswith('UPDATE product ') for s in statements)
+    assert db.session.execute(select(Product.category).distinct()).scalars().all() == ['Vestidos']
+
+    with db.engine.connect() as connection:
+        assert {row['category'] for row in load_product_rows(connection)} == {'Faldas'}
+    assert category_directory.resolve('faldas') == category.idCategory
+    assert len(product_search.search('faldas')[0]) == 3
+    assert product_search.search('vestidos')[0] == []
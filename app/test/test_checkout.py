@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import mysql
+
+from app.checkout import CheckoutError, _decrement_statement, checkout
+from app.models1 import CartItem, Order, OrderDetail, Product, User, db
+
+
+def test_decrement_assigns_status_before_stock_on_mysql():
+    sql = str(_decrement_statement({3: 2, 5: 1}).compile(dialect=mysql.dialect()))
+    assignments = sql.split(' SET ', 1)[1].split(' WHERE ', 1)[0]
+
+    # MySQL evalúa el SET de izquierda a derecha: el CASE del estado debe ver
+    # el stock anterior, así que status se asigna antes que stock
+    assert assignments.startswith('status=')
+    assert assignments.index('status=') < assignments.index('stock=')
+    assert 'product.stock >= CASE product.`idProduct`' in sql
+
+
+def _cart(quantities, stocks):
+    """Usuario con {índice de producto: cantidad} en el carrito; devuelve (idUser, productos)"""
+    user = User(nameUser='cliente', emailUser='cliente@example.com')
+    user.set_password('x')
+    products = [Product(nameProduct=f'Prenda {i}', description='', price=Decimal('12.50') * (i + 1),
+                        stock=stock, category='Vestidos', status='Activo')
+                for i, stock in enumerate(stocks)]
+    db.session.add(user)
+    db.session.add_all(products)
+    db.session.flush()
+    db.session.add_all([CartItem(idUser=user.idUser, idProduct=products[i].idProduct, quantity=quantity)
+                        for i, quantity in quantities.items()])
+    db.session.commit()
+    return user.idUser, [product.idProduct for product in products]
+
+
+def _product(product_id):
+    return db.session.execute(
+        select(Product.stock, Product.status).where(Product.idProduct == product_id)
+    ).one()
+
+
+def test_checkout_without_stock_changes_nothing(sqlite_app):
+    user_id, (first, second) = _cart({0: 1, 1: 3}, stocks=[5, 2])
+
+    with pytest.raises(CheckoutError) as error:
+        checkout(user_id)
+
+    assert [shortage['product_id'] for shortage in error.value.shortages] == [second]
+    assert tuple(_product(first)) == (5, 'Activo')
+    assert tuple(_product(second)) == (2, 'Activo')
+    assert db.session.scalar(select(func.count()).select_from(Order)) == 0
+    assert db.session.scalar(select(func.count()).select_from(CartItem)) == 2
+
+
+def test_checkout_creates_order_clears_cart_and_deactivates_sold_out(sqlite_app):
+    user_id, (first, second) = _cart({0: 2, 1: 3}, stocks=[5, 3])
+
+    order = checkout(user_id)
+
+    # 2 × 12.50 + 3 × 25.00
+    assert order == {'order_id': order['order_id'], 'total': 100.0, 'items': 2}
+    assert db.session.get(Order, order['order_id']).totalAmount == Decimal('100.00')
+    assert db.session.scalar(select(func.count()).select_from(OrderDetail)) == 2
+    assert db.session.scalar(select(func.count()).select_from(CartItem)) == 0
+    assert tuple(_product(first)) == (3, 'Activo')
+    # El último lote vendido deja el producto sin stock e inactivo
+    assert tuple(_product(second)) == (0, 'Inactivo')
+
+    with pytest.raises(CheckoutError):
+        checkout(user_id)
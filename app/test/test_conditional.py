@@ -0,0 +1,37 @@
+from sqlalchemy import select
+
+from app.models1 import DataVersion, Product, User, db
+
+
+def _versions():
+    return dict(db.session.execute(select(DataVersion.name, DataVersion.version)).all())
+
+
+def test_versions_are_bumped_after_commit(admin_client):
+    response = admin_client.get('/api/products')
+    etag = response.headers['ETag']
+    assert admin_client.get('/api/products', headers={'If-None-Match': etag}).status_code == 304
+
+    db.session.add(Product(nameProduct='Vestido', description='', price=10, stock=1,
+                           category='Vestidos', status='Activo'))
+    db.session.flush()
+    # Dentro de la transacción del escritor no se toca data_version
+    assert 'catalog' not in _versions()
+    db.session.commit()
+    versions = _versions()
+    assert versions['catalog'] == 1
+
+    response = admin_client.get('/api/products', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+
+    # Editar un usuario (p. ej. al iniciar sesión) no invalida las estadísticas
+    admin = User.query.filter_by(nameUser='admin').first()
+    admin.emailUser = 'otro@fashion.com'
+    db.session.commit()
+    assert _versions().get('users') == versions.get('users')
+
+    db.session.add(Product(nameProduct='Falda', description='', price=10, stock=1,
+                           category='Faldas', status='Activo'))
+    db.session.flush()
+    db.session.rollback()
+    assert _versions()['catalog'] == 1
@@ -0,0 +1,33 @@
+from app.facets import FacetIndex, ids_from_bits
+
+
+def _row(id_, category_id, price, stock=1, status='Activo'):
+    return {'idProduct': id_, 'category_id': category_id, 'price': price, 'stock': stock, 'status': status}
+
+
+def test_facets_intersect_filters_and_count_other_facets():
+    facets = FacetIndex()
+    facets.build(
+        [_row(1, 10, 20), _row(2, 10, 60, stock=0), _row(3, 20, 30), _row(4, 10, 40, status='Inactivo')],
+        [(1, 'Rojo', 'M', 3), (2, 'Azul', 'M', 0), (3, 'Rojo', 'L', 0)]
+    )
+
+    ids, total, counts = facets.search({'category': {10}, 'color': {'Rojo', 'Azul'}})
+    assert (ids, total) == ([1, 2], 2)
+    # El conteo de color ignora el filtro de color pero respeta la categoría
+    assert counts['color'] == {'Rojo': 1, 'Azul': 1}
+    assert counts['category'] == {10: 2, 20: 1}
+
+    assert facets.search({'stock': {'in_stock'}})[0] == [1, 3]
+
+    facets.apply_variant_changes([2], [(2, 'Azul', 'S', 5)])
+    facets.apply_changes([_row(3, 20, 30, status='Inactivo')])
+    assert facets.search({'stock': {'in_stock'}})[0] == [1, 2]
+    ids, total, _ = facets.search({'size': {'S'}}, offset=0, limit=1)
+    assert (ids, total) == ([2], 1)
+
+
+def test_ids_from_bits_paginates_in_ascending_order():
+    bits = (1 << 3) | (1 << 7) | (1 << 40)
+    assert ids_from_bits(bits) == [3, 7, 40]
+    assert ids_from_bits(bits, offset=1, limit=1) == [7]
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+from flask import Flask
+
+from app import guest_cart
+from app.guest_cart import GUEST_CART_KEY, guest_add, guest_count, guest_remove, guest_update
+
+
+def _product(product_id, stock=10, status='Activo'):
+    return SimpleNamespace(idProduct=product_id, stock=stock, status=status)
+
+
+def test_guest_cart_is_bounded_and_lives_in_the_session(monkeypatch):
+    monkeypatch.setattr(guest_cart, 'GUEST_CART_MAX_LINES', 2)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+
+    with app.test_request_context():
+        from flask import session
+
+        assert guest_count() == 0
+        assert GUEST_CART_KEY not in session
+
+        assert guest_add(_product(1), 2)[:3] == (True, 2, 1)
+        assert guest_add(_product(1), 1)[:3] == (True, 3, 1)
+        # Sin stock para la cantidad final no cambia nada
+        assert guest_add(_product(1, stock=3), 1)[0] is False
+        assert guest_add(_product(2, status='Inactivo'), 1)[0] is False
+
+        assert guest_add(_product(2), 1)[0] is True
+        added, _, count, message = guest_add(_product(3), 1)
+        assert not added and count == 2 and message
+
+        assert guest_update(_product(2), 4) == (True, None)
+        assert session[GUEST_CART_KEY] == {'1': 3, '2': 4}
+
+        assert guest_remove(1) == (True, 1)
+        assert guest_remove(2) == (True, 0)
+        assert GUEST_CART_KEY not in session
@@ -0,0 +1,16 @@
+from app.images import image_src, image_srcset, local_digest
+
+DIGEST = 'ab' * 32
+
+
+def test_local_image_urls_map_to_derivatives():
+    url = f'/img/{DIGEST}/detail.jpg'
+    assert local_digest(url) == DIGEST
+    assert image_src(url, 'card') == f'/img/{DIGEST}/card.jpg'
+    assert image_srcset(url, 'webp').split(', ')[0] == f'/img/{DIGEST}/thumb.webp 160w'
+
+    # Las URLs externas se dejan igual y no llevan srcset
+    external = 'https://example.com/foto.jpg'
+    assert image_src(external, 'card') == external
+    assert image_srcset(external) == ''
+    assert image_src(None) is None
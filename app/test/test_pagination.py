@@ -0,0 +1,76 @@
+from app import pagination
+from app.pagination import approximate_count
+
+
+class _CountQuery:
+    def __init__(self, total):
+        self.total = total
+        self.counts = 0
+
+    def order_by(self, *args):
+        return self
+
+    def count(self):
+        self.counts += 1
+        return self.total
+
+
+def test_approximate_count_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(pagination, 'APPROX_COUNT_MAX_ENTRIES', 3)
+    monkeypatch.setattr(pagination, '_count_cache', pagination.OrderedDict())
+
+    query = _CountQuery(7)
+    assert approximate_count(('buscar', 'a'), query) == 7
+    assert approximate_count(('buscar', 'a'), query) == 7
+    assert query.counts == 1
+
+    # Claves arbitrarias de la URL no hacen crecer la caché sin límite
+    for i in range(20):
+        approximate_count(('buscar', f'x{i}'), query)
+    assert len(pagination._count_cache) == 3
+    assert ('buscar', 'a') not in pagination._count_cache
+
+    # Los vencidos se descartan al leerlos
+    approximate_count(('categoria', 'vestidos'), query, ttl=-1)
+    approximate_count(('categoria', 'vestidos'), query)
+    assert query.counts == 23
+
+
+def test_page_links_keep_sort_and_filters(sqlite_app, monkeypatch):
+    from app.facets import product_facets
+    from app.models1 import Category, Product, db
+    monkeypatch.setattr(product_facets, 'ready', False)
+
+    category = Category(nameCategory='Vestidos', status='Activa')
+    db.session.add(category)
+    db.session.flush()
+    db.session.add_all([Product(nameProduct=f'Vestido {i}', description='', price=10 + i, stock=i % 2,
+                                category='Vestidos', category_id=category.idCategory, status='Activo')
+                        for i in range(80)])
+    db.session.commit()
+
+    client = sqlite_app.test_client()
+    html = client.get('/categoria/Vestidos?sort=price_desc&in_stock=1').get_data(as_text=True)
+    assert '/categoria/Vestidos?sort=price_desc&amp;in_stock=1&amp;page=2' in html
+
+    html = client.get('/?sort=price_asc&after=').get_data(as_text=True)
+    assert '/?sort=price_asc&amp;after=' in html
+
+
+def test_keyset_filter_ids_pages_a_sorted_filtered_set(sqlite_app):
+    from app.models1 import Product, db
+    from app.pagination import CATALOG_SORTS, keyset_filter_ids, sorted_query
+
+    db.session.add_all([Product(nameProduct=f'Vestido {i}', description='', price=10 + i % 20, stock=1,
+                                category='Vestidos', status='Activo') for i in range(80)])
+    db.session.commit()
+    keys = CATALOG_SORTS['price_desc']
+    query = sorted_query(Product.query.filter(Product.status == 'Activo'), keys)
+    rows = query.all()
+    keep = {product.idProduct for product in rows if product.idProduct % 3 == 0}
+    expected = [product.idProduct for product in rows if product.idProduct in keep]
+
+    # Lotes pequeños: la página cruza varios pasos del recorrido
+    assert keyset_filter_ids(query, keys, keep.__contains__, 5, 10, batch_size=7) == expected[5:15]
+    assert keyset_filter_ids(query, keys, keep.__contains__, 20, 10, batch_size=7) == expected[20:]
+    assert keyset_filter_ids(query, keys, keep.__contains__, 40, 10, batch_size=7) == []
@@ -0,0 +1,48 @@
+import pytest
+
+from app.models1 import Color, ProductImage, db
+from app.product_aggregate import product_aggregates
+
+
+def test_product_aggregate_assembles_variants_and_images(products):
+    product_aggregates.clear()
+    try:
+        aggregate = product_aggregates.get(products[0])
+
+        # La variante inactiva no aparece; el resto en orden de id
+        assert [variant.sku for variant in aggregate.variants] == ['VES-S-ROJO', 'VES-M-ROJO']
+        assert aggregate.variants[1].price == 45.0
+        assert aggregate.colors == (('Rojo', '#ff0000'),)
+        assert aggregate.sizes == ('S', 'M')
+        assert [image.url for image in aggregate.images] == ['b.jpg', 'a.jpg']
+        assert aggregate.to_dict()['id'] == products[0]
+        with pytest.raises(AttributeError):
+            aggregate.variants = ()
+
+        assert product_aggregates.get(products[1]).variants == ()
+        assert product_aggregates.get(404) is None
+    finally:
+        product_aggregates.clear()
+
+
+def test_product_aggregate_is_invalidated_by_commits(products):
+    dress = products[0]
+    product_aggregates.clear()
+    try:
+        aggregate = product_aggregates.get(dress)
+        assert product_aggregates.get(dress) is aggregate
+
+        # Una imagen nueva invalida solo ese producto
+        other = product_aggregates.get(products[1])
+        db.session.add(ProductImage(idProduct=dress, image_url='c.jpg', is_main=False))
+        db.session.commit()
+        assert [image.url for image in product_aggregates.get(dress).images] == ['b.jpg', 'a.jpg', 'c.jpg']
+        assert product_aggregates.get(products[1]) is other
+
+        # Renombrar un color vacía todo (aparece en muchos productos)
+        Color.query.filter_by(nameColor='Rojo').one().nameColor = 'Carmesí'
+        db.session.commit()
+        assert product_aggregates.get(dress).colors == (('Carmesí', '#ff0000'),)
+        assert product_aggregates.get(products[1]) is not other
+    finally:
+        product_aggregates.clear()
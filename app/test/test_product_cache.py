@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import update
+
+from app import product_cache as product_cache_module
+from app.catalog_events import notify_products_changed
+from app.models1 import Product, db
+from app.product_cache import ProductCache, product_cache
+
+
+def _product_reads(statements):
+    return len([s for s in statements if s.startswith('SELECT') and 'FROM product' in s])
+
+
+def test_product_cache_lru_ttl_and_negative_entries(products, sql_statements, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(product_cache_module, 'time', SimpleNamespace(monotonic=lambda: clock[0]))
+    cache = ProductCache(max_entries=2, ttl=60, negative_ttl=15)
+    dress, skirt, _ = products
+    sql_statements.clear()
+
+    assert cache.get(dress).nameProduct == 'Vestido'
+    assert cache.get(str(dress)).nameProduct == 'Vestido'
+    assert cache.get(999) is None
+    assert cache.get(999) is None
+    assert _product_reads(sql_statements) == 2
+    assert cache.stats()['hits'] == 1 and cache.stats()['negative_hits'] == 1
+
+    # dress se usó antes que 999: sale dress al entrar skirt
+    cache.get(skirt)
+    assert cache.stats()['evictions'] == 1
+    cache.get(dress)
+    assert _product_reads(sql_statements) == 4
+
+    # Vencido el TTL se vuelve a leer la fila
+    clock[0] += 61
+    cache.get(skirt)
+    assert _product_reads(sql_statements) == 5
+    with pytest.raises(AttributeError):
+        cache.get(skirt).price = 1
+
+    # Los ids inexistentes caducan antes (NEGATIVE_TTL)
+    cache.get(404)
+    clock[0] += 16
+    cache.get(404)
+    assert _product_reads(sql_statements) == 7
+
+
+def test_product_cache_is_invalidated_by_commits(products):
+    dress, skirt, _ = products
+    product_cache.clear()
+    try:
+        assert product_cache.get(dress).stock == 5
+        assert product_cache.get(404) is None
+
+        # Cambio por el ORM
+        db.session.get(Product, dress).stock = 2
+        db.session.commit()
+        assert product_cache.get(dress).stock == 2
+
+        # UPDATE masivo avisado con notify_products_changed
+        db.session.execute(update(Product).where(Product.idProduct == dress).values(price=99))
+        notify_products_changed(db.session, [dress])
+        db.session.commit()
+        assert product_cache.get(dress).price == 99
+
+        # Lo que no se confirma no invalida
+        db.session.get(Product, skirt).stock = 0
+        db.session.flush()
+        db.session.rollback()
+        assert product_cache.get(skirt).stock == 5
+
+        db.session.delete(db.session.get(Product, skirt))
+        db.session.commit()
+        assert product_cache.get(skirt) is None
+    finally:
+        product_cache.clear()
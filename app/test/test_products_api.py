@@ -0,0 +1,34 @@
+import json
+
+from app.models1 import Product, db
+
+
+def _add_products(*prices):
+    db.session.add_all([Product(nameProduct=f'Prenda {price}', description='', price=price, stock=3,
+                                category='Vestidos', status='Activo') for price in prices])
+    db.session.commit()
+
+
+def test_api_products_lists_sorts_and_streams(admin_client):
+    _add_products(30, 10, 20)
+
+    response = admin_client.get('/api/products?sort=price_asc')
+    assert response.status_code == 200
+    assert [product['price'] for product in response.get_json()] == [10, 20, 30]
+
+    response = admin_client.get('/api/products?sort=price_desc&stream=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+    assert [product['price'] for product in lines] == [30, 20, 10]
+
+    response = admin_client.get('/api/products', headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    assert len(response.get_data(as_text=True).splitlines()) == 3
+
+    response = admin_client.get('/api/products?stream=json')
+    assert len(json.loads(response.get_data(as_text=True))) == 3
+
+
+def test_api_products_requires_login(sqlite_app):
+    response = sqlite_app.test_client().get('/api/products')
+    assert response.status_code == 302
@@ -0,0 +1,19 @@
+from app.related import compute_related
+
+
+def test_related_prefers_category_price_and_copurchase():
+    catalog = {
+        1: (10, 50),
+        2: (10, 55),
+        3: (10, 500),
+        4: (20, 50),
+        5: (20, 900),
+    }
+
+    related = compute_related(catalog, {}, [1], limit=2)
+    assert related[1] == [2, 3]
+
+    # Comprados juntos a menudo supera a la misma categoría con precio lejano
+    related = compute_related(catalog, {1: {4: 10}}, [1, 9], limit=2)
+    assert related[1] == [4, 2]
+    assert related[9] is None
@@ -0,0 +1,117 @@
+from app.search_index import ProductSearchIndex, fold_accents, tokenize
+from app.spelling import SpellingSuggester, edit_distance
+from app.typeahead import ProductTypeahead
+
+
+def _row(id_, name, category='', description='', status='Activo', stock=1):
+    return {
+        'idProduct': id_,
+        'nameProduct': name,
+        'category': category,
+        'description': description,
+        'status': status,
+        'stock': stock,
+        'price': 10
+    }
+
+
+def test_tokenize_folds_accents_and_plurals():
+    assert fold_accents('Suéter Ñandú') == 'sueter ñandu'
+    assert tokenize('Pantalones Vestidos camisas') == ['pantalon', 'vestido', 'camisa']
+
+
+def test_search_ranks_name_matches_first():
+    index = ProductSearchIndex()
+    index.build([
+        _row(1, 'Camisa blanca', 'Camisas', 'Combina con un vestido'),
+        _row(2, 'Vestido rojo', 'Vestidos', 'Vestido largo de fiesta'),
+        _row(3, 'Jean azul', 'Pantalones'),
+    ])
+
+    ids, total = index.search('vestidos')
+    assert ids == [2, 1]
+    assert total == 2
+
+
+def test_search_paginates_by_rank():
+    index = ProductSearchIndex()
+    index.build([_row(i, f'Blusa {i}', 'Blusas') for i in range(1, 8)])
+
+    first, total = index.search('blusa', offset=0, limit=3)
+    second, _ = index.search('blusa', offset=3, limit=3)
+    assert total == 7
+    assert len(first) == 3 and len(second) == 3
+    assert not set(first) & set(second)
+
+
+def test_apply_changes_updates_and_removes_documents():
+    index = ProductSearchIndex()
+    index.build([_row(1, 'Falda negra'), _row(2, 'Falda azul')])
+
+    index.apply_changes([_row(1, 'Chaqueta negra')], deleted_ids=[2])
+    assert index.search('falda') == ([], 0)
+    assert index.search('chaqueta') == ([1], 1)
+
+    index.apply_changes([_row(1, 'Chaqueta negra', status='Inactivo')])
+    assert index.search('chaqueta') == ([], 0)
+    assert len(index) == 0
+
+
+def test_typeahead_matches_every_prefix_ordered_by_sales_then_stock():
+    typeahead = ProductTypeahead()
+    typeahead.build([
+        _row(1, 'Vestido rojo', 'Vestidos', stock=2),
+        _row(2, 'Vestido azul', 'Vestidos', stock=9),
+        _row(3, 'Camisa roja', 'Camisas', stock=5),
+    ], popularity={1: 40})
+
+    assert [p['idProduct'] for p in typeahead.suggest('ves')] == [1, 2]
+    assert [p['idProduct'] for p in typeahead.suggest('ro ves')] == [1]
+    assert [p['idProduct'] for p in typeahead.suggest('Rój')] == [1, 3]
+
+    typeahead.apply_changes([_row(2, 'Falda azul', 'Faldas')], deleted_ids=[1])
+    assert typeahead.suggest('ves') == []
+    assert [p['idProduct'] for p in typeahead.suggest('fal')] == [2]
+
+
+def test_spelling_suggests_closest_catalog_words():
+    assert edit_distance('vestdo', 'vestido') == 1
+    assert edit_distance('vsetido', 'vestido') == 1
+
+    speller = SpellingSuggester()
+    speller.build([
+        _row(1, 'Vestido largo', 'Vestidos'),
+        _row(2, 'Pantalones cargo', 'Pantalones'),
+    ])
+
+    assert speller.suggest('vestdo')[0] == 'vestido'
+    assert speller.suggest('pantalnes cargo')[0] == 'pantalones cargo'
+    assert speller.suggest('vestido') == []
+    # Palabras repetidas se corrigen una vez; las consultas largas no explotan
+    assert speller.suggest(' '.join(['vestdx'] * 40)) == ['vestido']
+    long_query = speller.suggest(' '.join(f'vestdo{i}' for i in range(30)))[0].split()
+    assert long_query[:5] == ['vestido'] * 5 and long_query[5:] == [f'vestdo{i}' for i in range(5, 30)]
+    # Palabras enormes no se corrigen (ni generan sus borrados)
+    assert speller.suggest('vestdo ' + 'x' * 150)[0] == 'vestido ' + 'x' * 150
+    assert speller.candidates('v' * 600) == []
+    assert speller.suggest('x' * 600 + ' vestdo')[0] == 'x' * 600 + ' vestido'
+
+    speller.apply_changes([], deleted_ids=[1])
+    assert 'vestido' not in speller
+    assert speller.suggest('vestdo') == []
+
+
+def test_typeahead_global_order_is_updated_in_place(monkeypatch):
+    from app import typeahead as typeahead_module
+    # Fuerza el recorrido por el orden global (prefijos "comunes")
+    monkeypatch.setattr(typeahead_module, 'RANGE_SORT_LIMIT', 0)
+    typeahead = ProductTypeahead()
+    typeahead.build([_row(i, f'Vestido {i}', 'Vestidos', stock=i) for i in range(1, 6)])
+
+    assert [p['idProduct'] for p in typeahead.suggest('v', limit=3)] == [5, 4, 3]
+    ranked = typeahead._ranked
+
+    # Una venta cambia el stock: se mueve solo ese producto, sin reordenar todo
+    typeahead.apply_changes([_row(1, 'Vestido 1', 'Vestidos', stock=50)], deleted_ids=[4])
+    assert typeahead._ranked is ranked
+    assert [p['idProduct'] for p in typeahead.suggest('v', limit=3)] == [1, 5, 3]
@@ -0,0 +1,30 @@
+from app.sku_index import SkuIndex
+
+
+def _product(product_id, price, stock=5, status='Activo'):
+    return {'idProduct': product_id, 'nameProduct': f'Producto {product_id}', 'price': price,
+            'stock': stock, 'status': status, 'category': 'Vestidos', 'image': None}
+
+
+def _variant(variant_id, product_id, sku, extra=0, stock=1):
+    return {'idVariant': variant_id, 'idProduct': product_id, 'sku': sku, 'price_extra': extra,
+            'stock': stock, 'status': 'Activo', 'nameColor': 'Rojo', 'nameSize': 'M'}
+
+
+def test_sku_lookup_and_incremental_changes():
+    index = SkuIndex()
+    index.build([_product(1, 20), _product(2, 30)], [_variant(10, 1, 'VES-R-M', extra=2.5)])
+
+    item = index.lookup(' ves-r-m ')
+    assert (item['idProduct'], item['price'], item['stock'], item['color']) == (1, 22.5, 1, 'Rojo')
+    assert index.lookup('PROD-2')['price'] == 30
+    assert index.lookup('NADA') is None
+
+    # Cambio de precio del producto y de SKU de la variante
+    index.apply_changes([_product(1, 40)])
+    index.apply_variant_changes({10}, [_variant(10, 1, 'VES-R-L', extra=2.5)])
+    assert index.lookup('VES-R-M') is None
+    assert index.lookup('VES-R-L')['price'] == 42.5
+
+    index.apply_changes([], deleted_ids={1})
+    assert index.lookup('VES-R-L') is None
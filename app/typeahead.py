@@ -0,0 +1,198 @@
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from sqlalchemy import func, select
+
+from app.catalog_events import load_product_rows, register_product_listener
+from app.search_index import words
+
+# Resultados por defecto de la búsqueda en vivo de facturación
+SUGGESTION_LIMIT = 10
+# Prefijos recientes cuya lista ordenada se conserva entre teclas
+PREFIX_MEMO_SIZE = 2048
+# Rangos de prefijo más grandes que esto no se ordenan; se usa el orden global
+RANGE_SORT_LIMIT = 2000
+
+
+class ProductTypeahead:
+    """Autocompletado por prefijo sobre nombre y categoría, servido desde memoria.
+
+    Guarda un arreglo ordenado de (token, idProduct): cada prefijo es un rango
+    contiguo que se localiza con bisect. Los resultados se ordenan por unidades
+    vendidas y luego por stock.
+    """
+
+    def __init__(self, memo_size=PREFIX_MEMO_SIZE):
+        self.ready = False
+        self._entries = []           # [(token, idProduct)] ordenado
+        self._tokens = {}            # idProduct -> tokens indexados
+        self._docs = {}              # idProduct -> respuesta para billing.html
+        self._popularity = {}        # idProduct -> unidades vendidas
+        self._memo = OrderedDict()   # prefijo -> ids ordenados por relevancia
+        self._ranked = None          # [clave de orden] de todos los productos, ordenada
+        self._rank_keys = {}         # idProduct -> su clave dentro de _ranked
+        self._memo_size = memo_size
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _rank_key(self, product_id):
+        # El id al final desempata y permite ubicar la clave con bisect
+        doc = self._docs[product_id]
+        return (-self._popularity.get(product_id, 0), -(doc['stock'] or 0), doc['nameProduct'] or '', product_id)
+
+    def _remove(self, product_id):
+        for token in self._tokens.pop(product_id, ()):
+            i = bisect_left(self._entries, (token, product_id))
+            if i < len(self._entries) and self._entries[i] == (token, product_id):
+                del self._entries[i]
+        self._docs.pop(product_id, None)
+        key = self._rank_keys.pop(product_id, None)
+        if key is not None and self._ranked is not None:
+            i = bisect_left(self._ranked, key)
+            if i < len(self._ranked) and self._ranked[i] == key:
+                del self._ranked[i]
+
+    def _add(self, row, incremental=True):
+        """Indexa una fila; en la carga inicial (incremental=False) solo se
+        agregan las entradas y build() ordena una vez al final"""
+        product_id = row['idProduct']
+        self._remove(product_id)
+        if row.get('status') != 'Activo':
+            return
+        tokens = tuple(sorted(set(words(f"{row.get('nameProduct') or ''} {row.get('category') or ''}"))))
+        for token in tokens:
+            if incremental:
+                insort(self._entries, (token, product_id))
+            else:
+                self._entries.append((token, product_id))
+        self._tokens[product_id] = tokens
+        self._docs[product_id] = {
+            'idProduct': product_id,
+            'nameProduct': row.get('nameProduct'),
+            'price': float(row['price']) if row.get('price') else 0,
+            'stock': row.get('stock'),
+            'category': row.get('category'),
+            'image': row.get('image')
+        }
+        if incremental and self._ranked is not None:
+            key = self._rank_key(product_id)
+            self._rank_keys[product_id] = key
+            insort(self._ranked, key)
+
+    def build(self, rows, popularity=None):
+        with self._lock:
+            self._entries = []
+            self._tokens = {}
+            self._docs = {}
+            self._memo.clear()
+            self._ranked = None
+            self._rank_keys = {}
+            if popularity is not None:
+                self._popularity = dict(popularity)
+            for row in rows:
+                self._add(row, incremental=False)
+            self._entries.sort()
+            self.ready = True
+
+    def rebuild(self):
+        """Carga productos y ventas acumuladas desde la BD"""
+        from app.models1 import OrderDetail, db
+        with db.engine.connect() as connection:
+            popularity = dict(connection.execute(
+                select(OrderDetail.idProduct, func.sum(OrderDetail.quantity))
+                .group_by(OrderDetail.idProduct)
+            ).all())
+            self.build(load_product_rows(connection), popularity)
+
+    def apply_changes(self, rows, deleted_ids=()):
+        """Reindexa solo los productos cambiados (el orden global se corrige en su lugar)"""
+        with self._lock:
+            changed_tokens = set()
+            for product_id in deleted_ids:
+                changed_tokens.update(self._tokens.get(product_id, ()))
+                self._remove(product_id)
+            for row in rows:
+                changed_tokens.update(self._tokens.get(row['idProduct'], ()))
+                self._add(row)
+                changed_tokens.update(self._tokens.get(row['idProduct'], ()))
+            # Solo caducan los prefijos que tocan a algún producto cambiado
+            for prefix in [prefix for prefix in self._memo
+                           if any(token.startswith(prefix) for token in changed_tokens)]:
+                del self._memo[prefix]
+
+    def set_popularity(self, popularity):
+        # Cambia la clave de todos los productos: el orden global se rehace al usarse
+        with self._lock:
+            self._popularity = dict(popularity)
+            self._memo.clear()
+            self._ranked = None
+            self._rank_keys = {}
+
+    def _prefix_range(self, prefix):
+        lo = bisect_left(self._entries, (prefix,))
+        hi = bisect_left(self._entries, (prefix + '\U0010ffff',), lo)
+        return lo, hi
+
+    def _ranked_ids(self):
+        # Orden global por relevancia: se arma una vez y luego se mantiene
+        # con inserciones puntuales en apply_changes
+        if self._ranked is None:
+            self._rank_keys = {product_id: self._rank_key(product_id) for product_id in self._docs}
+            self._ranked = sorted(self._rank_keys.values())
+        return (key[-1] for key in self._ranked)
+
+    def _ids_for_prefix(self, prefix, lo, hi):
+        ranked = self._memo.get(prefix)
+        if ranked is not None:
+            self._memo.move_to_end(prefix)
+            return ranked
+
+        ids = {product_id for _, product_id in self._entries[lo:hi]}
+        ranked = tuple(sorted(ids, key=self._rank_key))
+
+        self._memo[prefix] = ranked
+        if len(self._memo) > self._memo_size:
+            self._memo.popitem(last=False)
+        return ranked
+
+    def _matches(self, product_id, prefix):
+        return any(token.startswith(prefix) for token in self._tokens[product_id])
+
+    def suggest(self, query, limit=SUGGESTION_LIMIT):
+        """Productos cuyo nombre/categoría contiene palabras que empiezan por cada término"""
+        prefixes = set(words(query))
+        if not prefixes:
+            return []
+        with self._lock:
+            # El término más selectivo define los candidatos; el resto filtra
+            ranges = {prefix: self._prefix_range(prefix) for prefix in prefixes}
+            primary = min(prefixes, key=lambda prefix: ranges[prefix][1] - ranges[prefix][0])
+            lo, hi = ranges[primary]
+            if hi - lo <= RANGE_SORT_LIMIT:
+                candidates = self._ids_for_prefix(primary, lo, hi)
+                filters = prefixes - {primary}
+            else:
+                # Prefijos muy comunes ("v", "ca"): recorrer el orden global y
+                # parar en cuanto haya `limit` coincidencias
+                candidates = self._ranked_ids()
+                filters = prefixes
+
+            results = []
+            for product_id in candidates:
+                if all(self._matches(product_id, prefix) for prefix in filters):
+                    results.append(dict(self._docs[product_id]))
+                    if len(results) >= limit:
+                        break
+            return results
+
+
+product_typeahead = ProductTypeahead()
+
+
+@register_product_listener
+def _update_product_typeahead(rows, deleted_ids):
+    if product_typeahead.ready:
+        product_typeahead.apply_changes(rows, deleted_ids)
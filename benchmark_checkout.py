@@ -0,0 +1,142 @@
+"""Benchmark de concurrencia del checkout (app/checkout.py).
+
+Crea un producto con stock limitado y N usuarios con ese producto en el
+carrito, lanza todos los checkouts a la vez y comprueba que no se vende más
+de lo que había. Usa la BD de DATABASE_URL y borra todo lo que crea.
+
+    python benchmark_checkout.py --users 50 --stock 20 --quantity 1 --workers 16
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import delete, func, select
+
+from app import create_app
+from app.checkout import CheckoutError, checkout
+from app.models1 import CartItem, Order, OrderDetail, Product, User, db
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def _setup(users, stock, quantity):
+    tag = uuid.uuid4().hex[:8]
+    product = Product(nameProduct=f'Benchmark checkout {tag}', description='benchmark',
+                      price=10, stock=stock, category='Benchmark', status='Activo')
+    db.session.add(product)
+    accounts = []
+    for i in range(users):
+        user = User(nameUser=f'bench_{tag}_{i}', emailUser=f'bench_{tag}_{i}@example.com')
+        user.set_password(tag)
+        accounts.append(user)
+    db.session.add_all(accounts)
+    db.session.flush()
+    db.session.add_all([CartItem(idUser=user.idUser, idProduct=product.idProduct, quantity=quantity)
+                        for user in accounts])
+    db.session.commit()
+    return product.idProduct, [user.idUser for user in accounts]
+
+
+def _cleanup(product_id, user_ids):
+    order_ids = select(Order.idOrder).where(Order.idUser.in_(user_ids))
+    db.session.execute(delete(OrderDetail).where(OrderDetail.idOrder.in_(order_ids)))
+    db.session.execute(delete(Order).where(Order.idUser.in_(user_ids)))
+    db.session.execute(delete(CartItem).where(CartItem.idUser.in_(user_ids)))
+    db.session.execute(delete(User).where(User.idUser.in_(user_ids)))
+    db.session.execute(delete(Product).where(Product.idProduct == product_id))
+    db.session.commit()
+
+
+def run_benchmark(app, users=50, stock=20, quantity=1, workers=16):
+    """Devuelve el resumen del benchmark; `oversold` debe ser siempre 0"""
+    with app.app_context():
+        product_id, user_ids = _setup(users, stock, quantity)
+
+    latencies = []
+    outcomes = {'ok': 0, 'sin_stock': 0, 'error': 0}
+    lock = threading.Lock()
+    start = threading.Event()
+
+    def worker(user_id):
+        start.wait()
+        with app.app_context():
+            began = time.perf_counter()
+            try:
+                checkout(user_id)
+                outcome = 'ok'
+            except CheckoutError:
+                outcome = 'sin_stock'
+            except Exception as e:
+                print(f"⚠️  Checkout de {user_id} falló: {e}")
+                outcome = 'error'
+            finally:
+                db.session.remove()
+            elapsed = time.perf_counter() - began
+        with lock:
+            outcomes[outcome] += 1
+            latencies.append(elapsed)
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(worker, user_id) for user_id in user_ids]
+        start.set()
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - began
+
+    with app.app_context():
+        final_stock = db.session.execute(
+            select(Product.stock).where(Product.idProduct == product_id)
+        ).scalar_one()
+        sold = db.session.execute(
+            select(func.coalesce(func.sum(OrderDetail.quantity), 0))
+            .where(OrderDetail.idProduct == product_id)
+        ).scalar_one()
+        _cleanup(product_id, user_ids)
+
+    return {
+        'checkouts': users,
+        'ok': outcomes['ok'],
+        'sin_stock': outcomes['sin_stock'],
+        'errores': outcomes['error'],
+        'stock_inicial': stock,
+        'stock_final': final_stock,
+        'vendido': int(sold),
+        'oversold': max(0, int(sold) - stock) + max(0, -final_stock),
+        'consistente': stock - final_stock == sold,
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1),
+        'media_ms': round(statistics.mean(latencies) * 1000, 1),
+        'total_s': round(wall, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Checkouts concurrentes contra un mismo producto')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--stock', type=int, default=20)
+    parser.add_argument('--quantity', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    result = run_benchmark(create_app(), args.users, args.stock, args.quantity, args.workers)
+    print("🛒 BENCHMARK DE CHECKOUT")
+    print("=" * 50)
+    for key, value in result.items():
+        print(f"{key:>14}: {value}")
+    if result['oversold'] or not result['consistente']:
+        raise SystemExit("❌ Se vendió más stock del disponible")
+    print("✅ Sin sobreventa")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Add product.category_id with backfill and category index
+
+Revision ID: 7c1e4a9b2d10
+Revises: 3a168a450892
+Create Date: 2026-10-17 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4a9b2d10'
+down_revision = '3a168a450892'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_product_category_id', 'category', ['category_id'], ['idCategory'])
+
+    # Crear las categorías que solo existen como texto en product.category
+    op.execute("""
+        INSERT INTO category (nameCategory, status)
+        SELECT DISTINCT p.category, 'Activa'
+        FROM product p
+        WHERE p.category IS NOT NULL AND p.category <> ''
+          AND NOT EXISTS (SELECT 1 FROM category c WHERE c.nameCategory = p.category)
+    """)
+
+    # Backfill de una sola vez desde la columna de texto
+    op.execute("""
+        UPDATE product
+        SET category_id = (
+            SELECT MIN(c.idCategory) FROM category c WHERE c.nameCategory = product.category
+        )
+        WHERE category_id IS NULL AND category IS NOT NULL
+    """)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_category_status_created', ['category_id', 'status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_category_status_created')
+        batch_op.drop_constraint('fk_product_category_id', type_='foreignkey')
+        batch_op.drop_column('category_id')
@@ -0,0 +1,30 @@
+"""Add product_related table for precomputed related products
+
+Revision ID: 9d2f6b3e8a41
+Revises: 7c1e4a9b2d10
+Create Date: 2026-10-17 11:05:12.530971
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2f6b3e8a41'
+down_revision = '7c1e4a9b2d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_related',
+    sa.Column('idProduct', sa.Integer(), nullable=False),
+    sa.Column('related_ids', sa.String(length=255), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['idProduct'], ['product.idProduct'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('idProduct')
+    )
+
+
+def downgrade():
+    op.drop_table('product_related')
@@ -0,0 +1,43 @@
+"""Add data_version counters and product.updated_at
+
+Revision ID: b4e81c7f0a63
+Revises: 9d2f6b3e8a41
+Create Date: 2026-10-17 11:48:02.117384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e81c7f0a63'
+down_revision = '9d2f6b3e8a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("""
+        INSERT INTO data_version (name, version, updated_at)
+        VALUES ('catalog', 1, CURRENT_TIMESTAMP),
+               ('orders', 1, CURRENT_TIMESTAMP),
+               ('users', 1, CURRENT_TIMESTAMP)
+    """)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE product SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    op.drop_table('data_version')
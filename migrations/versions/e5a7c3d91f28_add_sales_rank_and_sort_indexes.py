@@ -0,0 +1,49 @@
+"""Add product.sales_rank and composite indexes for catalog sorts
+
+Revision ID: e5a7c3d91f28
+Revises: b4e81c7f0a63
+Create Date: 2026-10-17 13:02:44.381205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c3d91f28'
+down_revision = 'b4e81c7f0a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sales_rank', sa.Integer(), server_default='0', nullable=False))
+
+    # El orden "más recientes" pagina por created_at: sin NULL el cursor es estable
+    op.execute("UPDATE product SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL")
+
+    op.execute("""
+        UPDATE product SET sales_rank = COALESCE((
+            SELECT SUM(order_detail.quantity)
+            FROM order_detail JOIN orders ON orders.`idOrder` = order_detail.`idOrder`
+            WHERE order_detail.`idProduct` = product.`idProduct` AND orders.status != 'Cancelado'
+        ), 0)
+    """)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_category_status_price', ['category_id', 'status', 'price'], unique=False)
+        batch_op.create_index('ix_product_category_status_sales', ['category_id', 'status', 'sales_rank'], unique=False)
+        batch_op.create_index('ix_product_status_price', ['status', 'price'], unique=False)
+        batch_op.create_index('ix_product_status_created', ['status', 'created_at'], unique=False)
+        batch_op.create_index('ix_product_status_sales', ['status', 'sales_rank'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_status_sales')
+        batch_op.drop_index('ix_product_status_created')
+        batch_op.drop_index('ix_product_status_price')
+        batch_op.drop_index('ix_product_category_status_sales')
+        batch_op.drop_index('ix_product_category_status_price')
+        batch_op.drop_column('sales_rank')
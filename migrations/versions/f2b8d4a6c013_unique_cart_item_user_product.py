@@ -0,0 +1,42 @@
+"""Unique (idUser, idProduct) on cart_item
+
+Revision ID: f2b8d4a6c013
+Revises: e5a7c3d91f28
+Create Date: 2026-10-17 14:21:09.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d4a6c013'
+down_revision = 'e5a7c3d91f28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Las líneas repetidas se funden en la más antigua sumando cantidades
+    connection = op.get_bind()
+    duplicates = connection.execute(sa.text("""
+        SELECT `idUser`, `idProduct`, MIN(`idCartItem`), SUM(quantity)
+        FROM cart_item
+        GROUP BY `idUser`, `idProduct`
+        HAVING COUNT(*) > 1
+    """)).all()
+    for user_id, product_id, keep_id, quantity in duplicates:
+        connection.execute(sa.text("UPDATE cart_item SET quantity = :quantity WHERE `idCartItem` = :keep"),
+                           {'quantity': quantity, 'keep': keep_id})
+        connection.execute(sa.text("""
+            DELETE FROM cart_item
+            WHERE `idUser` = :user AND `idProduct` = :product AND `idCartItem` != :keep
+        """), {'user': user_id, 'product': product_id, 'keep': keep_id})
+
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_cart_item_user_product', ['idUser', 'idProduct'])
+
+
+def downgrade():
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_cart_item_user_product', type_='unique')